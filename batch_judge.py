@@ -0,0 +1,151 @@
+"""
+Judge many submissions to one exercise, for when an exercise changed and its submissions need judging again
+
+    python batch_judge.py path/to/evaluation submission1.html submission2.html ... > results.jsonl
+
+Every line of the output is the judgement of one submission, in the order they were given:
+    {"source": "submission1.html", "seconds": 0.012, "output": [<the Dodona commands html_judge.py prints>]}
+The throughput and latency percentiles are written to stderr at the end.
+Set JUDGE_HTML_RESULT_CACHE to a file to replay the judgements of unchanged submissions from there.
+
+The submissions are spread over a pool of worker processes. Each worker loads the evaluator.py (or
+solution.html) and the html tag table once and reuses them for every submission it judges.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tempfile
+import time
+import traceback
+from multiprocessing import Pool
+from pathlib import Path
+
+import html_judge
+from dodona.dodona_config import DodonaConfig
+from utils.result_cache import ResultCache
+from validators.html_validator import load_tags
+
+# Only passed on in the config, like Dodona does, the judge doesn't enforce them itself
+DEFAULT_MEMORY_LIMIT = 536870912
+DEFAULT_TIME_LIMIT = 10
+
+# Per worker process, set by _init_worker()
+_exercise: html_judge.Exercise
+_settings: dict
+_cache: ResultCache | None
+
+
+def _config(source: str) -> DodonaConfig:
+    """the config Dodona would pass html_judge.py for source"""
+    return DodonaConfig(source=source, **_settings)
+
+
+def _init_worker(settings: dict):
+    """load everything that is the same for every submission to the exercise"""
+    global _exercise, _settings, _cache  # noqa: PLW0603
+
+    # DodonaConfig.sanity_check() wants the judge to run in the workdir,
+    # settings["workdir"] is a temporary directory main() cleans up afterwards
+    workdir = tempfile.mkdtemp(dir=settings["workdir"])
+    os.chdir(workdir)
+    _settings = {**settings, "workdir": workdir}
+    _exercise = html_judge.Exercise(settings["resources"])
+    _cache = ResultCache.from_environment()
+
+    load_tags()
+    # A broken evaluator raises again (and is reported) for every submission
+    with contextlib.suppress(Exception):
+        _exercise.evaluator(_config(""))
+    with contextlib.suppress(FileNotFoundError):
+        _exercise.compiled_solution()
+
+
+def _parse_output(output: str) -> list:
+    """html_judge.py prints one JSON object per Dodona command, one after the other"""
+    decoder = json.JSONDecoder()
+    commands = []
+    index = 0
+    while index < len(output):
+        if output[index].isspace():
+            index += 1
+            continue
+        command, index = decoder.raw_decode(output, index)
+        commands.append(command)
+    return commands
+
+
+def _judge(source: str) -> dict:
+    """judge a single submission, the result is one line of the output"""
+    start = time.perf_counter()
+    result: dict = {"source": source}
+    output = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(output):
+            html_judge.judge(_config(source), _exercise, _cache)
+        result["output"] = _parse_output(output.getvalue())
+    except Exception:
+        result["error"] = traceback.format_exc()
+    result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def _report(latencies: list[float], elapsed: float):
+    """throughput and latency percentiles, on stderr so they stay out of the results"""
+    ordered = sorted(latencies)
+
+    def percentile(p: int) -> str:
+        # nearest rank
+        return f"p{p} {ordered[round(p / 100 * (len(ordered) - 1))] * 1000:.1f}ms"
+
+    sys.stderr.write(
+        f"{len(ordered)} submissions in {elapsed:.2f}s ({len(ordered) / elapsed:.1f} submissions/s), "
+        f"latency {percentile(50)}, {percentile(90)}, {percentile(99)}, {percentile(100)}\n"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("resources", help="the evaluation directory of the exercise")
+    parser.add_argument("submissions", nargs="+", help="the html files to judge")
+    parser.add_argument("-j", "--workers", type=int, default=os.cpu_count(), help="number of worker processes")
+    parser.add_argument("-l", "--language", default="en", help="natural language of the feedback (en or nl)")
+    parser.add_argument("--memory-limit", type=int, default=DEFAULT_MEMORY_LIMIT, help="in bytes")
+    parser.add_argument("--time-limit", type=int, default=DEFAULT_TIME_LIMIT, help="in seconds")
+    args = parser.parse_args()
+
+    settings = {
+        "memory_limit": args.memory_limit,
+        "time_limit": args.time_limit,
+        "programming_language": "html",
+        "natural_language": args.language,
+        "resources": str(Path(args.resources).resolve()),
+        "judge": str(Path(__file__).resolve().parent),
+    }
+    sources = [str(Path(submission).resolve()) for submission in args.submissions]
+
+    latencies = []
+    start = time.perf_counter()
+    with (
+        tempfile.TemporaryDirectory(prefix="batch-judge-") as workdir,
+        Pool(args.workers, initializer=_init_worker, initargs=({**settings, "workdir": workdir},)) as pool,
+    ):
+        # imap keeps the input order, chunksize 1 keeps one slow submission from holding up a whole chunk
+        for source, result in zip(args.submissions, pool.imap(_judge, sources), strict=True):
+            # the path as it was given, not the resolved one the worker got
+            result["source"] = source
+            latencies.append(result["seconds"])
+            sys.stdout.write(json.dumps(result) + "\n")
+    _report(latencies, time.perf_counter() - start)
+
+    cache = ResultCache.from_environment()
+    if cache is not None:
+        stats = cache.stats()
+        sys.stderr.write(f"result cache: {stats['hits']} hits, {stats['misses']} misses, {stats['results']} results\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -26,6 +26,8 @@ class Translator:
         MISSING_SUITES = auto()
         TESTCASE_ABORTED = auto()
         TESTCASE_NO_LONGER_EVALUATED = auto()
+        TIME_BUDGET_EXHAUSTED = auto()
+        SUBMISSION_TOO_LARGE = auto()
         FAILED_TESTS = auto()
         INVALID_LANGUAGE_TRANSLATION = auto()
         INVALID_TESTSUITE_STUDENTS = auto()
@@ -144,6 +146,8 @@ class Translator:
             Text.MISSING_SUITES: "The 'create_suites(content)' method in the evaluator.py-file did not return any evaluation suites.",
             Text.TESTCASE_ABORTED: "Evaluation was aborted because this test failed. All subsequent tests were not executed.",
             Text.TESTCASE_NO_LONGER_EVALUATED: "This test was not evaluated.",
+            Text.TIME_BUDGET_EXHAUSTED: "This test was not evaluated: the time limit was almost reached.",
+            Text.SUBMISSION_TOO_LARGE: "Your submission is too large to be evaluated within the memory limit.",
             Text.FAILED_TESTS: "{amount} test(s) failed.",
             Text.INVALID_LANGUAGE_TRANSLATION: "Translation for language {language} has less items than the checklist ({translation} instead of {checklist}). Some items will use the default value.",
             Text.INVALID_TESTSUITE_STUDENTS: "Your submission could not be evaluated because of an error in the solution file.",
@@ -192,6 +196,8 @@ class Translator:
             Text.MISSING_SUITES: "De 'create_suites(content)'-methode in het evaluator.py-bestand returnde geen test suites.",
             Text.TESTCASE_ABORTED: "Het evalueren is onderbroken omdat deze test faalde. De hierop volgende tests werden niet uitgevoerd.",
             Text.TESTCASE_NO_LONGER_EVALUATED: "Deze test werd niet uitgevoerd.",
+            Text.TIME_BUDGET_EXHAUSTED: "Deze test werd niet uitgevoerd: de tijdslimiet was bijna bereikt.",
+            Text.SUBMISSION_TOO_LARGE: "Jouw indiening is te groot om binnen de geheugenlimiet geëvalueerd te worden.",
             Text.FAILED_TESTS: "{amount} test(en) gefaald.",
             Text.INVALID_LANGUAGE_TRANSLATION: "De vertaling voor {language} bevat minder elementen dan de checklist ({translation} in plaats van {checklist}). De default waarde zal worden gebruikt voor sommige items.",
             Text.INVALID_TESTSUITE_STUDENTS: "Jouw indiening kon niet geëvalueerd worden door een fout in het oplossingsbestand.",
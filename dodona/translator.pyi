@@ -13,6 +13,8 @@ class Translator:
         MISSING_SUITES = ...
         TESTCASE_ABORTED = ...
         TESTCASE_NO_LONGER_EVALUATED = ...
+        TIME_BUDGET_EXHAUSTED = ...
+        SUBMISSION_TOO_LARGE = ...
         FAILED_TESTS = ...
         INVALID_LANGUAGE_TRANSLATION = ...
         INVALID_TESTSUITE_STUDENTS = ...
@@ -1,13 +1,21 @@
+import contextlib
+import io
+import os
 import sys
+from collections.abc import Sequence
+from dataclasses import dataclass
 from pathlib import Path
+from types import SimpleNamespace
 from typing import TYPE_CHECKING
 
 from dodona.dodona_command import ErrorType, Judgement, Message, MessageFormat, Tab
 from dodona.dodona_config import DodonaConfig
 from dodona.translator import Translator
 from exceptions.utils import InvalidTranslation
+from utils.deadline import Deadline
 from utils.evaluation_module import EvaluationModule
 from utils.file_loaders import html_loader
+from utils.memory import FULL_STRATEGY, MemoryBudget, Strategy, memory_errors, report, too_large
 from utils.messages import (
     invalid_evaluator_file,
     invalid_suites,
@@ -19,7 +27,46 @@ from utils.render_ready import prep_render
 from validators import checks
 
 if TYPE_CHECKING:
+    from utils.result_cache import ResultCache
     from validators.checks import TestSuite
+    from validators.structure_validator import CompiledSolution
+
+
+class Exercise:
+    """the exercise-side part of judging: the evaluator.py and solution.html in a resources directory,
+    both loaded on first use and reused for every submission judged with the same Exercise"""
+
+    def __init__(self, resources: str):
+        self.resources = resources
+        self._evaluator: EvaluationModule | None = None
+        self._evaluator_built = False
+        self._solution: str | None = None
+        self._compiled_solution: CompiledSolution | None = None
+
+    def evaluator(self, config: DodonaConfig) -> EvaluationModule | None:
+        """the evaluator, with config as its config, None if the exercise has none
+        an evaluator that fails to build raises again for every submission, so each one reports it"""
+        if not self._evaluator_built:
+            self._evaluator = EvaluationModule.build(config)
+            self._evaluator_built = True
+        elif self._evaluator is not None:
+            self._evaluator.config = config
+        return self._evaluator
+
+    def solution(self) -> str:
+        """the content of solution.html, raises FileNotFoundError if there is none"""
+        if self._solution is None:
+            self._solution = html_loader(str(Path(self.resources) / "solution.html"))
+        return self._solution
+
+    def compiled_solution(self) -> "CompiledSolution":
+        """solution() prepared for comparing submissions to, raises FileNotFoundError if there is none"""
+        if self._compiled_solution is None:
+            # Local import: only exercises without an evaluator.py compare to a solution
+            from validators.structure_validator import prepare_solution  # noqa: PLC0415
+
+            self._compiled_solution = prepare_solution(self.solution())
+        return self._compiled_solution
 
 
 def main():
@@ -29,7 +76,151 @@ def main():
     # Read config JSON from stdin
     config = DodonaConfig.from_json(sys.stdin)
 
-    with Judgement() as judge:
+    # Only for a run of its own: the limit stays on the process
+    budget = MemoryBudget.from_config(config)
+    if budget is not None:
+        budget.set_soft_limit()
+
+    cache = None
+    if os.environ.get("JUDGE_HTML_RESULT_CACHE"):
+        # Local import: sqlite3 and hashlib are only needed when there is a result cache
+        from utils.result_cache import ResultCache  # noqa: PLC0415
+
+        cache = ResultCache.from_environment()
+    judge(config, Exercise(config.resources), cache)
+
+
+def judge(config: DodonaConfig, exercise: Exercise, cache: "ResultCache | None"):
+    """judge_submission(), replaying the output of an earlier judgement of the same submission from cache
+    Exercises whose evaluator depends on more than the submission and its files opt out with cache_results"""
+    if cache is None or not getattr(config, "cache_results", True):
+        judge_submission(config, exercise)
+        return
+
+    # Local import: see main()
+    from utils.result_cache import recording, result_key  # noqa: PLC0415
+
+    try:
+        key = result_key(config)
+    except OSError:
+        # The judgement will report what is missing
+        judge_submission(config, exercise)
+        return
+
+    output = cache.get(key)
+    if output is not None:
+        sys.stdout.write(output)
+        return
+
+    deadline = Deadline.from_config(config)
+    with recording() as output:
+        judge_submission(config, exercise, deadline)
+    # A judgement that ran out of time depends on more than the submission
+    if deadline is None or not deadline.exhausted:
+        cache.put(key, output.getvalue())
+
+
+@dataclass
+class SuiteResult:
+    """what the judgement needs to know about an evaluated suite"""
+
+    failed_tests: int = 0
+    # One of the translations was invalid, the suite wasn't evaluated
+    aborted: bool = False
+    # This suite validated the HTML
+    html_valid: bool = False
+    # This suite validated the CSS
+    css_valid: bool = False
+    # An item of this suite was skipped because of the deadline
+    time_exhausted: bool = False
+
+
+def evaluate_suite(
+    suite: "TestSuite", config: DodonaConfig, strategy: Strategy, deadline: Deadline | None
+) -> SuiteResult:
+    """evaluate suite in a tab of its own, writing the results to stdout"""
+    suite.create_validator(config)
+    if not strategy.similarity:
+        suite.skip_similarity()
+
+    result = SuiteResult()
+    with Tab(suite.name):
+        try:
+            result.failed_tests = suite.evaluate(config.translator, deadline)
+        except InvalidTranslation:
+            # The status of the judgement is set from result.aborted afterwards
+            invalid_suites(SimpleNamespace(), config)
+            result.aborted = True
+            return result
+
+    result.html_valid = suite.html_is_valid()
+    result.css_valid = suite.css_is_valid()
+    result.time_exhausted = deadline is not None and deadline.exhausted
+    report(f"suite {suite.name}")
+    return result
+
+
+# What evaluate_in_parallel() hands to its worker processes. They inherit it by being forked:
+# the checks of a suite are closures, which can't be pickled and sent to them.
+_parallel_suites: tuple[Sequence["TestSuite"], DodonaConfig, Strategy, Deadline | None]
+
+
+def _evaluate_buffered(index: int) -> tuple[str, SuiteResult]:
+    """evaluate_suite() for the suite at index of _parallel_suites, with what it writes to stdout"""
+    suites, config, strategy, deadline = _parallel_suites
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+        result = evaluate_suite(suites[index], config, strategy, deadline)
+    return output.getvalue(), result
+
+
+def evaluate_in_parallel(
+    suites: Sequence["TestSuite"],
+    config: DodonaConfig,
+    strategy: Strategy,
+    deadline: Deadline | None,
+    budget: MemoryBudget | None = None,
+) -> list[SuiteResult]:
+    """evaluate_suite() for every suite, each in a process of its own
+    The output of the suites is written to stdout in the order of suites, as if they were evaluated one by one.
+    There are no more workers than cpus, and than copies of the judge that fit in the memory budget next to it.
+    With fewer than two, or where no process can be forked (a worker of a daemonic pool can't have any),
+    they are evaluated one by one."""
+    # Local import: only exercises that ask for it evaluate suites in parallel
+    import multiprocessing  # noqa: PLC0415
+
+    workers = min(len(suites), os.cpu_count() or 1)
+    if budget is not None:
+        workers = budget.workers(workers)
+    if workers < 2 or multiprocessing.current_process().daemon or "fork" not in multiprocessing.get_all_start_methods():
+        return [evaluate_suite(suite, config, strategy, deadline) for suite in suites]
+
+    global _parallel_suites  # noqa: PLW0603
+    _parallel_suites = (suites, config, strategy, deadline)
+    # Whatever is still buffered would be written again by every worker
+    sys.stdout.flush()
+    try:
+        with multiprocessing.get_context("fork").Pool(workers) as pool:
+            buffered = pool.map(_evaluate_buffered, range(len(suites)), chunksize=1)
+    finally:
+        del _parallel_suites
+
+    for output, _ in buffered:
+        sys.stdout.write(output)
+    results = [result for _, result in buffered]
+    # Only the copies of the deadline in the workers know, judge() checks this one before caching the judgement
+    if deadline is not None and any(result.time_exhausted for result in results):
+        deadline.exhausted = True
+    return results
+
+
+def judge_submission(config: DodonaConfig, exercise: Exercise, deadline: Deadline | None = None):
+    """judge the submission of config, writing the results to stdout
+    without a deadline, it is derived from the time limit of config"""
+    if deadline is None:
+        deadline = Deadline.from_config(config)
+    budget = MemoryBudget.from_config(config)
+
+    with Judgement() as judge, memory_errors(config.natural_language):
         # Counter for failed tests because this judge works a bit differently
         # Allows nicer feedback on Dodona (displays amount of failed tests)
         failed_tests = 0
@@ -40,16 +231,22 @@ def main():
         config.translator = Translator.from_str(config.natural_language)
         # Load HTML
         html_content: str = html_loader(config.source, shorted=False)
+        report("loading")
+
+        # Estimated before any tree is built, what doesn't fit is left out
+        strategy = budget.strategy(html_content) if budget is not None else FULL_STRATEGY
+        if not strategy.checklist:
+            raise too_large(config.translator)
 
         # Compile evaluator code & create test suites
         # If anything goes wrong, show a detailed error message to the teacher
         # and a short message to the student
         try:
-            evaluator: EvaluationModule | None = EvaluationModule.build(config)
+            evaluator: EvaluationModule | None = exercise.evaluator(config)
             if evaluator is not None:
                 test_suites: list[TestSuite] = evaluator.create_suites(html_content)
             else:
-                solution = html_loader(str(Path(config.resources) / "solution.html"))
+                solution = exercise.solution()
                 if not solution:
                     missing_evaluator_file(config.translator)
                     invalid_suites(judge, config)
@@ -57,9 +254,14 @@ def main():
                 # Private on purpose: the comparison suite is the judge's fallback when a
                 # teacher ships no evaluator.py, not something an evaluator should build.
                 suite = checks._CompareSuite(  # noqa: SLF001
-                    html_content, solution, config, check_recommended=getattr(config, "recommended", True)
+                    html_content,
+                    exercise.compiled_solution(),
+                    config,
+                    check_recommended=getattr(config, "recommended", True),
                 )
                 test_suites = [suite]
+        except MemoryError:
+            raise
         except FileNotFoundError:
             # solution.html is missing
             missing_evaluator_file(config.translator)
@@ -81,44 +283,41 @@ def main():
             no_suites_found(config.translator)
             invalid_suites(judge, config)
             return
+        report("parsing")
 
         # Has HTML been validated at least once?
         # Same HTML is used every time so once is enough
         html_validated: bool = False
         css_validated: bool = False
         aborted: bool = False
+        time_exhausted: bool = False
 
-        # Run all test suites
-        for suite in test_suites:
-            suite.create_validator(config)
-
-            with Tab(suite.name):
-                try:
-                    failed_tests += suite.evaluate(config.translator)
-                except InvalidTranslation:
-                    # One of the translations was invalid
-                    invalid_suites(judge, config)
-
-                    aborted = True
-                    continue
-
-            # This suite validated the HTML
-            if suite.html_is_valid():
-                html_validated = True
+        # Run all test suites, at the same time if the exercise asks for it
+        if getattr(config, "parallel_suites", False) and len(test_suites) > 1:
+            results = evaluate_in_parallel(test_suites, config, strategy, deadline, budget)
+        else:
+            results = (evaluate_suite(suite, config, strategy, deadline) for suite in test_suites)
 
-            # This suite validated the CSS
-            if suite.css_is_valid():
-                css_validated = True
+        for result in results:
+            failed_tests += result.failed_tests
+            aborted = aborted or result.aborted
+            html_validated = html_validated or result.html_valid
+            css_validated = css_validated or result.css_valid
+            time_exhausted = time_exhausted or result.time_exhausted
 
-        # Only render out valid HTML on Dodona
-        if html_validated:
+        # Only render out valid HTML on Dodona, unless there is no time or memory left for it
+        if html_validated and not time_exhausted and strategy.render:
             title, html = prep_render(html_content, render_css=css_validated)
             with Tab(f"Rendered{f': {title}' if title else ''}"), Message(format=MessageFormat.HTML, description=html):
                 pass
+            report("rendering")
 
         if aborted:
             judge.status = config.translator.error_status(ErrorType.RUNTIME_ERROR)
             judge.accepted = False
+        elif time_exhausted:
+            judge.status = config.translator.error_status(ErrorType.TIME_LIMIT_EXCEEDED)
+            judge.accepted = False
         else:
             status = (
                 ErrorType.CORRECT_ANSWER
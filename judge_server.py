@@ -0,0 +1,283 @@
+"""
+Long-lived judge server: the libraries and tables html_judge.py needs are loaded once,
+and every submission is judged in a fork of that warm process
+
+    python judge_server.py serve /tmp/html-judge.sock    starts the server
+    python judge_server.py /tmp/html-judge.sock          judges one submission, like html_judge.py:
+                                                         the config JSON on stdin, the results on stdout
+
+The client only imports the standard library, so it starts about as fast as the interpreter does.
+Every submission gets its own child process: nothing one submission loads, caches or breaks is seen by
+the next one, and the time and memory limits from its config are applied to that child alone.
+The client writes what the child writes to stdout and stderr to its own, and ends like the child did:
+with its exit code, or by the signal that ended it, so it can't be told apart from a cold run.
+When there is no server behind the socket, the client judges the submission with a cold run of html_judge.py.
+
+At most --max-children submissions (the number of CPUs by default) are judged at the same time, the server
+only accepts the next connection once one of them is done, so a burst of submissions waits in the backlog of
+the socket instead of forking a process for every one of them.
+
+The config of a submission tells the server which resources/evaluator.py to run, so anyone who can connect to
+the socket can make the server run any Python file it can read, as the user the server runs as. The socket is
+created so only that user can connect to it; don't put it where another user can replace it before it is.
+"""
+
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import signal
+import socket
+import struct
+import sys
+import traceback
+from pathlib import Path
+
+# Everything the server sends the client is a frame: its kind and the length of what follows
+_HEADER = "!BI"
+_STDOUT = 1
+_STDERR = 2
+# how the judgement ended, os.waitstatus_to_exitcode() of the child that ran it
+_EXIT = 3
+_EXIT_CODE = "!i"
+
+# Judged in the warm-up, so the first submission doesn't pay for lazily imported and compiled code
+_WARM_UP_HTML = """<!DOCTYPE html>
+<html lang="en"><head><meta charset="UTF-8"><title>warm-up</title><style>#main p { color: red; }</style></head>
+<body><div id="main"><p class="a">Hello</p><img src="a.png" alt="a"></div></body></html>"""
+
+
+def preload():
+    """import everything html_judge.main() uses and run it over a small document once"""
+    # Local imports: the client shouldn't pay for any of these
+    import html_judge  # noqa: F401, PLC0415
+    from dodona.dodona_config import DodonaConfig  # noqa: PLC0415
+    from dodona.translator import Translator  # noqa: PLC0415
+    from utils import bytecode_cache, color_converter, result_cache  # noqa: F401, PLC0415
+    from utils.document import parse_document  # noqa: PLC0415
+    from utils.emmet import emmet_to_check  # noqa: PLC0415
+    from utils.render_ready import prep_render  # noqa: PLC0415
+    from validators import checks  # noqa: PLC0415
+    from validators.structure_validator import get_similarity  # noqa: PLC0415
+
+    suite = checks.TestSuite("warm-up", _WARM_UP_HTML)
+    suite.create_validator(
+        # create_validator() only reads the translator of the config
+        DodonaConfig(
+            memory_limit=0,
+            time_limit=0,
+            programming_language="html",
+            natural_language="en",
+            resources="",
+            source="",
+            judge="",
+            workdir="",
+            translator=Translator(Translator.Language.EN),
+        )
+    )
+    soup = parse_document(_WARM_UP_HTML).soup
+    suite.validate_html().callback(soup)
+    suite.element("p").has_styling("color", "red").callback(soup)
+    emmet_to_check("div#main>p.a", suite).callback(soup)
+    get_similarity(_WARM_UP_HTML, _WARM_UP_HTML)
+    prep_render(_WARM_UP_HTML, render_css=True)
+
+    # Don't hand the warm-up document to the children
+    parse_document.cache_clear()
+
+
+def _apply_limits(config: dict):
+    """the limits Dodona would put on the container of a cold run, for this child only"""
+    time_limit = int(config.get("time_limit", 0))
+    if time_limit > 0:
+        # SIGALRM isn't handled, so it ends the child like Dodona ends a container that runs too long
+        signal.alarm(time_limit)
+
+    memory_limit = int(config.get("memory_limit", 0))
+    if memory_limit > 0:
+        # The data segment, like utils/memory.py limits: the address space of a fork of the server holds
+        # every library it preloaded, most of which the child never touches
+        resource.setrlimit(resource.RLIMIT_DATA, (memory_limit, memory_limit))
+
+
+def _frame(kind: int, data: bytes) -> bytes:
+    return struct.pack(_HEADER, kind, len(data)) + data
+
+
+class _FrameWriter(io.RawIOBase):
+    """what is written to it is sent over conn in frames of kind"""
+
+    def __init__(self, conn: socket.socket, kind: int):
+        self.conn = conn
+        self.kind = kind
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.conn.sendall(_frame(self.kind, bytes(data)))
+        return len(data)
+
+
+def _run(conn: socket.socket, config_str: str):
+    """html_judge.main() for config_str, with its stdout and stderr sent over conn, never returns"""
+    status = 1
+    try:
+        sys.stdout = io.TextIOWrapper(io.BufferedWriter(_FrameWriter(conn, _STDOUT)), encoding="utf-8")
+        sys.stderr = io.TextIOWrapper(
+            io.BufferedWriter(_FrameWriter(conn, _STDERR)), encoding="utf-8", line_buffering=True
+        )
+
+        # Local import: it is already loaded by preload(), this only looks it up
+        import html_judge  # noqa: PLC0415
+
+        config = json.loads(config_str)
+        # A cold run is started from the workdir, and DodonaConfig.sanity_check() checks for that
+        os.chdir(config["workdir"])
+        _apply_limits(config)
+
+        sys.stdin = io.StringIO(config_str)
+        html_judge.main()
+        status = 0
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        for stream in (sys.stdout, sys.stderr):
+            with contextlib.suppress(BaseException):
+                stream.flush()
+        # Skip the cleanup of the server's state, that belongs to the parent
+        os._exit(status)
+
+
+def _judge(conn: socket.socket):
+    """judge the submission sent over conn in a child of its own, and send how that child ended, never returns
+    The child can be ended by a signal (the time limit) before it can tell anything itself."""
+    status = 1
+    try:
+        with conn.makefile("rb") as request:
+            config_str = request.read().decode()
+
+        child = os.fork()
+        if child == 0:
+            _run(conn, config_str)
+        _, wait_status = os.waitpid(child, 0)
+        conn.sendall(_frame(_EXIT, struct.pack(_EXIT_CODE, os.waitstatus_to_exitcode(wait_status))))
+        status = 0
+    except BaseException:
+        traceback.print_exc()
+    finally:
+        os._exit(status)
+
+
+def _reap(children: set[int], block: bool):
+    """forget the children that have ended, waiting for one of them first when block"""
+    while children:
+        pid, _ = os.waitpid(-1, 0 if block else os.WNOHANG)
+        if pid == 0:
+            return
+        children.discard(pid)
+        block = False
+
+
+def serve(socket_path: str, max_children: int):
+    """accept submissions on a unix socket until interrupted, judging each one in a fork,
+    at most max_children at the same time"""
+    preload()
+
+    path = Path(socket_path)
+    path.unlink(missing_ok=True)
+
+    children: set[int] = set()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+        # Only the user of the server can connect, it runs whatever evaluator a config points to
+        umask = os.umask(0o177)
+        try:
+            server.bind(socket_path)
+        finally:
+            os.umask(umask)
+        server.listen()
+        try:
+            while True:
+                _reap(children, block=len(children) >= max_children)
+                conn, _ = server.accept()
+                child = os.fork()
+                if child == 0:
+                    server.close()
+                    _judge(conn)
+                children.add(child)
+                conn.close()
+        finally:
+            path.unlink(missing_ok=True)
+
+
+def judge(socket_path: str) -> int:
+    """send the config on stdin to the server and copy the stdout and stderr it sends back,
+    returns the exit code of the judgement, minus the signal that ended it, like subprocess does"""
+    config = sys.stdin.buffer.read()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as conn:
+        try:
+            conn.connect(socket_path)
+        except OSError:
+            # No server behind the socket (anymore): judge it like run does without one
+            return _cold(config)
+        conn.sendall(config)
+        conn.shutdown(socket.SHUT_WR)
+
+        streams = {_STDOUT: sys.stdout.buffer, _STDERR: sys.stderr.buffer}
+        with conn.makefile("rb") as frames:
+            while len(header := frames.read(struct.calcsize(_HEADER))) == struct.calcsize(_HEADER):
+                kind, size = struct.unpack(_HEADER, header)
+                data = frames.read(size)
+                if kind == _EXIT:
+                    sys.stdout.buffer.flush()
+                    return struct.unpack(_EXIT_CODE, data)[0]
+                streams[kind].write(data)
+                if kind == _STDERR:
+                    sys.stderr.buffer.flush()
+
+    sys.stdout.buffer.flush()
+    sys.stderr.write("judge_server: the server ended the judgement without an exit status\n")
+    return 1
+
+
+def _cold(config: bytes) -> int:
+    """judge config with a cold run of html_judge.py, returns how that ended like judge() does"""
+    # Local import: only needed without a server
+    import subprocess  # noqa: PLC0415
+
+    sys.stdout.flush()
+    return subprocess.run(  # noqa: S603
+        [sys.executable, str(Path(__file__).parent / "html_judge.py")], input=config, check=False
+    ).returncode
+
+
+def _exit(code: int):
+    """exit with code, or be ended by the signal minus code, like the judgement was"""
+    if code < 0:
+        signal.signal(-code, signal.SIG_DFL)
+        os.kill(os.getpid(), -code)
+    sys.exit(code)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", nargs="?", choices=["serve"], help="start the server instead of judging")
+    parser.add_argument("socket", help="path of the unix socket the server listens on")
+    parser.add_argument(
+        "--max-children",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="the most submissions the server judges at the same time (default: the number of CPUs)",
+    )
+    args = parser.parse_args()
+
+    if args.command == "serve":
+        serve(args.socket, args.max_children)
+    else:
+        _exit(judge(args.socket))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+import json
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+from pathlib import Path
+
+from batch_judge import _parse_output
+from tests.helpers import html_dir
+
+root = Path(__file__).parent.parent
+
+
+class TestBatchJudge(unittest.TestCase):
+    def test_same_output_as_cold_run(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_dir = Path(tmp)
+            (tmp_dir / "resources").mkdir()
+            (tmp_dir / "workdir").mkdir()
+            shutil.copy(html_dir / "my_first_html_exercise.html", tmp_dir / "resources" / "solution.html")
+            submissions = [str(html_dir / f"{name}.html") for name in ("my_first_html_exercise", "test_1")]
+
+            def cold(source: str) -> list:
+                config = {
+                    "memory_limit": 536870912,
+                    "time_limit": 10,
+                    "programming_language": "html",
+                    "natural_language": "en",
+                    "resources": str(tmp_dir / "resources"),
+                    "source": source,
+                    "judge": str(root),
+                    "workdir": str(tmp_dir / "workdir"),
+                }
+                return _parse_output(
+                    subprocess.run(  # noqa: S603
+                        [sys.executable, str(root / "html_judge.py")],
+                        input=json.dumps(config).encode(),
+                        cwd=tmp_dir / "workdir",
+                        capture_output=True,
+                        check=True,
+                    ).stdout.decode()
+                )
+
+            batch = subprocess.run(  # noqa: S603
+                [sys.executable, str(root / "batch_judge.py"), "-j", "2", str(tmp_dir / "resources"), *submissions * 2],
+                capture_output=True,
+                check=True,
+            )
+
+            results = [json.loads(line) for line in batch.stdout.decode().splitlines()]
+            self.assertEqual([result["source"] for result in results], submissions * 2)
+            for result in results:
+                self.assertEqual(result["output"], cold(result["source"]))
+            self.assertIn(b"4 submissions in", batch.stderr)
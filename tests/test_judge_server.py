@@ -0,0 +1,137 @@
+import json
+import shutil
+import signal
+import socket
+import stat
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from pathlib import Path
+
+from tests.helpers import html_dir
+
+root = Path(__file__).parent.parent
+
+
+class TestJudgeServer(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        (self.dir / "resources").mkdir()
+        (self.dir / "workdir").mkdir()
+        shutil.copy(html_dir / "my_first_html_exercise.html", self.dir / "resources" / "solution.html")
+        shutil.copy(html_dir / "my_first_html_exercise.html", self.dir / "submission.html")
+
+        self.sock = self.dir / "judge.sock"
+        server = subprocess.Popen(  # noqa: S603
+            [sys.executable, str(root / "judge_server.py"), "serve", str(self.sock), "--max-children", "1"]
+        )
+        self.addCleanup(server.wait)
+        self.addCleanup(server.terminate)
+        deadline = time.monotonic() + 30
+        while not self.sock.exists() and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def config(self, **settings) -> str:
+        return json.dumps(
+            {
+                "memory_limit": 536870912,
+                "time_limit": 10,
+                "programming_language": "html",
+                "natural_language": "en",
+                "resources": str(self.dir / "resources"),
+                "source": str(self.dir / "submission.html"),
+                "judge": str(root),
+                "workdir": str(self.dir / "workdir"),
+            }
+            | settings
+        )
+
+    def warm(self, config: str, sock: Path | None = None) -> subprocess.CompletedProcess:
+        return subprocess.run(  # noqa: S603
+            [sys.executable, str(root / "judge_server.py"), str(sock or self.sock)],
+            input=config.encode(),
+            # started where a cold run is, for when the client falls back to one
+            cwd=self.dir / "workdir",
+            capture_output=True,
+            check=False,
+        )
+
+    def cold(self, config: str) -> subprocess.CompletedProcess:
+        return subprocess.run(  # noqa: S603
+            [sys.executable, str(root / "html_judge.py")],
+            input=config.encode(),
+            cwd=self.dir / "workdir",
+            capture_output=True,
+            check=True,
+        )
+
+    def test_same_output_as_cold_run(self):
+        config = self.config()
+        cold = self.cold(config)
+
+        # Twice, the second submission doesn't see anything of the first one
+        for _ in range(2):
+            warm = self.warm(config)
+            self.assertEqual(warm.returncode, 0)
+            self.assertEqual(warm.stdout, cold.stdout)
+            self.assertEqual(warm.stderr, cold.stderr)
+
+        self.assertIn(b'"command": "close-judgement"', cold.stdout)
+
+    def test_failing_judgement(self):
+        # the traceback of the child ends up on the client's stderr, and the client fails like a cold run would
+        warm = self.warm(self.config(workdir=str(self.dir / "missing")))
+        self.assertEqual(warm.returncode, 1)
+        self.assertIn(b"FileNotFoundError", warm.stderr)
+
+    def test_time_limit(self):
+        (self.dir / "resources" / "evaluator.py").write_text(
+            "import time\n\n\ndef create_suites(content):\n    time.sleep(10)\n    return []\n"
+        )
+        # ended by the alarm the time limit set, before it could write the end of the judgement
+        warm = self.warm(self.config(time_limit=1))
+        self.assertEqual(warm.returncode, -signal.SIGALRM)
+        self.assertNotIn(b"close-judgement", warm.stdout)
+
+    def test_no_server(self):
+        # a socket file left behind by a server that is gone, the client judges the submission itself
+        stale = self.dir / "stale.sock"
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as server:
+            server.bind(str(stale))
+        config = self.config()
+        cold = self.cold(config)
+        warm = self.warm(config, stale)
+        self.assertEqual(warm.returncode, 0)
+        self.assertEqual(warm.stdout, cold.stdout)
+        self.assertEqual(warm.stderr, cold.stderr)
+
+    def test_only_the_user_can_connect(self):
+        self.assertEqual(stat.S_IMODE(self.sock.stat().st_mode), 0o600)
+
+    def test_one_child_at_a_time(self):
+        slow = self.dir / "slow"
+        slow.mkdir()
+        shutil.copy(self.dir / "resources" / "solution.html", slow / "solution.html")
+        (slow / "evaluator.py").write_text(
+            "import time\n\n\ndef create_suites(content):\n    time.sleep(10)\n    return []\n"
+        )
+        first = subprocess.Popen(  # noqa: S603
+            [sys.executable, str(root / "judge_server.py"), str(self.sock)],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.DEVNULL,
+        )
+        self.addCleanup(first.wait)
+        assert first.stdin is not None
+        first.stdin.write(self.config(time_limit=2, resources=str(slow)).encode())
+        first.stdin.close()
+        time.sleep(0.5)
+
+        # the server runs with --max-children 1, the second submission is only judged once the first one ended
+        warm = self.warm(self.config())
+        self.assertEqual(warm.returncode, 0)
+        self.assertIsNotNone(first.poll())
+        self.assertEqual(first.returncode, -signal.SIGALRM)
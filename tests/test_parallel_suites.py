@@ -0,0 +1,114 @@
+import contextlib
+import io
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import html_judge
+from batch_judge import _parse_output
+from dodona.dodona_command import ErrorType
+from dodona.dodona_config import DodonaConfig
+from tests.helpers import html_dir
+from utils.deadline import Deadline
+from utils.memory import MemoryBudget
+
+root = Path(__file__).parent.parent
+
+_EVALUATOR = """
+from validators.checks import CssSuite, HtmlSuite, TestSuite
+
+
+def create_suites(content: str) -> list[TestSuite]:
+    html = HtmlSuite(content)
+    html.make_item("There is a body.", html.element("body").exists())
+
+    css = CssSuite(content)
+    css.make_item("There is a table.", css.element("table").exists())
+
+    extra = TestSuite("Extra", content)
+    extra.make_item("There is a paragraph.", extra.element("p").exists())
+    extra.make_item("There is no div.", extra.element("div").exists().is_crucial())
+    extra.make_item("There is an image.", extra.element("img").exists())
+    return [html, css, extra]
+"""
+
+
+class TestParallelSuites(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        (self.dir / "resources").mkdir()
+        (self.dir / "workdir").mkdir()
+        (self.dir / "resources" / "evaluator.py").write_text(_EVALUATOR)
+
+        cwd = Path.cwd()
+        os.chdir(self.dir / "workdir")
+        self.addCleanup(os.chdir, cwd)
+
+    def config(self, source: str, **settings) -> DodonaConfig:
+        return DodonaConfig(
+            memory_limit=536870912,
+            time_limit=10,
+            programming_language="html",
+            natural_language="en",
+            resources=str(self.dir / "resources"),
+            source=source,
+            judge=str(root),
+            workdir=str(self.dir / "workdir"),
+            **settings,
+        )
+
+    def judge(self, source: str, **settings) -> list:
+        config = self.config(source, **settings)
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            html_judge.judge_submission(config, html_judge.Exercise(config.resources))
+        return _parse_output(output.getvalue())
+
+    def test_same_output_as_one_by_one(self):
+        for name in ("my_first_html_exercise", "test_1", "css_1"):
+            source = str(html_dir / f"{name}.html")
+            one_by_one = self.judge(source)
+            self.assertEqual(
+                [command["title"] for command in one_by_one if "title" in command][:3], ["HTML", "CSS", "Extra"]
+            )
+            with (
+                mock.patch("os.cpu_count", return_value=3),
+                # room for a worker per suite, however much memory the test run itself takes
+                mock.patch("utils.memory.rss", return_value=2**20),
+                mock.patch.object(html_judge, "evaluate_suite", wraps=html_judge.evaluate_suite) as evaluate_suite,
+            ):
+                self.assertEqual(self.judge(source, parallel_suites=True), one_by_one)
+            # every suite was evaluated by a worker process
+            evaluate_suite.assert_not_called()
+
+    def test_time_limit_reached_in_a_worker(self):
+        config = self.config(str(html_dir / "test_1.html"), parallel_suites=True)
+        cache = mock.Mock()
+        cache.get.return_value = None
+        with (
+            mock.patch("os.cpu_count", return_value=3),
+            # no time for a single item, only the workers' copies of the deadline see that
+            mock.patch.object(Deadline, "from_config", side_effect=lambda _: Deadline(0)),
+            contextlib.redirect_stdout(io.StringIO()) as output,
+        ):
+            html_judge.judge(config, html_judge.Exercise(config.resources), cache)
+        self.assertEqual(_parse_output(output.getvalue())[-1]["status"]["enum"], ErrorType.TIME_LIMIT_EXCEEDED)
+        # a judgement that ran out of time isn't replayed
+        cache.put.assert_not_called()
+
+    def test_workers_fit_in_memory(self):
+        source = str(html_dir / "test_1.html")
+        one_by_one = self.judge(source)
+        # not even room for a single copy of the judge next to it
+        with (
+            mock.patch("os.cpu_count", return_value=3),
+            mock.patch.object(MemoryBudget, "workers", return_value=1) as workers,
+            mock.patch.object(html_judge, "evaluate_suite", wraps=html_judge.evaluate_suite) as evaluate_suite,
+        ):
+            self.assertEqual(self.judge(source, parallel_suites=True), one_by_one)
+        workers.assert_called_once_with(3)
+        self.assertEqual(evaluate_suite.call_count, 3)
@@ -0,0 +1,106 @@
+"""
+Startup benchmark: every submission is judged by a fresh interpreter, which pays for every import of html_judge.py
+
+    python -m tests.test_startup                          prints the import time of html_judge and its slowest imports
+    JUDGE_HTML_BENCHMARK=1 python -m pytest tests/test_startup.py    also runs the timed tests
+
+A heavy import added to the startup path is caught by the modules html_judge imports, which doesn't depend on
+how busy the machine is. The timed tests fail when startup regresses past a budget, measured on top of bs4 and
+lxml, which every run needs. Wall clock times depend on the load of the machine (the test suite runs in parallel
+in CI), so those only run when JUDGE_HTML_BENCHMARK is set, on a machine that isn't doing anything else.
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+import time
+import unittest
+from pathlib import Path
+
+root = Path(__file__).parent.parent
+
+# Only loaded by the runs that need them, never by importing html_judge
+LAZY_MODULES = (
+    "colour",
+    "difflib",
+    "emmet",
+    "hashlib",
+    "html_similarity",
+    "sqlite3",
+    "utils.bytecode_cache",
+    "utils.color_converter",
+    "utils.emmet",
+    "utils.result_cache",
+    "validators.structure_validator",
+)
+
+# Every run imports these, the budgets are on top of them
+BASELINE = "import bs4, lxml.html"
+
+# In seconds, on top of BASELINE
+IMPORT_TIME_BUDGET = 0.2
+COLD_START_BUDGET = 0.25
+
+RUNS = 3
+
+
+def _python(*args: str) -> subprocess.CompletedProcess:
+    return subprocess.run(  # noqa: S603
+        [sys.executable, *args], cwd=root, capture_output=True, check=True, text=True
+    )
+
+
+def import_times() -> dict[str, tuple[float, float]]:
+    """module -> (self, cumulative) import time in seconds, from -X importtime, for the imports of html_judge"""
+    stderr = _python("-X", "importtime", "-c", f"{BASELINE}; import html_judge").stderr
+    times = {}
+    for line in stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        if own.strip().isdigit():
+            times[name.strip()] = (int(own) / 1e6, int(cumulative) / 1e6)
+    return times
+
+
+def import_time() -> float:
+    """median cumulative import time of html_judge, when bs4 and lxml are already imported"""
+    return statistics.median(import_times()["html_judge"][1] for _ in range(RUNS))
+
+
+def cold_start(code: str) -> float:
+    """median wall clock time of starting an interpreter that runs code"""
+    times = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        _python("-c", code)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+class TestStartup(unittest.TestCase):
+    def test_lazy_modules(self):
+        modules = set(_python("-c", "import sys, html_judge; print(*sys.modules)").stdout.split())
+        self.assertEqual(modules.intersection(LAZY_MODULES), set())
+
+
+@unittest.skipUnless(os.environ.get("JUDGE_HTML_BENCHMARK"), "timed, set JUDGE_HTML_BENCHMARK to run it")
+class TestStartupTime(unittest.TestCase):
+    def test_import_time(self):
+        self.assertLess(import_time(), IMPORT_TIME_BUDGET)
+
+    def test_cold_start(self):
+        self.assertLess(cold_start("import html_judge") - cold_start(BASELINE), COLD_START_BUDGET)
+
+
+if __name__ == "__main__":
+    times = import_times()
+    sys.stdout.write(f"import html_judge: {import_time() * 1000:.1f}ms (budget {IMPORT_TIME_BUDGET * 1000:.0f}ms)\n")
+    sys.stdout.write(
+        f"cold start on top of {BASELINE!r}: "
+        f"{(cold_start('import html_judge') - cold_start(BASELINE)) * 1000:.1f}ms "
+        f"(budget {COLD_START_BUDGET * 1000:.0f}ms)\n"
+    )
+    sys.stdout.write("slowest imports, bs4 and lxml included (self time):\n")
+    for name, (own, _) in sorted(times.items(), key=lambda item: -item[1][0])[:15]:
+        sys.stdout.write(f"  {own * 1000:6.1f}ms  {name}\n")
@@ -0,0 +1,117 @@
+import marshal
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from utils import bytecode_cache
+from utils.bytecode_cache import cache_dir, cache_key, compile_cached, is_private
+
+source = "def create_suites(content):\n    return [content]\n"
+
+
+class TestBytecodeCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name) / "cache"
+
+    def run_code(self, code) -> list:
+        namespace: dict = {}
+        exec(code, namespace)  # noqa: S102
+        return namespace["create_suites"]("html")
+
+    def test_hit(self):
+        code = compile_cached(source, "<string>", self.dir)
+        self.assertEqual(self.run_code(code), ["html"])
+        self.assertEqual([path.name for path in self.dir.iterdir()], [cache_key(source, "<string>")])
+
+        with mock.patch("builtins.compile") as compile_:
+            cached = compile_cached(source, "<string>", self.dir)
+        compile_.assert_not_called()
+        self.assertEqual(cached, code)
+        self.assertEqual(cached.co_filename, "<string>")
+        self.assertEqual(self.run_code(cached), ["html"])
+
+    def test_key(self):
+        key = cache_key(source, "<string>")
+        self.assertNotEqual(key, cache_key(source + "\n", "<string>"))
+        self.assertNotEqual(key, cache_key(source, "evaluator.py"))
+        with mock.patch.object(bytecode_cache, "CACHE_VERSION", bytecode_cache.CACHE_VERSION + 1):
+            self.assertNotEqual(key, cache_key(source, "<string>"))
+
+    def test_corrupt_file(self):
+        self.dir.mkdir()
+        (self.dir / cache_key(source, "<string>")).write_bytes(b"\x00not marshal")
+        self.assertEqual(self.run_code(compile_cached(source, "<string>", self.dir)), ["html"])
+        # replaced by a good one
+        self.assertEqual(self.run_code(compile_cached(source, "<string>", self.dir)), ["html"])
+
+    def test_unwritable(self):
+        file = self.dir.parent / "file"
+        file.write_text("not a directory")
+        self.assertEqual(self.run_code(compile_cached(source, "<string>", file / "cache")), ["html"])
+        self.assertEqual(self.run_code(compile_cached(source, "<string>", None)), ["html"])
+
+    def test_not_private(self):
+        # a directory someone else made or can write to: what is in it could be anything
+        self.dir.mkdir(mode=0o777)
+        self.dir.chmod(0o777)
+        planted = compile("def create_suites(content):\n    return ['planted']\n", "<string>", "exec")
+        (self.dir / cache_key(source, "<string>")).write_bytes(marshal.dumps(planted))
+        self.assertFalse(is_private(self.dir))
+        self.assertEqual(self.run_code(compile_cached(source, "<string>", self.dir)), ["html"])
+
+        self.dir.chmod(0o700)
+        self.assertTrue(is_private(self.dir))
+        with mock.patch("os.getuid", return_value=os.getuid() + 1):
+            self.assertFalse(is_private(self.dir))
+            self.assertEqual(self.run_code(compile_cached(source, "<string>", self.dir)), ["html"])
+
+        # nor a link to a directory
+        link = self.dir.parent / "link"
+        link.symlink_to(self.dir)
+        self.assertFalse(is_private(link))
+
+    def test_eviction(self):
+        sources = [f"{source}x = {i}\n" for i in range(4)]
+        for i, src in enumerate(sources):
+            compile_cached(src, "<string>", self.dir)
+            # mtimes far enough apart to order the files
+            os.utime(self.dir / cache_key(src, "<string>"), (i, i))
+        size = sum(path.stat().st_size for path in self.dir.iterdir())
+
+        # using the oldest makes it the most recent one
+        compile_cached(sources[0], "<string>", self.dir)
+        compile_cached(f"{source}x = 4\n", "<string>", self.dir, size=size)
+
+        names = {path.name for path in self.dir.iterdir()}
+        self.assertIn(cache_key(sources[0], "<string>"), names)
+        self.assertNotIn(cache_key(sources[1], "<string>"), names)
+        self.assertIn(cache_key(f"{source}x = 4\n", "<string>"), names)
+        self.assertLessEqual(sum(path.stat().st_size for path in self.dir.iterdir()), size)
+
+    def test_stale_tmp_files(self):
+        self.dir.mkdir()
+        stale = self.dir / "stale.tmp"
+        stale.write_bytes(b"x" * 100)
+        os.utime(stale, (0, 0))
+        recent = self.dir / "recent.tmp"
+        recent.write_bytes(b"x" * 100)
+
+        compile_cached(source, "<string>", self.dir)
+        self.assertFalse(stale.exists())
+        # the one being written still counts towards the size
+        compile_cached(f"{source}x = 1\n", "<string>", self.dir, size=150)
+        self.assertTrue(recent.exists())
+        self.assertEqual(list(self.dir.glob("*.bin")), [])
+
+    def test_cache_dir(self):
+        with mock.patch.dict(os.environ, {"JUDGE_HTML_CACHE_DIR": str(self.dir)}):
+            self.assertEqual(cache_dir(), self.dir)
+        with mock.patch.dict(os.environ, {"JUDGE_HTML_CACHE_DIR": ""}):
+            self.assertIsNone(cache_dir())
+        with mock.patch.dict(os.environ):
+            os.environ.pop("JUDGE_HTML_CACHE_DIR", None)
+            self.assertEqual(cache_dir(), bytecode_cache.DEFAULT_CACHE_DIR)
@@ -0,0 +1,47 @@
+import unittest
+
+from dodona.dodona_config import DodonaConfig
+from utils.deadline import TIME_BUDGET, Deadline
+
+
+class TestDeadline(unittest.TestCase):
+    def test_allows_next(self):
+        now = [0.0]
+        deadline = Deadline(10, clock=lambda: now[0])
+        self.assertTrue(deadline.allows_next())
+
+        with deadline.track():
+            now[0] += 3
+        self.assertEqual(deadline.longest, 3)
+        self.assertEqual(deadline.remaining(), 7)
+
+        now[0] += 4
+        # exactly as much time left as the slowest item took is not enough
+        self.assertFalse(deadline.allows_next())
+        self.assertTrue(deadline.exhausted)
+
+    def test_track_failing_item(self):
+        now = [0.0]
+        deadline = Deadline(10, clock=lambda: now[0])
+        with self.assertRaises(ValueError), deadline.track():
+            now[0] += 2
+            raise ValueError
+        self.assertEqual(deadline.longest, 2)
+
+    def test_from_config(self):
+        def config(time_limit: int) -> DodonaConfig:
+            return DodonaConfig(
+                memory_limit=0,
+                time_limit=time_limit,
+                programming_language="html",
+                natural_language="en",
+                resources="",
+                source="",
+                judge="",
+                workdir="",
+            )
+
+        self.assertIsNone(Deadline.from_config(config(0)))
+        deadline = Deadline.from_config(config(10))
+        assert deadline is not None
+        self.assertAlmostEqual(deadline.remaining(), 10 * TIME_BUDGET, places=1)
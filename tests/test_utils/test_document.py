@@ -0,0 +1,61 @@
+import unittest
+from typing import TYPE_CHECKING, cast
+
+from bs4 import BeautifulSoup
+
+from tests.helpers import UnitTestSuite
+from utils.document import parse_document
+from validators.css_validator import CssValidator, ElementNotFound
+
+if TYPE_CHECKING:
+    from bs4.element import Tag
+
+html = """<!DOCTYPE html>
+<html lang="en"><head><style>p { color: red; }</style></head>
+<body>
+<div><p>one</p><!-- a comment is not an element --><p>two <a href="#">link</a></p></div>
+<div><span>three</span></div>
+</body></html>"""
+
+
+class TestParsedDocument(unittest.TestCase):
+    def test_shared_parse(self):
+        document = parse_document(html)
+        self.assertIs(parse_document(html), document)
+        self.assertIs(CssValidator(html).root, document.root)
+        self.assertIs(CssValidator(html).document, document)
+
+    def test_mapping(self):
+        document = parse_document(html)
+        tags = cast("list[Tag]", document.soup.find_all(True))
+        for tag in tags:
+            element = document.element_for(tag)
+            assert element is not None
+            self.assertEqual(element.tag, tag.name)
+            self.assertIs(document.tag_for(element), tag)
+
+        self.assertEqual(document.path_of(tags[-1]), "/html/body/div[2]/span")
+
+        # a Tag of another parse of the same html ends up at the same element
+        other = cast("Tag", BeautifulSoup(html, "html.parser").find("a"))
+        self.assertIs(document.element_for(other), document.element_for(cast("Tag", document.soup.find("a"))))
+
+    def test_fragment(self):
+        """lxml adds the <html> and <body> tags html.parser leaves out"""
+        document = parse_document("<body><p>a</p></body>")
+        p = cast("Tag", document.soup.find("p"))
+        element = document.element_for(p)
+        assert element is not None
+        top = document.root.getroottree().getroot()
+        self.assertEqual(top.tag, "html")
+        self.assertIs(document.tag_for(element), p)
+        self.assertIsNone(document.tag_for(top))
+
+        # more than one root element: lxml moves them all into the <body>
+        cssval = CssValidator("<style>p { color: red; }</style><p>a</p>")
+        with self.assertRaises(ElementNotFound):
+            cssval.find(cast("Tag", cssval.document.soup.find("p")), "color")
+
+    def test_suite_uses_shared_soup(self):
+        suite = UnitTestSuite("my_first_css_exercise")
+        self.assertIs(suite._bs, parse_document(suite.content).soup)
@@ -0,0 +1,90 @@
+import unittest
+from typing import TYPE_CHECKING, cast
+
+from bs4 import BeautifulSoup
+
+from tests.helpers import html_loader
+from utils.document import index_for, parse_document
+from utils.dom_index import DomIndex
+from utils.html_navigation import content_matches, find_tags
+
+if TYPE_CHECKING:
+    from bs4.element import Tag
+
+html = """<!DOCTYPE html>
+<html lang="en"><body>
+<div id="main" class="a b"><p class="a">one</p><p class="b a" id="">two <a href="#" class="a">link</a></p></div>
+<div class="b"><span id="main">three</span><p>four</p><div><div class="a"><p><b>five</b></p></div></div></div>
+</body></html>"""
+
+
+class TestDomIndex(unittest.TestCase):
+    def assert_same_as_bs4(self, document: str):
+        soup = BeautifulSoup(document, "html.parser")
+        index = DomIndex(soup)
+        tags = cast("list[Tag]", soup.find_all(True))
+        names = [None, "p", "div", "a", "missing", ""]
+        ids = {tag.get("id") for tag in tags if isinstance(tag.get("id"), str)}
+        # every class, and every class attribute as a whole
+        classes = {c for tag in tags for c in tag.get("class") or []}
+        classes |= {" ".join(tag.get("class") or []) for tag in tags if tag.get("class")}
+        filters: list[dict] = [{}, {"class_": "missing"}]
+        filters += [{"id": tag_id} for tag_id in ids] + [{"class_": c} for c in classes]
+        filters += [{"id": tag_id, "class": c} for tag_id in ids for c in classes]
+
+        for element in [soup, *tags]:
+            for name in names:
+                for kwargs in filters:
+                    for recursive in (True, False):
+                        # the same Tags, == only compares their html
+                        expected = [id(tag) for tag in element.find_all(name, recursive=recursive, **kwargs)]
+                        found = index.find_all(element, name, recursive, **kwargs)
+                        assert found is not None
+                        self.assertEqual([id(tag) for tag in found], expected)
+                        first = index.find_all(element, name, recursive, 1, **kwargs)
+                        assert first is not None
+                        self.assertEqual([id(tag) for tag in first], expected[:1])
+                    if name is not None and element is not soup:
+                        expected = [id(tag) for tag in element.find_parents(name, **kwargs)]
+                        parents = index.find_parents(element, name, **kwargs)
+                        assert parents is not None
+                        self.assertEqual([id(tag) for tag in parents], expected)
+
+    def test_same_as_bs4(self):
+        self.assert_same_as_bs4(html)
+        for name in ("class_names", "emmet_finding", "nested_attributes", "test_1"):
+            self.assert_same_as_bs4(html_loader(name))
+
+    def test_unknown_filters(self):
+        soup = BeautifulSoup(html, "html.parser")
+        index = DomIndex(soup)
+        self.assertIsNone(index.find_all(soup, "a", href="#"))
+        # None asks for tags without the attribute
+        self.assertIsNone(index.find_all(soup, "p", id=None))
+        self.assertIsNone(index.find_all(soup, ["p", "a"]))  # ty: ignore[invalid-argument-type]
+
+    def test_index_for(self):
+        document = parse_document(html)
+        p = cast("Tag", document.soup.find("p"))
+        self.assertIs(index_for(p), document.index)
+        self.assertIs(index_for(document.soup), document.index)
+        # a tree parse_document() didn't make isn't indexed, find_tags() asks BeautifulSoup
+        other = BeautifulSoup(html, "html.parser")
+        self.assertIsNone(index_for(other))
+        self.assertEqual(find_tags(other, "p", class_="a"), other.find_all("p", class_="a"))
+
+    def test_text(self):
+        document = parse_document(html)
+        index = document.index
+        for tag in index.tags:
+            self.assertEqual(index.text(tag), tag.text)
+            self.assertEqual(index.content(tag), " ".join(tag.text.split()))
+            self.assertIs(index.text(tag), index.text(tag))
+        p = cast("Tag", document.soup.find("p", class_="b"))
+        self.assertEqual(index.content(p, case_insensitive=True), "two link")
+        self.assertTrue(content_matches(p, "  TWO\n link ", case_insensitive=True))
+        self.assertFalse(content_matches(p, "TWO link"))
+        # a Tag of another parse of the same html is not one of the index's
+        other = cast("Tag", BeautifulSoup(html, "html.parser").find("p", class_="b"))
+        self.assertEqual(index.content(other), "two link")
+        self.assertTrue(content_matches(other, "two  link"))
@@ -0,0 +1,114 @@
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+
+import html_judge
+from dodona.dodona_command import DodonaException, ErrorType
+from dodona.dodona_config import DodonaConfig
+from dodona.translator import Translator
+from tests.helpers import html_dir, html_loader
+from utils.memory import CHECKLIST_PER_TAG, MEMORY_BUDGET, DocumentCost, MemoryBudget, Strategy, memory_errors
+from validators.checks import Check, ChecklistItem, TestSuite
+
+root = Path(__file__).parent.parent.parent
+
+
+class TestMemory(unittest.TestCase):
+    def test_document_cost(self):
+        cost = DocumentCost.of("<p>a <b>b</b></p>")
+        self.assertEqual((cost.size, cost.tags), (17, 4))
+        self.assertLess(cost.similarity(), cost.render())
+        self.assertLess(cost.render(), cost.checklist())
+
+    def test_strategy(self):
+        table = "<table>" + "<tr><td>cell</td></tr>" * 10_000 + "</table>"
+        cost = DocumentCost.of(table)
+
+        def strategy(available: int) -> Strategy:
+            budget = MemoryBudget(int((cost.checklist() + available) / MEMORY_BUDGET) + 1)
+            return budget.strategy(table, used=0)
+
+        self.assertEqual(strategy(cost.render() + cost.similarity()), Strategy())
+        self.assertEqual(strategy(cost.render()), Strategy(similarity=False))
+        self.assertEqual(strategy(cost.similarity()), Strategy(render=False))
+        self.assertEqual(strategy(0), Strategy(render=False, similarity=False))
+        self.assertFalse(MemoryBudget(cost.tags * CHECKLIST_PER_TAG).strategy(table, used=0).checklist)
+
+    def test_workers(self):
+        budget = MemoryBudget(1000)
+        # the budget is 800, this process takes 100 of it
+        self.assertEqual(budget.workers(4, used=100), 4)
+        self.assertEqual(budget.workers(10, used=100), 7)
+        self.assertEqual(budget.workers(4, used=300), 1)
+        self.assertEqual(budget.workers(4, used=500), 0)
+
+    def test_from_config(self):
+        config = DodonaConfig(
+            memory_limit=0,
+            time_limit=0,
+            programming_language="html",
+            natural_language="en",
+            resources="",
+            source="",
+            judge="",
+            workdir="",
+        )
+        self.assertIsNone(MemoryBudget.from_config(config))
+        config.memory_limit = 1024
+        budget = MemoryBudget.from_config(config)
+        self.assertIsNotNone(budget)
+        assert budget is not None
+        self.assertEqual(budget.limit, 1024)
+
+    def test_memory_errors(self):
+        with self.assertRaises(DodonaException) as context, memory_errors("nl"):
+            raise MemoryError
+        self.assertEqual(context.exception.status["enum"], ErrorType.MEMORY_LIMIT_EXCEEDED)
+
+    def test_memory_error_ends_evaluation(self):
+        def _inner(_):
+            raise MemoryError
+
+        suite = TestSuite("TEST", html_loader("test_1"))
+        suite.checklist = [ChecklistItem("a", Check(_inner))]
+        with contextlib.redirect_stdout(io.StringIO()), self.assertRaises(MemoryError):
+            suite.evaluate(Translator(Translator.Language.EN))
+
+    def test_too_large(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            directory = Path(tmp)
+            (directory / "resources").mkdir()
+            shutil.copy(html_dir / "my_first_html_exercise.html", directory / "resources" / "solution.html")
+            shutil.copy(html_dir / "test_1.html", directory / "submission.html")
+
+            cwd = Path.cwd()
+            os.chdir(directory)
+            self.addCleanup(os.chdir, cwd)
+
+            config = DodonaConfig(
+                # not even enough for the interpreter
+                memory_limit=1024,
+                time_limit=10,
+                programming_language="html",
+                natural_language="en",
+                resources=str(directory / "resources"),
+                source=str(directory / "submission.html"),
+                judge=str(root),
+                workdir=str(directory),
+            )
+            output = io.StringIO()
+            with contextlib.redirect_stdout(output):
+                html_judge.judge_submission(config, html_judge.Exercise(config.resources))
+
+        commands = [json.loads(command) for command in output.getvalue().replace("}\n{", "}\0{").split("\0")]
+        self.assertEqual([command["command"] for command in commands][-2:], ["append-message", "close-judgement"])
+        self.assertEqual(commands[-1]["status"]["enum"], ErrorType.MEMORY_LIMIT_EXCEEDED)
+        self.assertEqual(
+            commands[-2]["message"]["description"],
+            Translator(Translator.Language.EN).translate(Translator.Text.SUBMISSION_TOO_LARGE),
+        )
@@ -0,0 +1,109 @@
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import html_judge
+from dodona.dodona_config import DodonaConfig
+from tests.helpers import html_dir
+from utils.result_cache import ResultCache, recording, result_key
+
+root = Path(__file__).parent.parent.parent
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.dir = Path(tmp.name)
+        (self.dir / "resources").mkdir()
+        (self.dir / "workdir").mkdir()
+        shutil.copy(html_dir / "my_first_html_exercise.html", self.dir / "resources" / "solution.html")
+        shutil.copy(html_dir / "test_1.html", self.dir / "submission.html")
+        self.cache = ResultCache(self.dir / "results.sqlite")
+
+    def config(self, **kwargs) -> DodonaConfig:
+        settings = {
+            "memory_limit": 536870912,
+            "time_limit": 10,
+            "programming_language": "html",
+            "natural_language": "en",
+            "resources": str(self.dir / "resources"),
+            "source": str(self.dir / "submission.html"),
+            "judge": str(root),
+            "workdir": str(self.dir / "workdir"),
+        }
+        return DodonaConfig(**{**settings, **kwargs})
+
+    def test_get_put(self):
+        self.assertIsNone(self.cache.get("a"))
+        self.cache.put("a", "output")
+        self.assertEqual(self.cache.get("a"), "output")
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "results": 1})
+
+    def test_eviction(self):
+        cache = ResultCache(self.cache.path, size=10)
+        cache.put("a", "12345")
+        cache.put("b", "12345")
+        # using the oldest makes it the most recent one
+        self.assertEqual(cache.get("a"), "12345")
+        cache.put("c", "12345")
+        self.assertEqual(cache.get("a"), "12345")
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("c"), "12345")
+
+    def test_unwritable(self):
+        cache = ResultCache(self.dir / "missing" / "results.sqlite")
+        cache.put("a", "output")
+        self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats(), {"hits": 0, "misses": 0, "results": 0})
+
+    def test_key(self):
+        key = result_key(self.config())
+        # the paths of a run don't matter
+        self.assertEqual(key, result_key(self.config(workdir="/elsewhere")))
+        self.assertNotEqual(key, result_key(self.config(natural_language="nl")))
+        self.assertNotEqual(key, result_key(self.config(contents=True)))
+
+        (self.dir / "resources" / "media").mkdir()
+        (self.dir / "resources" / "media" / "image.png").write_bytes(b"png")
+        self.assertNotEqual(key, result_key(self.config()))
+
+        (self.dir / "submission.html").write_text("<p>changed</p>")
+        with self.assertRaises(OSError):
+            result_key(self.config(source=str(self.dir / "missing.html")))
+
+    def test_recording(self):
+        stdout = io.StringIO()
+        with contextlib.redirect_stdout(stdout), recording() as output:
+            print("judged")  # noqa: T201
+        self.assertEqual(stdout.getvalue(), "judged\n")
+        self.assertEqual(output.getvalue(), "judged\n")
+
+    def test_replay(self):
+        cwd = Path.cwd()
+        os.chdir(self.dir / "workdir")
+        self.addCleanup(os.chdir, cwd)
+
+        def judge(config: DodonaConfig, cache: ResultCache | None) -> str:
+            stdout = io.StringIO()
+            with contextlib.redirect_stdout(stdout):
+                html_judge.judge(config, html_judge.Exercise(config.resources), cache)
+            return stdout.getvalue()
+
+        judged = judge(self.config(), self.cache)
+        self.assertEqual(judged, judge(self.config(), None))
+
+        with mock.patch.object(html_judge, "judge_submission") as judge_submission:
+            self.assertEqual(judge(self.config(), self.cache), judged)
+        judge_submission.assert_not_called()
+
+        # an exercise that opts out is always judged
+        with mock.patch.object(html_judge, "judge_submission") as judge_submission:
+            judge(self.config(cache_results=False), self.cache)
+        judge_submission.assert_called_once()
+        self.assertEqual(self.cache.stats(), {"hits": 1, "misses": 1, "results": 1})
@@ -0,0 +1,101 @@
+import unittest
+from typing import cast
+
+from lxml.etree import _Element
+from lxml.html import fromstring
+
+from utils.selector_matching import NEVER, Selector, SelectorIndex, parse_selector
+from validators.css_validator import compile_selector
+
+html = """<html><head></head><body>
+<div id="main" class="a b">
+    <p class="x">one</p>
+    <!-- a comment is not an element -->
+    <p class=" x\ty ">two <a href="https://example.com" lang="en-US" title="">link</a></p>
+    <ul class="nav"><li class="active">1</li><li>2</li><li class="a">3<span id="s">s</span></li></ul>
+    <div class="b"><div class="a"><span class="x">deep</span></div></div>
+</div>
+<section><h1 id="main">duplicate id</h1><p>after</p><p class="b">after2</p></section>
+</body></html>"""
+
+
+class TestSelectorMatching(unittest.TestCase):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.root = fromstring(html)
+
+    def match(self, selector_str: str, root: _Element | None = None) -> list[_Element]:
+        selector = parse_selector(selector_str)
+        assert selector is not None
+        index: SelectorIndex[str] = SelectorIndex()
+        index.add(selector, selector_str)
+        return [element for element, _ in index.match(self.root if root is None else root)]
+
+    def assert_same_as_xpath(self, selector_str: str, root: _Element | None = None):
+        root = self.root if root is None else root
+        expected = cast("list[_Element]", compile_selector(selector_str).matcher(root))
+        self.assertEqual(set(self.match(selector_str, root)), set(expected), selector_str)
+
+    def test_combinators(self):
+        for selector_str in [
+            "div p",
+            "div > p",
+            "p + p",
+            "p ~ ul",
+            "li + li",
+            "div.a span.x",
+            "#main > div.b > .a",
+            "body div div span",
+            "ul li ~ li > span",
+            "*",
+            "h1#main + p",
+        ]:
+            self.assert_same_as_xpath(selector_str)
+
+    def test_attributes(self):
+        for selector_str in [
+            "[href]",
+            "[href^=https]",
+            "[href$='.com']",
+            "[href*=example]",
+            "[lang|=en]",
+            "[title='']",
+            "[title!='']",
+            "[title!=x]",
+            "[class~=y]",
+            ".x.y",
+        ]:
+            self.assert_same_as_xpath(selector_str)
+
+    def test_never_matching(self):
+        """cssselect turns these into the xpath condition 0"""
+        for selector_str in ["[href^='']", "[class~='']", "a:hover span", "a + li:hover"]:
+            self.assertIs(parse_selector(selector_str), NEVER, selector_str)
+            self.assert_same_as_xpath(selector_str)
+
+    def test_pseudo_class(self):
+        """Rule strips the [0] a lonely pseudo-class becomes, so the element itself matches"""
+        self.assertEqual([a.tag for a in self.match("a:hover")], ["a"])
+        self.assert_same_as_xpath("a:hover")
+        self.assert_same_as_xpath("p ~ ul:focus")
+
+    def test_fragment_root(self):
+        """Like the xpath, the leftmost compound has to match inside root"""
+        section = cast("_Element", self.root.find(".//section"))
+        for selector_str in ["body p", "section p", "h1 + p", "p", "#main ~ p"]:
+            self.assert_same_as_xpath(selector_str, section)
+
+    def test_unsupported(self):
+        """These are left to xpath"""
+        for selector_str in ["li:first-child", "p:not(.x)", "li:nth-child(2)", "a::before", "svg|a", "p, a"]:
+            self.assertIsNone(parse_selector(selector_str), selector_str)
+
+    def test_buckets(self):
+        """An element is only checked against the selectors that could match it"""
+        index: SelectorIndex[str] = SelectorIndex()
+        for selector_str in ["#s", ".nav li.active", "span", "*"]:
+            index.add(cast("Selector", parse_selector(selector_str)), selector_str)
+
+        span = cast("_Element", self.root.find(".//span"))
+        candidates = [item for _, item in index.candidates(span, frozenset())]
+        self.assertEqual(candidates, ["#s", "span", "*"])
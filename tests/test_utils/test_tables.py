@@ -0,0 +1,51 @@
+import unittest
+from typing import TYPE_CHECKING, cast
+
+from bs4 import BeautifulSoup
+
+from utils.document import parse_document
+from utils.tables import row_cells, table_model
+
+if TYPE_CHECKING:
+    from bs4.element import Tag
+
+html = """<table id="outer">
+<tr><th colspan="2">Name</th><th>Amount</th></tr>
+<tr><td rowspan="2">  An
+apple</td><td>Red</td><td>1</td></tr>
+<tr><td>Green</td><td><table><tr><th>Inner</th></tr><tr><td>2</td></tr></table></td></tr>
+</table>"""
+
+
+class TestTables(unittest.TestCase):
+    def test_same_as_bs4(self):
+        document = parse_document(html)
+        for soup in (document.soup, BeautifulSoup(html, "html.parser")):
+            for table in cast("list[Tag]", soup.find_all("table")):
+                model = table_model(table)
+                self.assertEqual([id(th) for th in model.header.tags], [id(th) for th in table.find_all("th")])
+                trs = cast("list[Tag]", table.find_all("tr"))
+                self.assertEqual(len(model.rows), len(trs))
+                for row, tr in zip(model.rows, trs, strict=True):
+                    self.assertEqual([id(td) for td in row.tags], [id(td) for td in tr.find_all("td")])
+                    self.assertEqual(row.contents(), [" ".join(td.text.split()) for td in row.tags])
+
+    def test_kept_by_the_document(self):
+        soup = parse_document(html).soup
+        table = cast("Tag", soup.find("table"))
+        model = table_model(table)
+        self.assertIs(table_model(table), model)
+        # the rows of the table are the ones of the row checks
+        self.assertIs(row_cells(cast("Tag", soup.find_all("tr")[1])), model.rows[1])
+        # a tree parse_document() didn't make is read again every time
+        other = cast("Tag", BeautifulSoup(html, "html.parser").find("table"))
+        self.assertIsNot(table_model(other), table_model(other))
+
+    def test_matches(self):
+        model = table_model(cast("Tag", parse_document(html).soup.find("table")))
+        # a cell spanning more columns or rows is one cell
+        self.assertTrue(model.header.matches(["Name", "Amount", "Inner"]))
+        self.assertTrue(model.rows[1].matches(["an APPLE", "red", " 1 "], case_insensitive=True))
+        self.assertFalse(model.rows[1].matches(["an APPLE", "red", "1"]))
+        self.assertFalse(model.rows[1].matches(["An apple", "Red"]))
+        self.assertEqual(model.rows[1].contents(case_insensitive=True), ["an apple", "red", "1"])
@@ -4,10 +4,11 @@ from typing import TYPE_CHECKING, cast
 from bs4 import BeautifulSoup
 
 from utils.color_converter import Color
-from validators.css_validator import CssValidator
+from validators.css_validator import CssParsingError, CssValidator, SelectorEngine, compile_selector
 
 if TYPE_CHECKING:
     from bs4.element import Tag
+    from lxml.etree import _Element
 
 html = """<!DOCTYPE html>
 <html lang="en">
@@ -122,27 +123,34 @@ html = """<!DOCTYPE html>
 
 
 class TestCssValidator(unittest.TestCase):
+    """the tests run on both selector engines, see TestCssValidatorRightToLeft"""
+
+    engine = SelectorEngine.XPATH
+
+    def css(self, html: str) -> CssValidator:
+        return CssValidator(html, self.engine)
+
     def test_empty_style_tag(self):
         """An empty <style></style> has no CSS, which is not the same as being unparseable"""
         # style.text is None here, which used to reach Rules() and raise a TypeError that
         # TestSuite.__post_init__ doesn't catch, so the whole judge run fell over
-        validator = CssValidator("<html><head><style></style></head><body><p>x</p></body></html>")
+        validator = self.css("<html><head><style></style></head><body><p>x</p></body></html>")
         self.assertEqual(validator.rules.rules, [])
         self.assertFalse(validator)
 
     def test_missing_style_tag(self):
         """A document with no <style> at all behaves the same way"""
-        validator = CssValidator("<html><head></head><body><p>x</p></body></html>")
+        validator = self.css("<html><head></head><body><p>x</p></body></html>")
         self.assertEqual(validator.rules.rules, [])
         self.assertFalse(validator)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.bs: BeautifulSoup = BeautifulSoup(html, "html.parser")
-        self.validator = CssValidator(html)
+        self.validator = self.css(html)
 
     def test_selector(self):
-        cssval = CssValidator("""<html><head>
+        cssval = self.css("""<html><head>
         <style>
         #yellow:hover {
             background-color: rgb(255, 210, 0);
@@ -162,7 +170,7 @@ class TestCssValidator(unittest.TestCase):
         <div></div>
         </body></html>
         """
-        cssval = CssValidator(x)
+        cssval = self.css(x)
         bs: BeautifulSoup = BeautifulSoup(x, "html.parser")
         tag = cast("Tag", bs.find("div"))
 
@@ -223,3 +231,141 @@ class TestCssValidator(unittest.TestCase):
 
                 assert margin is not None
                 self.assertEqual("2px", margin.value_str, green_class)
+
+    def test_find_all(self):
+        cssval = self.css("""<html><head><style>
+        #main { color: blue; margin: 1px; }
+        div { color: red !important; margin: 2px; }
+        div { margin: 3px; }
+        p { color: gold; }
+        </style></head>
+        <body><div id="main"></div></body></html>""")
+        assert cssval.root is not None
+        div = cast("list[_Element]", cssval.root.xpath("//div"))[0]
+
+        rules = cssval.rules.find_all(cssval.root, div)
+        self.assertEqual(set(rules), {"color", "margin"})
+        # !important wins from the id selector
+        self.assertEqual(rules["color"].value_str, "red")
+        # the id selector wins from the selectors defined after it
+        self.assertEqual(rules["margin"].value_str, "1px")
+        self.assertEqual(rules["margin"], cssval.rules.find(cssval.root, div, "margin"))
+
+    def test_cascade_is_reused(self):
+        """The selectors are only evaluated once per document, not once per query"""
+        cssval = self.css(html)
+        assert cssval.root is not None
+        cascade = cssval.rules.cascade(cssval.root)
+
+        sol_el = cast("Tag", self.bs.find("div", attrs={"class": "test_order"}))
+        cssval.find(sol_el, "color")
+        cssval.find(sol_el, "margin")
+
+        self.assertIs(cssval.rules.cascade(cssval.root), cascade)
+        self.assertEqual(len(cssval.rules._cascades), 1)
+
+    def test_selector_cache(self):
+        """Rules that share a selector share one compiled matcher"""
+        cssval = self.css("""<html><head><style>
+        .test_selector_cache { color: red; margin: 2px; }
+        p, .test_selector_cache { padding: 1px; }
+        </style></head></html>""")
+        color, margin, _, padding = cssval.rules.rules
+        self.assertIs(color.matcher, margin.matcher)
+        self.assertIs(color.matcher, padding.matcher)
+
+        hits = compile_selector.cache_info().hits
+        self.css("<style>.test_selector_cache { color: blue; }</style>")
+        self.assertEqual(compile_selector.cache_info().hits, hits + 1)
+
+    def test_invalid_selector(self):
+        with self.assertRaises(CssParsingError):
+            self.css("<style>div:not( { color: red; }</style>")
+
+    def test_grouped_rules(self):
+        """A selector is stored once, and a block's declarations are shared by all of its selectors"""
+        cssval = self.css("""<html><head><style>
+        div, p { color: red; margin: 2px; }
+        div { padding: 1px; }
+        </style></head></html>""")
+        self.assertEqual(list(cssval.rules.groups), ["div", "p"])
+        self.assertEqual([r.name for r in cssval.rules.groups["div"].rules], ["color", "margin", "padding"])
+
+        div_color, _, p_color, _, div_padding = cssval.rules.rules
+        self.assertIs(div_color.declaration, p_color.declaration)
+        self.assertIs(div_color.group, div_padding.group)
+        self.assertEqual(str(p_color.color), "red")
+        self.assertFalse(hasattr(div_color, "__dict__"))
+
+    def test_right_to_left_engine(self):
+        """Both engines find the same dominating rules for every element"""
+        right_to_left = CssValidator(html, SelectorEngine.RIGHT_TO_LEFT)
+        xpath = CssValidator(html)
+        self.assertEqual(right_to_left.rules.engine, SelectorEngine.RIGHT_TO_LEFT)
+        assert xpath.root is not None
+        assert right_to_left.root is not None
+
+        for expected_el, element in zip(xpath.root.iter(), right_to_left.root.iter(), strict=True):
+            expected = xpath.rules.find_all(xpath.root, expected_el)
+            rules = right_to_left.rules.find_all(right_to_left.root, element)
+            self.assertEqual(
+                {name: r.order for name, r in rules.items()},
+                {name: r.order for name, r in expected.items()},
+            )
+
+        # :first-child isn't handled right-to-left, so it falls back to xpath
+        cssval = CssValidator(
+            """<html><head><style>
+        div:first-child { color: red; }
+        div:hover { color: green; }
+        </style></head><body><div></div></body></html>""",
+            SelectorEngine.RIGHT_TO_LEFT,
+        )
+        tag = cast("Tag", BeautifulSoup("<html><body><div></div></body></html>", "html.parser").find("div"))
+        color = cssval.find(tag, "color", "first-child")
+        hover = cssval.find(tag, "color", "hover")
+        assert color is not None
+        assert hover is not None
+        self.assertEqual(color.value_str, "red")
+        self.assertEqual(hover.value_str, "green")
+
+    def test_find_inherited(self):
+        """Every element on the way up is resolved once, nothing is inherited from the top-level element"""
+        document = """<html><head><style>
+        html { color: green; }
+        ul { color: red; margin: 2px; }
+        li.own { color: blue; }
+        </style></head>
+        <body><ul><li class="own"><span>a</span></li><li><ol><li>b</li></ol></li></ul><p>c</p></body></html>"""
+        cssval = self.css(document)
+        bs = BeautifulSoup(document, "html.parser")
+        _, outer, inner = cast("list[Tag]", bs.find_all("li"))
+        span = cast("Tag", bs.find("span"))
+        p = cast("Tag", bs.find("p"))
+
+        color = cssval.find_inherited(inner, "color")
+        assert color is not None
+        self.assertEqual(color.value_str, "red")
+        # the <ol> and outer <li> were passed on the way up to the <ul>
+        for passed in (outer, cast("Tag", bs.find("ol"))):
+            element = cssval.document.element_for(passed)
+            assert element is not None
+            self.assertIs(cssval.inherited[(element, "color", None)], color)
+
+        span_color = cssval.find_inherited(span, "color")
+        assert span_color is not None
+        self.assertEqual(span_color.value_str, "blue")
+        self.assertIsNone(cssval.find_inherited(p, "color"))
+        self.assertIsNone(cssval.find_inherited(inner, "color", "hover"))
+
+        # remembered for the element, not for a Tag of one parse: a new parse finds the same rules
+        del bs, outer, inner, span, p
+        other = BeautifulSoup(document, "html.parser")
+        self.assertIsNone(cssval.find_inherited(cast("Tag", other.find("p")), "color"))
+        self.assertIs(cssval.find_inherited(cast("list[Tag]", other.find_all("li"))[2], "color"), color)
+
+
+class TestCssValidatorRightToLeft(TestCssValidator):
+    """every test of TestCssValidator again, right-to-left matching has to give identical results"""
+
+    engine = SelectorEngine.RIGHT_TO_LEFT
@@ -140,3 +140,24 @@ class TestDoubleCharValidator(unittest.TestCase):
     def test_value(self):
         # correct
         self.run_correct(["""<html lang='bi"boe(ba'>""", """<html lang='bi"boe)ba'>"""])
+
+    def test_parse_content(self):
+        parsed = DoubleCharsValidator.parse_content("<!-- a -->\n  <p class='x'>(\n*/")
+        self.assertEqual(
+            [x if isinstance(x, str) else (x.type, x.is_open(), x.line, x.pos) for x in parsed],
+            [
+                ("html_comment", True, 0, 0),
+                " a ",
+                ("html_comment", False, 0, 7),
+                "\n  ",
+                ("angle", True, 1, 2),
+                "p class=",
+                ("single", None, 1, 11),
+                "x",
+                ("single", None, 1, 13),
+                ("angle", False, 1, 14),
+                ("parentheses", True, 1, 15),
+                "\n",
+                ("css_comment", False, 2, 0),
+            ],
+        )
@@ -1,6 +1,7 @@
 import unittest
 
 from tests.helpers import UnitTestSuite
+from utils.html_navigation import EmmetStep, parse_emmet
 
 
 class TestEmmetMethods(unittest.TestCase):
@@ -51,3 +52,19 @@ class TestEmmetMethods(unittest.TestCase):
         # Leading ">": the children of the document itself, so the doctype should be skipped
         self.assertTrue(suite.check(suite.element(">div").attribute_exists("lang", "en")))
         self.assertEqual(len(suite.all_elements(">div")), 1)
+
+    def test_parse_emmet(self):
+        steps = parse_emmet("body>DIV#main.a.b[-1]>")
+        self.assertEqual(
+            steps,
+            (
+                EmmetStep("body", None, (), None, direct=False),
+                EmmetStep("div", "main", ("a", "b"), -1, direct=True),
+                EmmetStep(None, None, (), None, direct=True, all_children=True),
+            ),
+        )
+        # parsed once, every search with the same path shares the steps
+        self.assertIs(parse_emmet("body>DIV#main.a.b[-1]>"), steps)
+        self.assertIsNone(parse_emmet("div>p.1st"))
+        # nothing after an empty entry is looked at
+        self.assertEqual(len(parse_emmet(">>p.1st") or ()), 1)
@@ -1,6 +1,7 @@
 import unittest
 
 from dodona.translator import Translator
+from exceptions.double_char_exceptions import MultipleMissingCharsError
 from exceptions.html_exceptions import (
     AttributeValueError,
     DuplicateIdError,
@@ -13,7 +14,7 @@ from exceptions.html_exceptions import (
     UnexpectedTagError,
     Warnings,
 )
-from validators.html_validator import HtmlValidator
+from validators.html_validator import HtmlValidator, load_tags
 
 
 class TestHtmlValidator(unittest.TestCase):
@@ -134,6 +135,12 @@ class TestHtmlValidator(unittest.TestCase):
         with self.assertRaises(DuplicateIdError):
             self.validator.validate_content("<img id='img1'><img id='img1'>")
 
+    def test_double_chars_first(self):
+        self.setup(False, False, False)
+        # the missing quote is reported, not the tag that is never closed
+        with self.assertRaises(MultipleMissingCharsError):
+            self.validator.validate_content("<body><div class='a></body>")
+
     def test_values(self):
         self.setup(False, False, False)
         # correct
@@ -176,3 +183,13 @@ class TestHtmlValidator(unittest.TestCase):
             self.validator.validate_content(r"<img src='C:\x\y.jpg'>")
         with self.assertRaises(AttributeValueError):
             self.validator.validate_content("<img src='C:/x/y.jpg'>")
+
+    def test_tags_are_shared(self):
+        other = HtmlValidator(Translator(Translator.Language.EN))
+        self.assertIs(other.tags, self.validator.tags)
+        self.assertIs(load_tags(), self.validator.tags)
+
+        self.assertTrue(self.validator.tags["meta"].void)
+        self.assertEqual(self.validator.tags["ul"].permitted_children, frozenset({"li", "template"}))
+        self.assertEqual(self.validator.tags["html"].permitted_parents, frozenset())
+        self.assertIsNone(self.validator.tags["div"].permitted_parents)
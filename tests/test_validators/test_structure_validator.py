@@ -1,8 +1,20 @@
+import random
 import unittest
+from difflib import SequenceMatcher
+from unittest import mock
 
 from dodona.translator import Translator
 from exceptions.structure_exceptions import NotTheSame
-from validators.structure_validator import compare
+from validators import structure_validator
+from validators.structure_validator import (
+    SIMILARITY_CHUNK_TAGS,
+    SIMILARITY_TOLERANCE,
+    class_similarity,
+    compare,
+    get_similarity,
+    prepare_solution,
+    tag_similarity,
+)
 
 
 class TestHtmlValidator(unittest.TestCase):
@@ -74,3 +86,108 @@ class TestHtmlValidator(unittest.TestCase):
     def test_empty_sub(self):
         with self.assertRaises(NotTheSame):
             compare(self.base, "        ", self.translator)
+
+    def test_compiled_solution(self):
+        solution = prepare_solution(self.base.replace("<title>", '<title id="DUMMY">'))
+        self.assertFalse(solution.css)
+        self.assertEqual(solution.root.tag, "html")
+        self.assertEqual(solution.root.exact, {"lang": "en"})
+
+        # the same solution for every submission, and it doesn't change along the way
+        compare(solution, self.base.replace("<title>", '<title id="x">'), self.translator, attributes=True)
+        with self.assertRaises(NotTheSame):
+            compare(solution, self.base, self.translator, attributes=True)
+        compare(solution, self.base.replace("<title>", '<title id="y">'), self.translator, attributes=True)
+        self.assertEqual(solution, prepare_solution(self.base.replace("<title>", '<title id="DUMMY">')))
+
+    def test_compiled_solution_css(self):
+        style = "<style>td { color: red; }</style>"
+        solution = prepare_solution(self.base.replace("</head>", f"{style}</head>"))
+        self.assertTrue(solution.css)
+
+        compare(solution, self.base.replace("</head>", "<style>td { color: #ff0000; }</style></head>"), self.translator)
+        with self.assertRaises(NotTheSame):
+            compare(solution, self.base.replace("</head>", "<style>th { color: red; }</style></head>"), self.translator)
+        compare(
+            solution,
+            self.base.replace("</head>", "<style>th { color: red; }</style></head>"),
+            self.translator,
+            css=False,
+        )
+
+    def test_subtree_hashes(self):
+        solution = prepare_solution(self.base)
+        self.assertNotIn(None, solution.root.digests)
+
+        # DUMMY only takes the hashes out of play for the options that look at it
+        dummy = prepare_solution(self.base.replace("<title>", '<title id="DUMMY">'))
+        self.assertIsNone(dummy.root.digests[1])
+        self.assertEqual(dummy.root.digests[2], solution.root.digests[2])
+
+        # the walk only goes down the subtrees that differ, and stops at the same node as before
+        submission = self.base.replace("Gregory Goyle", "Harry Potter")
+        with self.assertRaises(NotTheSame) as context:
+            compare(solution, submission, self.translator, contents=True)
+        # lxml doesn't count the leading newline
+        self.assertEqual(
+            context.exception.line, self.base.lstrip().splitlines().index("        <td>Gregory Goyle</td>") + 1
+        )
+        compare(solution, submission, self.translator, attributes=True)
+
+    def test_similarity(self):
+        solution = prepare_solution(self.base)
+        self.assertEqual(get_similarity(solution, self.base), (1, 1))
+        self.assertEqual(get_similarity(self.base, "  "), (0, 0))
+
+        submission = self.base.replace("<caption>Hogwarts Faculties</caption>", "")
+        html_sim, css_sim = get_similarity(solution, submission)
+        tags = len(solution.fingerprint.tags)
+        self.assertAlmostEqual(html_sim, 2 * (tags - 1) / (2 * tags - 1))
+        self.assertEqual(css_sim, 1)
+
+        styled = self.base.replace("</head>", "<style>.a { color: red; }</style></head>")
+        self.assertEqual(get_similarity(styled, styled.replace("<table>", '<table class="a b">'))[1], 0)
+        self.assertEqual(get_similarity(styled.replace("<table>", '<table class="a b">'), styled)[1], 0)
+        self.assertEqual(get_similarity(styled, styled.replace("<table>", '<table class="a">')), (1, 0))
+
+    def test_tag_similarity(self):
+        short = ("html", "body", "div", "p", "p")
+        self.assertEqual(tag_similarity(short, short[:-1]), 2 * 4 / 9)
+        # documents that can't be parsed have no tags, html_similarity scored those 0% similar
+        self.assertEqual(tag_similarity((), ()), 0)
+
+        # long documents that differ in one place match everywhere else
+        long = ("html", "body", *(["div", "p", "span"] * 200))
+        changed = (*long[:300], "section", *long[301:])
+        self.assertEqual(tag_similarity(long, changed), 2 * (len(long) - 1) / (2 * len(long)))
+        # the tags of reordered long documents only match in order
+        self.assertLess(tag_similarity(long, tuple(reversed(long))), 0.7)
+        shuffled = list(long)
+        random.Random(0).shuffle(shuffled)  # noqa: S311 (a fixed test document)
+        self.assertLess(tag_similarity(long, tuple(shuffled)), 0.8)
+
+    def test_tag_similarity_tolerance(self):
+        rng = random.Random(0)  # noqa: S311 (a fixed test document)
+        names = ["div", "p", "span", "a", "li", "ul", "td", "tr", "h2", "img", "section", "em", "strong", "table"]
+        long = tuple(rng.choice(names) for _ in range(2000))
+        for edits in (20, 200):
+            # inserted, removed and replaced tags all over the document
+            edited = list(long)
+            for _ in range(edits):
+                position = rng.randrange(len(edited))
+                operation = rng.randrange(3)
+                if operation == 0:
+                    edited.insert(position, rng.choice(names))
+                elif operation == 1:
+                    del edited[position]
+                else:
+                    edited[position] = rng.choice(names)
+            exact = SequenceMatcher(None, long, edited, autojunk=False).ratio()
+            # in a single piece, and in pieces that each lose the matches across their boundaries
+            for chunk in (SIMILARITY_CHUNK_TAGS, 300):
+                with mock.patch.object(structure_validator, "SIMILARITY_CHUNK_TAGS", chunk):
+                    self.assertAlmostEqual(tag_similarity(long, tuple(edited)), exact, delta=SIMILARITY_TOLERANCE)
+
+    def test_class_similarity(self):
+        self.assertEqual(class_similarity(frozenset(), frozenset()), 1)
+        self.assertEqual(class_similarity(frozenset("ab"), frozenset("bc")), 1 / 3)
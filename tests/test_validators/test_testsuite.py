@@ -1,9 +1,12 @@
+import contextlib
+import io
 import re
 import unittest
 
 from dodona.translator import Translator
 from tests.helpers import UnitTestSuite, html_loader
-from validators.checks import BoilerplateTestSuite, ChecklistItem, TestSuite
+from utils.deadline import Deadline
+from validators.checks import BoilerplateTestSuite, Check, ChecklistItem, TestSuite
 
 
 class TestTestSuite(unittest.TestCase):
@@ -106,3 +109,34 @@ class TestTestSuite(unittest.TestCase):
         self.assertEqual(len(suite.checklist), 1)
         self.assertEqual(suite.translations["en"], ["The solution contains the minimal required HTML code."])
         self.assertEqual(suite.translations["nl"], ["De oplossing bevat de minimale vereiste HTML-code."])
+
+    def test_deadline(self):
+        now = [0.0]
+        deadline = Deadline(10, clock=lambda: now[0])
+        evaluated = []
+
+        def slow(name: str) -> Check:
+            def _inner(_):
+                evaluated.append(name)
+                now[0] += 4
+                return True
+
+            return Check(_inner)
+
+        suite = TestSuite("TEST", html_loader("test_1"))
+        suite.checklist = [ChecklistItem(name, slow(name)) for name in ("a", "b", "c", "d")]
+
+        output = io.StringIO()
+        with contextlib.redirect_stdout(output):
+            failed = suite.evaluate(Translator(Translator.Language.EN), deadline)
+
+        # after two items that took 4s, the 2s that are left aren't enough for another one
+        self.assertEqual(evaluated, ["a", "b"])
+        self.assertEqual(failed, 2)
+        self.assertTrue(deadline.exhausted)
+        self.assertEqual(
+            output.getvalue().count(
+                Translator(Translator.Language.EN).translate(Translator.Text.TIME_BUDGET_EXHAUSTED)
+            ),
+            2,
+        )
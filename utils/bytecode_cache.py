@@ -0,0 +1,127 @@
+"""
+On-disk cache of compiled evaluator.py files
+
+Every submission to an exercise runs the same evaluator.py, so it only has to be compiled once.
+A cache file is named after the hash of the source, the Python bytecode version and CACHE_VERSION,
+so a new evaluator, interpreter or judge never loads code compiled for another one.
+The cache files are executed, so a cache directory anyone but the current user can write to is never used:
+it has to be owned by the current user, and neither its group nor others may write to it.
+Nothing in here raises: when the cache can't be read or written, the source is just compiled.
+"""
+
+import contextlib
+import hashlib
+import marshal
+import os
+import stat
+import tempfile
+import time
+from importlib.util import MAGIC_NUMBER
+from pathlib import Path
+from types import CodeType
+
+# Bump when the way the judge compiles evaluators changes, so the old cache files are no longer used
+CACHE_VERSION = 1
+
+# Upper bound on the total size of the cache directory, the least recently used files are removed first
+CACHE_SIZE = 64 * 1024 * 1024
+
+# A file being written for longer than this was left behind by a judge that crashed
+STALE_TMP_SECONDS = 60
+
+# Used when JUDGE_HTML_CACHE_DIR isn't set, setting it to an empty string disables the cache.
+# One per user, the temp dir is shared with everyone.
+DEFAULT_CACHE_DIR = Path(tempfile.gettempdir()) / f"judge-html-bytecode-{os.getuid()}"
+
+
+def cache_dir() -> Path | None:
+    """the directory the cache is kept in, None when it is disabled"""
+    path = os.environ.get("JUDGE_HTML_CACHE_DIR")
+    if path is None:
+        return DEFAULT_CACHE_DIR
+    return Path(path) if path else None
+
+
+def cache_key(source: str, filename: str) -> str:
+    """name of the cache file for source, compiled with filename as its file name"""
+    digest = hashlib.sha256()
+    digest.update(MAGIC_NUMBER)
+    digest.update(f"{CACHE_VERSION}\0{filename}\0".encode())
+    digest.update(source.encode())
+    return f"{digest.hexdigest()}.bin"
+
+
+def _evict(cache_dir: Path, size: int):
+    """remove the least recently used files until the cache fits in size bytes,
+    and the files a write that crashed left behind"""
+    files = []
+    total = 0
+    now = time.time()
+    for path in (*cache_dir.glob("*.bin"), *cache_dir.glob("*.tmp")):
+        with contextlib.suppress(OSError):
+            info = path.stat()
+            if path.suffix == ".tmp":
+                # Another judge may still be writing a recent one
+                if now - info.st_mtime > STALE_TMP_SECONDS:
+                    path.unlink()
+                else:
+                    total += info.st_size
+                continue
+            files.append((info.st_mtime, info.st_size, path))
+
+    total += sum(file_size for _, file_size, _ in files)
+    for _, file_size, path in sorted(files, key=lambda file: file[0]):
+        if total <= size:
+            break
+        with contextlib.suppress(OSError):
+            path.unlink()
+            total -= file_size
+
+
+def is_private(cache_dir: Path) -> bool:
+    """whether cache_dir is a directory (not a link to one) only the current user can write to"""
+    try:
+        info = cache_dir.lstat()
+    except OSError:
+        return False
+    return (
+        stat.S_ISDIR(info.st_mode) and info.st_uid == os.getuid() and not info.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+    )
+
+
+def compile_cached(source: str, filename: str, cache_dir: Path | None, size: int = CACHE_SIZE) -> CodeType:
+    """compile(source, filename, "exec"), from the cache in cache_dir if it is there,
+    cache_dir None disables the cache, as does a cache_dir someone else could write to"""
+    if cache_dir is None:
+        return compile(source, filename, "exec")
+
+    with contextlib.suppress(OSError):
+        cache_dir.mkdir(mode=0o700, parents=True, exist_ok=True)
+    # The directory may have been there already, made by someone else
+    if not is_private(cache_dir):
+        return compile(source, filename, "exec")
+
+    path = cache_dir / cache_key(source, filename)
+    with contextlib.suppress(OSError, EOFError, ValueError, TypeError):
+        # Only the current user can write to cache_dir, checked above
+        code = marshal.loads(path.read_bytes())  # noqa: S302
+        if isinstance(code, CodeType):
+            # Last used now, so eviction keeps it around
+            with contextlib.suppress(OSError):
+                os.utime(path)
+            return code
+
+    code = compile(source, filename, "exec")
+
+    with contextlib.suppress(OSError):
+        # Written next to its final name and then moved there, so no one ever reads half a file
+        fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as file:
+                file.write(marshal.dumps(code))
+            Path(tmp).replace(path)
+        finally:
+            Path(tmp).unlink(missing_ok=True)
+        _evict(cache_dir, size)
+
+    return code
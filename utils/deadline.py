@@ -0,0 +1,55 @@
+"""
+Time budget of a judgement, so the checklist is cut short before Dodona kills the judge
+
+When Dodona's time limit is exceeded the container is killed, and the student only sees "time limit exceeded".
+The judgement stops starting ChecklistItems a bit before that instead, so everything that was evaluated is shown.
+A running item can't be interrupted: an item is only started when there is more time left than the slowest
+item so far took, which leaves room for it to finish.
+"""
+
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from dodona.dodona_config import DodonaConfig
+
+# Share of the time limit the checklist gets, the rest is for starting up, rendering and writing the results
+TIME_BUDGET = 0.8
+
+
+class Deadline:
+    """the moment the judgement has to stop starting new items"""
+
+    def __init__(self, seconds: float, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self.end = clock() + seconds
+        # the longest any item took so far
+        self.longest = 0.0
+        # whether an item was skipped because of the deadline
+        self.exhausted = False
+
+    @classmethod
+    def from_config(cls, config: DodonaConfig) -> "Deadline | None":
+        """the deadline for the time limit of config, None when it has none"""
+        if config.time_limit <= 0:
+            return None
+        return cls(config.time_limit * TIME_BUDGET)
+
+    def remaining(self) -> float:
+        return self.end - self.clock()
+
+    def allows_next(self) -> bool:
+        """whether the next item is expected to finish in time, an item that isn't is skipped"""
+        if self.remaining() > self.longest:
+            return True
+        self.exhausted = True
+        return False
+
+    @contextmanager
+    def track(self) -> Iterator[None]:
+        """time the item evaluated in the block"""
+        start = self.clock()
+        try:
+            yield
+        finally:
+            self.longest = max(self.longest, self.clock() - start)
@@ -0,0 +1,162 @@
+"""
+A submission parsed once, shared by everything that needs a tree of it
+"""
+
+from functools import cached_property, lru_cache
+from typing import cast
+from weakref import WeakValueDictionary
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+from lxml.etree import _Element
+from lxml.html import HtmlElement, fromstring
+
+from utils.dom_index import DomIndex
+
+# Upper bound on the number of documents parse_document() keeps around. A judge run only
+# ever looks at one submission and the solution it is compared to.
+DOCUMENT_CACHE_SIZE = 8
+
+
+def _path_component(name: str, index: int, count: int) -> str:
+    """one step of a path, the index is only added when the parent has more than one child with that name"""
+    return name if count == 1 else f"{name}[{index}]"
+
+
+class ParsedDocument:
+    """the BeautifulSoup and lxml trees of an html-document, both built on first use
+
+    The two trees don't always have the same shape: lxml adds the <html>, <head> and <body> tags
+    html.parser leaves out. An element of one tree is mapped onto the other by its path from the
+    top of the document, every step of the path being a tag name and, when the parent has more
+    than one child with that name, its position between them (ex: /html/body/div[2]/p).
+
+    The trees are shared, don't change them. Use a copy of the content for that.
+    """
+
+    def __init__(self, content: str):
+        self.content = content
+
+    @cached_property
+    def soup(self) -> BeautifulSoup:
+        soup = BeautifulSoup(self.content, "html.parser")
+        _documents[id(soup)] = self
+        return soup
+
+    @cached_property
+    def index(self) -> DomIndex:
+        """the Tags of soup by name, id and class"""
+        return DomIndex(self.soup)
+
+    @cached_property
+    def root(self) -> HtmlElement:
+        """the element lxml returns for the document, raises like lxml.html.fromstring() when it can't be parsed"""
+        return fromstring(self.content)
+
+    @cached_property
+    def _tag_paths(self) -> dict[int, str]:
+        """id of every Tag in soup -> its path, soup holds on to the Tags so their ids stay unique"""
+        paths: dict[int, str] = {}
+        queue: list[tuple[Tag, str]] = [(self.soup, "")]
+        while queue:
+            parent, path = queue.pop()
+            children = [child for child in parent.children if isinstance(child, Tag)]
+            counts: dict[str, int] = {}
+            for child in children:
+                counts[child.name] = counts.get(child.name, 0) + 1
+            seen: dict[str, int] = {}
+            for child in children:
+                seen[child.name] = seen.get(child.name, 0) + 1
+                child_path = f"{path}/{_path_component(child.name, seen[child.name], counts[child.name])}"
+                paths[id(child)] = child_path
+                queue.append((child, child_path))
+        return paths
+
+    @cached_property
+    def _tags(self) -> dict[str, Tag]:
+        """path -> the Tag in soup at that path"""
+        paths = self._tag_paths
+        return {paths[id(tag)]: tag for tag in cast("list[Tag]", self.soup.find_all(True))}
+
+    @cached_property
+    def _elements(self) -> dict[str, _Element]:
+        """path -> the lxml element at that path, comments and processing instructions have no path"""
+        top = self.root.getroottree().getroot()
+        elements = {f"/{top.tag}": top}
+        queue = [(top, f"/{top.tag}")]
+        while queue:
+            parent, path = queue.pop()
+            children = [child for child in parent if isinstance(child.tag, str)]
+            counts: dict[str, int] = {}
+            for child in children:
+                counts[child.tag] = counts.get(child.tag, 0) + 1
+            seen: dict[str, int] = {}
+            for child in children:
+                seen[child.tag] = seen.get(child.tag, 0) + 1
+                child_path = f"{path}/{_path_component(child.tag, seen[child.tag], counts[child.tag])}"
+                elements[child_path] = child
+                queue.append((child, child_path))
+        return elements
+
+    @cached_property
+    def _element_paths(self) -> dict[_Element, str]:
+        """the lxml elements are kept alive by _elements, so they can be looked up as they are"""
+        return {element: path for path, element in self._elements.items()}
+
+    def path_of(self, tag: Tag) -> str:
+        """the path of a Tag, which doesn't have to be one of soup's, see element_for()"""
+        path = self._tag_paths.get(id(tag))
+        if path is not None and self._tags.get(path) is tag:
+            return path
+
+        components = []
+        child = tag
+        for parent in child.parents:
+            siblings = parent.find_all(child.name, recursive=False)
+            index = next(i for i, s in enumerate(siblings, 1) if s is child)
+            components.append(_path_component(child.name, index, len(siblings)))
+            child = parent
+        components.reverse()
+        return "/{}".format("/".join(components))
+
+    def element_for(self, tag: Tag) -> _Element | None:
+        """the lxml element at the same place in the document as tag, None if lxml has nothing there
+        tag is usually one of soup's Tags, but a Tag from another parse of the same content works too"""
+        path = self.path_of(tag)
+        element = self._elements.get(path)
+        # lxml adds a root <html> tag if there is none present
+        if element is None:
+            element = self._elements.get("/html" + path)
+        return element
+
+    def tag_for(self, element: _Element) -> Tag | None:
+        """the Tag of soup at the same place in the document as the lxml element, None if there is none"""
+        path = self._element_paths.get(element)
+        if path is None:
+            return None
+        tag = self._tags.get(path)
+        if tag is None and path.startswith("/html/"):
+            tag = self._tags.get(path.removeprefix("/html"))
+        return tag
+
+
+# id of the soup of a document -> that document. A document holds on to its soup, so the id is its soup's for as
+# long as the entry exists. The document can outlive parse_document()'s cache when a suite holds on to it.
+_documents: WeakValueDictionary[int, ParsedDocument] = WeakValueDictionary()
+
+
+def index_for(element: BeautifulSoup | Tag) -> DomIndex | None:
+    """the index of the document element is part of, None if it isn't part of one parse_document() made"""
+    root = element
+    while root.parent is not None:
+        root = root.parent
+    document = _documents.get(id(root))
+    return document.index if document is not None else None
+
+
+@lru_cache(maxsize=DOCUMENT_CACHE_SIZE)
+def parse_document(content: str) -> ParsedDocument:
+    """the parsed document for content, every suite, validator and comparison of the same content shares it,
+    use parse_document.cache_info() to see the hits and misses
+    """
+    return ParsedDocument(content)
@@ -0,0 +1,211 @@
+"""
+Index of the tags of a parsed document, so a search doesn't scan the whole tree every time
+
+Every check of an evaluator looks up its elements with find_all(), which walks everything below where it starts.
+The index numbers the tags in document order once, and keeps the numbers of the tags with every name, id
+and class. A tag's descendants are numbered right after it, so the matches below a tag are a slice of those
+lists, found by bisection.
+
+Every tag also knows the number after its last descendant: the tags below it are the interval between the two
+numbers, so whether one tag is an ancestor of another is a comparison of numbers. Tags with the same name are
+either nested or apart, which makes the closest ancestor with a name the closest tag with that name before it,
+or one of the tags it is nested in.
+
+The text of a tag is remembered once it was asked for, as it is and the way compare_content() compares it,
+so checks on the same cells of a table don't join all of their strings again.
+"""
+
+import re
+from bisect import bisect_left
+from collections.abc import Iterable
+from typing import TYPE_CHECKING, Any, cast
+
+from bs4 import BeautifulSoup
+from bs4.element import Tag
+
+if TYPE_CHECKING:
+    from collections.abc import Sequence
+
+# The filters of find_all() the index can answer, anything else is left to BeautifulSoup
+_ATTRIBUTES = frozenset({"id", "class", "class_"})
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_content(text: str, case_insensitive: bool = False) -> str:
+    """text without leading and trailing whitespace, and every other run of whitespace as a single space"""
+    text = _WHITESPACE.sub(" ", text.strip())
+    return text.lower() if case_insensitive else text
+
+
+class DomIndex:
+    """the tags of a BeautifulSoup tree by name, id and class, don't change the tree after indexing it"""
+
+    def __init__(self, soup: BeautifulSoup):
+        self.tags: list[Tag] = []
+        # id of a tag -> its number, the number of the tags in document order
+        self._numbers: dict[int, int] = {}
+        # number of a tag -> the number after its last descendant
+        self._ends: list[int] = []
+        # number of a tag (-1 for the soup) -> the numbers of its children
+        self._children: dict[int, list[int]] = {-1: []}
+        # number of a tag -> the number of its closest ancestor with the same name, -1 if it has none
+        self._outer: list[int] = []
+        # number of a tag -> its text, and (number, case insensitive) -> its normalized text, filled in on use
+        self._texts: dict[int, str] = {}
+        self._contents: dict[tuple[int, bool], str] = {}
+        self._by_name: dict[str, list[int]] = {}
+        self._by_id: dict[str, list[int]] = {}
+        self._by_class: dict[str, list[int]] = {}
+
+        # the numbers of the ancestors of the current tag that are still open, all of them and by name
+        open_tags: list[int] = []
+        open_by_name: dict[str, list[int]] = {}
+        for tag in cast("list[Tag]", soup.find_all(True)):
+            number = len(self.tags)
+            parent = self._numbers.get(id(tag.parent), -1)
+            while open_tags and open_tags[-1] != parent:
+                closed = open_tags.pop()
+                self._ends[closed] = number
+                open_by_name[self.tags[closed].name].pop()
+            open_tags.append(number)
+            same_name = open_by_name.setdefault(tag.name, [])
+            self._outer.append(same_name[-1] if same_name else -1)
+            same_name.append(number)
+
+            self.tags.append(tag)
+            self._numbers[id(tag)] = number
+            self._ends.append(number + 1)
+            self._children[number] = []
+            self._children[parent].append(number)
+            self._by_name.setdefault(tag.name, []).append(number)
+            tag_id = tag.get("id")
+            if isinstance(tag_id, str):
+                self._by_id.setdefault(tag_id, []).append(number)
+            for class_name in dict.fromkeys(tag.get("class") or ()):
+                self._by_class.setdefault(class_name, []).append(number)
+        for number in open_tags:
+            self._ends[number] = len(self.tags)
+
+    def number(self, element: BeautifulSoup | Tag) -> int | None:
+        """the number of a tag of the indexed tree, -1 for the soup itself, None for a tag added after indexing"""
+        return -1 if isinstance(element, BeautifulSoup) else self._numbers.get(id(element))
+
+    def text(self, tag: Tag) -> str:
+        """tag.text, only joined once for a tag of the indexed tree"""
+        number = self._numbers.get(id(tag))
+        if number is None:
+            return tag.text
+        text = self._texts.get(number)
+        if text is None:
+            text = self._texts[number] = tag.text
+        return text
+
+    def content(self, tag: Tag, case_insensitive: bool = False) -> str:
+        """normalize_content() of tag.text, only normalized once for a tag of the indexed tree"""
+        number = self._numbers.get(id(tag))
+        if number is None:
+            return normalize_content(tag.text, case_insensitive)
+        content = self._contents.get((number, case_insensitive))
+        if content is None:
+            content = self._contents[number, case_insensitive] = normalize_content(self.text(tag), case_insensitive)
+        return content
+
+    @staticmethod
+    def _filters(name: Any, attributes: dict[str, Any]) -> tuple[str | None, str | None] | None:
+        """the id and class to filter on, None when the filters need more than a name, id or class"""
+        if not (name is None or isinstance(name, str)) or not attributes.keys() <= _ATTRIBUTES:
+            return None
+        tag_id = attributes.get("id")
+        class_name = attributes.get("class", attributes.get("class_"))
+        # None as a filter asks for tags without the attribute
+        if ("id" in attributes and not isinstance(tag_id, str)) or (
+            attributes.keys() & {"class", "class_"} and not (isinstance(class_name, str) and class_name.strip())
+        ):
+            return None
+        return tag_id, class_name
+
+    def _matches(self, candidate: int, name: str | None, tag_id: str | None, class_name: str | None) -> bool:
+        tag = self.tags[candidate]
+        if name is not None and tag.name != name:
+            return False
+        if tag_id is not None and tag.get("id") != tag_id:
+            return False
+        if class_name is None:
+            return True
+        # like BeautifulSoup: one of the classes, or all of them in the order of the class attribute
+        classes = tag.get("class") or []
+        return class_name in classes or " ".join(classes) == class_name
+
+    def _tags(self, numbers: Iterable[int], limit: int | None) -> list[Tag]:
+        tags = []
+        for number in numbers:
+            tags.append(self.tags[number])
+            if limit is not None and len(tags) >= limit:
+                break
+        return tags
+
+    def find_all(
+        self,
+        element: BeautifulSoup | Tag,
+        name: str | None = None,
+        recursive: bool = True,
+        limit: int | None = None,
+        **attributes: Any,
+    ) -> list[Tag] | None:
+        """element.find_all() for a tag of the indexed tree, in document order
+        None when that can't be answered from the index: a filter needs more than a name, id or class"""
+        filters = self._filters(name, attributes)
+        number = self.number(element)
+        if filters is None or number is None:
+            return None
+        tag_id, class_name = filters
+
+        def matches(candidate: int) -> bool:
+            return self._matches(candidate, name, tag_id, class_name)
+
+        if recursive:
+            # the fewest candidates that still contain every match
+            lists: list[Sequence[int]] = [range(len(self.tags))]
+            if name is not None:
+                lists.append(self._by_name.get(name, []))
+            if tag_id is not None:
+                lists.append(self._by_id.get(tag_id, []))
+            if class_name is not None:
+                lists.append(self._by_class.get(class_name.split()[0], []))
+            candidates = min(lists, key=len)
+            end = len(self.tags) if number == -1 else self._ends[number]
+            start = bisect_left(candidates, number + 1)
+            stop = bisect_left(candidates, end, start)
+            found = (candidate for candidate in candidates[start:stop] if matches(candidate))
+        else:
+            found = (candidate for candidate in self._children[number] if matches(candidate))
+        return self._tags(found, limit)
+
+    def find_parents(
+        self, element: BeautifulSoup | Tag, name: str, limit: int | None = None, **attributes: Any
+    ) -> list[Tag] | None:
+        """element.find_parents() for a tag of the indexed tree, the closest one first
+        None when that can't be answered from the index: a filter needs more than a name, id or class"""
+        filters = self._filters(name, attributes)
+        number = self.number(element)
+        if not isinstance(name, str) or filters is None or number is None:
+            return None
+        if number == -1:
+            return []
+        tag_id, class_name = filters
+
+        def ancestors() -> Iterable[int]:
+            # the closest tag with the name before element, if that isn't an ancestor then
+            # every ancestor with the name is one of the tags it is nested in
+            candidates = self._by_name.get(name, [])
+            position = bisect_left(candidates, number)
+            candidate = candidates[position - 1] if position > 0 else -1
+            while candidate != -1:
+                if self._ends[candidate] > number:
+                    yield candidate
+                candidate = self._outer[candidate]
+
+        return self._tags(
+            (candidate for candidate in ancestors() if self._matches(candidate, name, tag_id, class_name)), limit
+        )
@@ -39,10 +39,13 @@ class EvaluationModule(ModuleType):
         if not custom_evaluator_path.exists():
             return None
 
+        # Local import: exercises that compare to a solution.html don't need it
+        from utils.bytecode_cache import cache_dir, compile_cached  # noqa: PLC0415
+
         # Read raw content of .py file
         with custom_evaluator_path.open() as fp:
-            # Compile the code into bytecode
-            evaluator_script = compile(fp.read(), "<string>", "exec")
+            # Compile the code into bytecode, or load it if this evaluator was compiled before
+            evaluator_script = compile_cached(fp.read(), "<string>", cache_dir())
 
             # Create a new module
             evaluator_module = cls("evaluation", config)
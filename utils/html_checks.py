@@ -1,16 +1,14 @@
-from bs4 import BeautifulSoup
+from utils.document import parse_document
 
 
 def is_empty_document(document: str) -> bool:
     """Check if a document is empty, not allowing comments"""
-    document = document.strip()
-
     # Completely empty (barring whitespace)
-    if not document:
+    if not document.strip():
         return True
 
     try:
-        parsed = BeautifulSoup(document, "html.parser")
+        parsed = parse_document(document).soup
     except Exception:
         # The document was not empty, but it also wasn't valid
         # the HTML validator should catch this and warn about it, ignore it here
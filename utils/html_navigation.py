@@ -1,9 +1,27 @@
 import re
-from typing import Any, TypeGuard, cast
+from functools import lru_cache
+from typing import Any, NamedTuple, TypeGuard, cast
 
 from bs4 import BeautifulSoup
 from bs4.element import Comment, Tag
 
+from utils.document import index_for
+from utils.dom_index import DomIndex, normalize_content
+
+# Upper bound on the number of emmet paths parse_emmet() keeps around
+EMMET_CACHE_SIZE = 1024
+
+_plain_tag_regex = re.compile(r"^[a-zA-Z0-9]+$")
+
+# Tag must always be in the beginning, otherwise we can't parse it out
+_tag_regex = re.compile(r"^[a-zA-Z0-9]+")
+_id_regex = re.compile(r"#([a-zA-Z0-9_-]+)")
+_index_regex = re.compile(r"\[(-?)([0-9]+)\]$")
+
+# Cannot start with a digit, two hyphens or a hyphen followed by a number.
+_illegal_class_regex = re.compile(r"\.([0-9]|--|-[0-9])")
+_class_regex = re.compile(r"\.([a-zA-Z0-9_-]+)")
+
 
 def match_emmet(tag: str | None) -> TypeGuard[str]:
     """Check whether a tag is written in emmet syntax instead of a plain tag name
@@ -11,7 +29,33 @@ def match_emmet(tag: str | None) -> TypeGuard[str]:
     A TypeGuard rather than a bool: emmet syntax is always a string, so callers that
     branch on this can pass the tag straight into find_emmet.
     """
-    return tag is not None and tag != "" and re.match(r"^[a-zA-Z0-9]+$", tag) is None
+    return tag is not None and tag != "" and _plain_tag_regex.match(tag) is None
+
+
+def find_tags(
+    element: BeautifulSoup | Tag, tag: str | None = None, recursive: bool = True, limit: int | None = None, **kwargs
+) -> list[Tag]:
+    """element.find_all(tag, recursive=recursive, limit=limit, **kwargs), answered from the index of the document
+    when element is part of a parsed document and the filters are ones the index knows"""
+    index = index_for(element)
+    if index is not None:
+        tags = index.find_all(element, tag, recursive, limit, **kwargs)
+        if tags is not None:
+            return tags
+    # find_all() is typed as yielding PageElement, but a name filter only matches Tags
+    return cast("list[Tag]", element.find_all(tag, recursive=recursive, limit=limit, **kwargs))
+
+
+def find_parent(element: BeautifulSoup | Tag, tag: str, **kwargs) -> Tag | None:
+    """element.find_parent(tag, **kwargs), answered from the index of the document
+    when element is part of a parsed document and the filters are ones the index knows"""
+    index = index_for(element)
+    if index is not None:
+        parents = index.find_parents(element, tag, limit=1, **kwargs)
+        if parents is not None:
+            return parents[0] if parents else None
+    # find_parent() is typed as yielding PageElement, but a name filter only matches Tags
+    return cast("Tag | None", element.find_parent(tag, **kwargs))
 
 
 def find_child(
@@ -50,11 +94,10 @@ def find_child(
 
     # No index specified, first child requested
     if index == 0:
-        # find() and find_all() are typed as yielding PageElement, which covers
-        # NavigableString too. Searching by tag name only ever matches Tags.
-        return cast("Tag | None", element.find(tag, recursive=not from_root, **kwargs))
+        first = find_tags(element, tag, recursive=not from_root, limit=1, **kwargs)
+        return first[0] if first else None
 
-    all_children = cast("list[Tag]", element.find_all(tag, recursive=not from_root, **kwargs))
+    all_children = find_tags(element, tag, recursive=not from_root, **kwargs)
 
     # No children found
     if len(all_children) == 0:
@@ -66,6 +109,60 @@ def find_child(
     return all_children[index]
 
 
+class EmmetStep(NamedTuple):
+    """one entry of an emmet path (ex: div#main.a.b[2]), what to look for below the match of the step before it
+    name, tag_id and index are None if the entry doesn't specify one, an empty entry asks for all children"""
+
+    name: str | None
+    tag_id: str | None
+    # in the order of the entry, BeautifulSoup matches more than one class as the whole class attribute
+    classes: tuple[str, ...]
+    index: int | None
+    # only the children of the match of the step before, every step after the first one
+    direct: bool
+    all_children: bool = False
+
+
+@lru_cache(maxsize=EMMET_CACHE_SIZE)
+def parse_emmet(path: str) -> tuple[EmmetStep, ...] | None:
+    """the steps of an emmet path, None if it has an illegal class name
+    the result is cached for the whole process, every submission is searched with the same few paths,
+    use parse_emmet.cache_info() to see the hits and misses
+    """
+    steps: list[EmmetStep] = []
+    for entry in path.split(">"):
+        direct = bool(steps)
+
+        # Entry is empty, so it stands for all children and ends the path
+        if not entry:
+            steps.append(EmmetStep(None, None, (), None, direct, all_children=True))
+            break
+
+        # Illegal class name
+        if _illegal_class_regex.search(entry) is not None:
+            return None
+
+        tag = _tag_regex.search(entry)
+        id_match = _id_regex.search(entry)
+        index = _index_regex.search(entry)
+
+        # Parse matches out
+        # Tag doesn't use a capture group so take match 0 instead of 1,
+        # the others need to use 1
+        # First match of the index is an optional -, the second one is the number
+        steps.append(
+            EmmetStep(
+                tag.group(0).lower() if tag is not None else None,
+                id_match.group(1) if id_match is not None else None,
+                # Multiple class names allowed
+                tuple(_class_regex.findall(entry)),
+                int(index.group(2)) * (-1 if index.group(1) else 1) if index is not None else None,
+                direct,
+            )
+        )
+    return tuple(steps)
+
+
 def find_emmet(
     element: BeautifulSoup | Tag | None,
     path: str,
@@ -78,93 +175,51 @@ def find_emmet(
     if element is None:
         return None
 
-    # Tag must always be in the beginning, otherwise we can't parse it out
-    tag_regex = re.compile(r"^[a-zA-Z0-9]+")
-    id_regex = re.compile(r"#([a-zA-Z0-9_-]+)")
-    index_regex = re.compile(r"\[(-?)([0-9]+)\]$")
-
-    # Cannot start with a digit, two hyphens or a hyphen followed by a number.
-    illegal_class_regex = re.compile(r"\.([0-9]|--|-[0-9])")
-    class_regex = re.compile(r"\.([a-zA-Z0-9_-]+)")
-
-    path_stack: list[str] = path.split(">")
-
-    # the from_root should only be done once, afterwards it's always True to support this syntax
-    moved = False
-    current_element: BeautifulSoup | Tag | None = element
-
-    # Keep going until path is empty
-    while path_stack:
-        if current_element is None:
-            return None
+    steps = parse_emmet(path)
+    if steps is None:
+        return None
 
-        # Take first entry from stack
-        current_entry = path_stack.pop(0)
+    current_element: BeautifulSoup | Tag = element
+    for position, step in enumerate(steps):
+        last = position == len(steps) - 1
 
-        # Element is empty, so return all children
-        if not current_entry:
+        if step.all_children:
             # .children is a generator that also yields NavigableStrings, but every other
             # branch (and every caller) expects a list of Tags, so match that here too
             return [child for child in current_element.children if isinstance(child, Tag)]
 
-        # Illegal class name
-        if illegal_class_regex.search(current_entry) is not None:
-            return None
-
-        tag = tag_regex.search(current_entry)
-        id_match = id_regex.search(current_entry)
-        # Multiple class names allowed
-        class_names = class_regex.findall(current_entry)
-        index = index_regex.search(current_entry)
-
         # Kwargs to filter on. find_all() takes attribute filters of assorted types
         # through **kwargs, so this can't be narrowed to dict[str, str]
         filter_kwargs: dict[str, Any] = {}
-
-        # Parse matches out
-        # Tag doesn't use a capture group so take match 0 instead of 1,
-        # the others need to use 1
-        if tag is not None:
-            filter_kwargs["name"] = tag.group(0).lower()
-
-        if id_match is not None:
-            filter_kwargs["id"] = id_match.group(1)
-
-        if class_names:
-            filter_kwargs["class"] = " ".join(class_names)
-
-        # Parse index out
-        # First match is an optional -
-        # Second match is the number
-        if index is not None:
-            sign = 1
-            if index.group(1):
-                sign = -1
-
-            index = int(index.group(2)) * sign
-        else:
-            # Take the first arg, but if an index was specified as a parameter
-            # and this is the last part of the path, then use that index
-            index = 0 if path_stack else ind
+        if step.name is not None:
+            filter_kwargs["name"] = step.name
+        if step.tag_id is not None:
+            filter_kwargs["id"] = step.tag_id
+        if step.classes:
+            filter_kwargs["class"] = " ".join(step.classes)
+
+        # Take the first match, but if an index was specified as a parameter
+        # and this is the last part of the path, then use that index
+        index = step.index
+        if index is None:
+            index = ind if last else 0
 
         # Apply kwargs to the end of the path only,
         # and the path takes priority so it overrides the others
-        if not path_stack:
+        if last:
             filter_kwargs = kwargs | filter_kwargs
 
         # Apply filters & find a matching element
-        # Only use from_root if we haven't moved at least once, otherwise never go recursive
-        # find_all() is typed as yielding PageElement, but filtering on a name only matches Tags
-        matches = cast(
-            "list[Tag]", current_element.find_all(recursive=not from_root if not moved else False, **filter_kwargs)
-        )
+        # Only use from_root for the first step, the ones after it never go recursive
+        name = filter_kwargs.pop("name", None)
+        matches = find_tags(current_element, name, recursive=not (from_root or step.direct), **filter_kwargs)
 
         # No matches found, or not enough
         if not matches or len(matches) <= index:
             return None
 
         # End of path reached
-        if not path_stack:
+        if last:
             # Return all matches
             if match_multiple:
                 return matches
@@ -174,10 +229,9 @@ def find_emmet(
 
         # Set current node to the one at the requested index & keep going
         current_element = matches[index]
-        moved = True
 
-    # Unreachable: path.split(">") always yields at least one entry, so the loop runs at
-    # least once, and every path through its body returns
+    # Unreachable: path.split(">") always yields at least one entry, so there is at least one
+    # step, and the last one always returns
     return None
 
 
@@ -185,17 +239,24 @@ def compare_content(first: str, second: str, case_insensitive: bool = False) ->
     """Check if content of two strings is equal, ignoring all whitespace"""
     # Remove all leading/trailing whitespace, and replace all other whitespace by single spaces
     # in both argument and content
-    element_text = first.strip()
-    arg_text = second.strip()
+    return normalize_content(first, case_insensitive) == normalize_content(second, case_insensitive)
+
 
-    element_text = re.sub(r"\s+", " ", element_text)
-    arg_text = re.sub(r"\s+", " ", arg_text)
+def element_text(tag: Tag) -> str:
+    """tag.text, remembered by the index of its document"""
+    index = index_for(tag)
+    return tag.text if index is None else index.text(tag)
 
-    if case_insensitive:
-        element_text = element_text.lower()
-        arg_text = arg_text.lower()
 
-    return element_text == arg_text
+def content_matches(tag: Tag, content: str, case_insensitive: bool = False, index: DomIndex | None = None) -> bool:
+    """compare_content() of the text of tag and content, with the normalized text of tag remembered
+    by the index of its document, pass the index when checking many tags of the same document"""
+    if index is None:
+        index = index_for(tag)
+    tag_content = (
+        normalize_content(tag.text, case_insensitive) if index is None else index.content(tag, case_insensitive)
+    )
+    return tag_content == normalize_content(content, case_insensitive)
 
 
 def contains_comment(element: BeautifulSoup | Tag | None, comment: str | None = None) -> bool:
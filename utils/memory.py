@@ -0,0 +1,160 @@
+"""
+Memory budget of a judgement, so a huge submission gets a message instead of the judge being killed
+
+When Dodona's memory limit is exceeded the container is killed, and the student only sees "memory limit exceeded".
+Every tree of a submission takes many times its size: a generated table or a pasted data URI can easily need
+more memory than the limit allows. Before any tree is built, the cost of the submission is estimated from its
+size and its number of tags, and what doesn't fit in the budget is left out: the similarity to the solution,
+the rendering and, when not even the checklist fits, the whole judgement.
+The estimate can be off, so a soft limit makes allocations fail with a MemoryError before the container is killed.
+
+    JUDGE_HTML_DEBUG=1    writes the peak memory use after every stage of the judgement to stderr
+"""
+
+import os
+import resource
+import sys
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+
+from dodona.dodona_command import DodonaException, ErrorType, MessageFormat
+from dodona.dodona_config import DodonaConfig
+from dodona.translator import Translator
+
+# Share of the memory limit the judgement plans to use, the rest is room for a wrong estimate
+MEMORY_BUDGET = 0.8
+# Share of the memory limit past which allocations fail
+SOFT_LIMIT = 0.9
+
+# Bytes a stage takes per character and per tag of the submission, measured on large submissions
+CHECKLIST_PER_CHAR = 21
+CHECKLIST_PER_TAG = 1800
+RENDER_PER_CHAR = 5
+RENDER_PER_TAG = 250
+SIMILARITY_PER_TAG = 100
+
+
+def peak_rss() -> int:
+    """the most memory the process has used so far, in bytes"""
+    # kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def rss() -> int:
+    """the memory the process uses now, in bytes, the peak so far where that can't be read"""
+    try:
+        return int(Path("/proc/self/statm").read_text().split()[1]) * resource.getpagesize()
+    except OSError:
+        return peak_rss()
+
+
+def report(stage: str):
+    """write the peak memory use so far to stderr, when JUDGE_HTML_DEBUG is set"""
+    if os.environ.get("JUDGE_HTML_DEBUG"):
+        sys.stderr.write(f"peak memory after {stage}: {peak_rss() / 2**20:.1f} MiB\n")
+
+
+@dataclass(frozen=True)
+class DocumentCost:
+    """the memory the stages of judging a document are expected to take, from a scan that builds no tree"""
+
+    size: int
+    tags: int
+
+    @classmethod
+    def of(cls, content: str) -> "DocumentCost":
+        return cls(len(content), content.count("<"))
+
+    def checklist(self) -> int:
+        """the trees of the suites and the validators"""
+        return self.size * CHECKLIST_PER_CHAR + self.tags * CHECKLIST_PER_TAG
+
+    def render(self) -> int:
+        """the tree and the html prep_render() makes"""
+        return self.size * RENDER_PER_CHAR + self.tags * RENDER_PER_TAG
+
+    def similarity(self) -> int:
+        """the tags and classes get_similarity() compares"""
+        return self.tags * SIMILARITY_PER_TAG
+
+
+@dataclass(frozen=True)
+class Strategy:
+    """the stages of the judgement that fit in the memory budget"""
+
+    checklist: bool = True
+    render: bool = True
+    similarity: bool = True
+
+
+FULL_STRATEGY = Strategy()
+
+
+class MemoryBudget:
+    """the memory a judgement can use, from the memory limit of the config"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+
+    @classmethod
+    def from_config(cls, config: DodonaConfig) -> "MemoryBudget | None":
+        """the budget for the memory limit of config, None when it has none"""
+        if config.memory_limit <= 0:
+            return None
+        return cls(config.memory_limit)
+
+    def strategy(self, content: str, used: int | None = None) -> Strategy:
+        """the stages that fit for a document, on top of the memory already used (by default: now)"""
+        cost = DocumentCost.of(content)
+        available = self.limit * MEMORY_BUDGET - (rss() if used is None else used) - cost.checklist()
+        if available < 0:
+            return Strategy(checklist=False, render=False, similarity=False)
+
+        render = cost.render() <= available
+        if render:
+            available -= cost.render()
+        return Strategy(render=render, similarity=cost.similarity() <= available)
+
+    def workers(self, wanted: int, used: int | None = None) -> int:
+        """how many of wanted forked copies of this process fit next to it in the budget,
+        when each of them can grow as large as this process is now (by default)"""
+        used = rss() if used is None else used
+        fits = int(self.limit * MEMORY_BUDGET // max(used, 1)) - 1
+        return max(0, min(wanted, fits))
+
+    def set_soft_limit(self):
+        """make allocations past SOFT_LIMIT of the memory limit fail with a MemoryError,
+        never raises the limit the process already has"""
+        soft, hard = resource.getrlimit(resource.RLIMIT_DATA)
+        limit = int(self.limit * SOFT_LIMIT)
+        if hard != resource.RLIM_INFINITY:
+            limit = min(limit, hard)
+        if soft == resource.RLIM_INFINITY or limit < soft:
+            resource.setrlimit(resource.RLIMIT_DATA, (limit, hard))
+
+
+def release_soft_limit():
+    """lift the soft limit up to the hard one, so there is memory left to report a MemoryError"""
+    _, hard = resource.getrlimit(resource.RLIMIT_DATA)
+    resource.setrlimit(resource.RLIMIT_DATA, (hard, hard))
+
+
+def too_large(translator: Translator) -> DodonaException:
+    """the exception that ends the judgement of a submission that doesn't fit in memory"""
+    return DodonaException(
+        translator.error_status(ErrorType.MEMORY_LIMIT_EXCEEDED),
+        description=translator.translate(Translator.Text.SUBMISSION_TOO_LARGE),
+        format=MessageFormat.TEXT,
+    )
+
+
+@contextmanager
+def memory_errors(natural_language: str) -> Iterator[None]:
+    """end the judgement with a message to the student when the block runs out of memory"""
+    try:
+        yield
+    except MemoryError:
+        release_soft_limit()
+        raise too_large(Translator.from_str(natural_language)) from None
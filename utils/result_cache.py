@@ -0,0 +1,151 @@
+"""
+Cache of judgements, so a submission that was judged before is answered by replaying its output
+
+A judgement is looked up by the hash of everything it depends on: the submission, every file of the
+evaluation directory, the config Dodona passed (without the paths that change between runs) and the
+code of the judge itself. The cache is a SQLite file, shared by every judge that is given the same path.
+Nothing in here raises: when the cache can't be read or written, the submission is just judged.
+"""
+
+import contextlib
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections.abc import Iterator
+from functools import cache
+from pathlib import Path
+
+from dodona.dodona_config import DodonaConfig
+
+# Upper bound on the total size of the recorded outputs, the least recently used ones are removed first
+RESULT_CACHE_SIZE = 256 * 1024 * 1024
+
+# The judge's own code and data, a change to any of these can change a judgement
+_JUDGE_DIR = Path(__file__).resolve().parent.parent
+_JUDGE_FILES = ("*.py", "dodona/*.py", "exceptions/*.py", "utils/*.py", "validators/*.py", "validators/*.json")
+
+# Paths that differ between runs of the same judgement
+_IGNORED_CONFIG = frozenset({"resources", "source", "judge", "workdir", "translator"})
+
+
+@cache
+def judge_version() -> str:
+    """hash of the code of the judge"""
+    digest = hashlib.sha256()
+    for path in sorted(path for pattern in _JUDGE_FILES for path in _JUDGE_DIR.glob(pattern)):
+        digest.update(f"{path.relative_to(_JUDGE_DIR)}\0".encode())
+        digest.update(path.read_bytes())
+    return digest.hexdigest()
+
+
+def result_key(config: DodonaConfig) -> str:
+    """hash of everything the judgement of the submission in config depends on,
+    raises OSError when the submission or the evaluation directory can't be read"""
+    digest = hashlib.sha256()
+    digest.update(judge_version().encode())
+
+    settings = {name: value for name, value in vars(config).items() if name not in _IGNORED_CONFIG}
+    digest.update(json.dumps(settings, sort_keys=True, default=vars).encode())
+
+    resources = Path(config.resources)
+    for path in sorted(path for path in resources.rglob("*") if path.is_file()):
+        digest.update(f"\0{path.relative_to(resources)}\0".encode())
+        digest.update(path.read_bytes())
+
+    digest.update(b"\0submission\0")
+    digest.update(Path(config.source).read_bytes())
+    return digest.hexdigest()
+
+
+class _Tee(io.TextIOBase):
+    """writes everything to two streams"""
+
+    def __init__(self, first, second):
+        self.first = first
+        self.second = second
+
+    def write(self, s: str) -> int:
+        self.first.write(s)
+        return self.second.write(s)
+
+    def flush(self):
+        self.first.flush()
+
+
+@contextlib.contextmanager
+def recording() -> Iterator[io.StringIO]:
+    """record what is written to stdout in the block, while still writing it there"""
+    output = io.StringIO()
+    with contextlib.redirect_stdout(_Tee(sys.stdout, output)):
+        yield output
+
+
+class ResultCache:
+    """the judgements in a SQLite file, by result_key()"""
+
+    def __init__(self, path: str | Path, size: int = RESULT_CACHE_SIZE):
+        self.path = Path(path)
+        self.size = size
+
+    @classmethod
+    def from_environment(cls) -> "ResultCache | None":
+        """the cache at JUDGE_HTML_RESULT_CACHE, None when it isn't set"""
+        path = os.environ.get("JUDGE_HTML_RESULT_CACHE")
+        return cls(path) if path else None
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        connection = sqlite3.connect(self.path, timeout=10)
+        try:
+            with connection:
+                connection.execute(
+                    "CREATE TABLE IF NOT EXISTS results "
+                    "(key TEXT PRIMARY KEY, output TEXT NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+                )
+                connection.execute("CREATE TABLE IF NOT EXISTS stats (name TEXT PRIMARY KEY, count INTEGER NOT NULL)")
+                yield connection
+        finally:
+            connection.close()
+
+    @staticmethod
+    def _count(connection: sqlite3.Connection, name: str):
+        connection.execute(
+            "INSERT INTO stats VALUES (?, 1) ON CONFLICT (name) DO UPDATE SET count = count + 1", (name,)
+        )
+
+    def get(self, key: str) -> str | None:
+        """the recorded output of the judgement, None if it isn't in the cache"""
+        with contextlib.suppress(sqlite3.Error, OSError), self._connect() as connection:
+            row = connection.execute("SELECT output FROM results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self._count(connection, "misses")
+                return None
+            # Last used now, so eviction keeps it around
+            connection.execute("UPDATE results SET used = ? WHERE key = ?", (time.time(), key))
+            self._count(connection, "hits")
+            return row[0]
+        return None
+
+    def put(self, key: str, output: str):
+        """record the output of a judgement, and remove the least recently used ones past the size of the cache"""
+        with contextlib.suppress(sqlite3.Error, OSError), self._connect() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)", (key, output, len(output), time.time())
+            )
+            connection.execute(
+                "DELETE FROM results WHERE key IN (SELECT key FROM "
+                "(SELECT key, SUM(size) OVER (ORDER BY used DESC, key) AS total FROM results) WHERE total > ?)",
+                (self.size,),
+            )
+
+    def stats(self) -> dict[str, int]:
+        """the number of hits and misses, and of judgements in the cache"""
+        stats = {"hits": 0, "misses": 0, "results": 0}
+        with contextlib.suppress(sqlite3.Error, OSError), self._connect() as connection:
+            stats.update(connection.execute("SELECT name, count FROM stats").fetchall())
+            stats["results"] = connection.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+        return stats
@@ -0,0 +1,385 @@
+"""
+right-to-left css selector matching, the way browsers do it
+
+Every selector is split into compound selectors (ex: div.main#nav) joined by combinators (' ', '>', '+', '~').
+Selectors are put in a bucket by the id, class or tag of their rightmost compound, so an element only has to
+be checked against the selectors that could apply to it, instead of against every selector in the sheet.
+A candidate is matched from right to left: first against the element itself, then against its parents or
+preceding siblings, depending on the combinators. Before that, the ids, classes & tags the selector needs on
+the element's ancestors are compared to those its ancestors have, which rules out most candidates at once
+(browsers use a bloom filter for this, a set does the job here).
+
+The results are exactly those of the xpath cssselect's GenericTranslator makes for the selector, quirks
+included, because CssValidator used that xpath long before this module existed:
+    * tag and attribute names are case-sensitive
+    * pseudo-classes like :hover never match, unless the selector's xpath ends in [0] (see css_validator.py)
+    * [attr^=""], [attr$=""], [attr*=""] and classes containing whitespace never match
+Selectors this module doesn't handle (:not(), :nth-child(), :first-child, namespaces, ...) make
+parse_selector() return None, the caller evaluates those with xpath instead.
+
+USAGE:
+>>> index = SelectorIndex()
+>>> index.add(parse_selector("ul > li.active"), "some value")
+>>> list(index.match(root))  # root is an lxml element
+[(<Element li>, 'some value')]
+"""
+
+import re
+from collections.abc import Callable, Iterator
+from functools import lru_cache
+from typing import NamedTuple, cast
+
+from cssselect import GenericTranslator, SelectorError, parse
+from cssselect.parser import Attrib, Class, CombinedSelector, Element, Hash, Pseudo, Tree
+from lxml.etree import _Element
+
+# Upper bound on the number of selectors parse_selector() keeps around
+PARSE_CACHE_SIZE = 4096
+
+# XPath's normalize-space() only treats these four as whitespace
+_xml_whitespace = re.compile(r"[ \t\r\n]+")
+
+# What cssselect accepts in a class name or ~= value, see cssselect.xpath.is_non_whitespace
+_non_whitespace = re.compile(r"^[^ \t\r\n\f]+$")
+
+# Names cssselect uses as they are, other names get a name() test that changes the shape of the xpath
+_safe_name = re.compile(r"^[a-zA-Z_][a-zA-Z0-9_.-]*$")
+
+_translator = GenericTranslator()
+
+type Test = Callable[[_Element], bool]
+
+
+class _Unsupported(Exception):
+    """Thrown while parsing a selector that has to be matched with xpath instead"""
+
+
+class _Never:
+    """A condition that never matches, cssselect translates these to the xpath condition 0"""
+
+
+_NEVER = _Never()
+
+
+class Compound(NamedTuple):
+    """a compound selector, ex: div.main#nav[lang]
+    tag and id are None if the compound doesn't require one"""
+
+    tag: str | None
+    id: str | None
+    classes: frozenset[str]
+    tests: tuple[Test, ...]
+
+
+class Selector(NamedTuple):
+    """a parsed selector, the compounds go from right to left,
+    combinators[i] is the combinator between compounds[i] and compounds[i + 1]
+    ancestors are the keys (see keys()) the ancestors of a matching element must have between them
+    a selector without compounds never matches anything"""
+
+    compounds: tuple[Compound, ...]
+    combinators: tuple[str, ...]
+    ancestors: frozenset[str]
+
+
+NEVER = Selector((), (), frozenset())
+
+
+def normalize_space(value: str) -> str:
+    """the python version of the xpath function normalize-space()"""
+    return _xml_whitespace.sub(" ", value).strip(" ")
+
+
+def class_tokens(element: _Element) -> frozenset[str]:
+    """the class names of an element"""
+    return frozenset(normalize_space(element.get("class", "")).split(" ")) - {""}
+
+
+def keys(tag: str | None, element_id: str | None, classes: frozenset[str]) -> set[str]:
+    """the keys for the ancestor filter, tag names can't start with # or . so they can't clash"""
+    result = {f".{class_name}" for class_name in classes}
+    if tag is not None:
+        result.add(tag)
+    if element_id is not None:
+        result.add(f"#{element_id}")
+    return result
+
+
+@lru_cache
+def _is_never_pseudo(ident: str) -> bool:
+    """checks whether cssselect translates a pseudo-class to a condition that never matches"""
+    try:
+        return _translator.xpath(Pseudo(Element(), ident)).condition == "0"
+    except SelectorError:
+        return False
+
+
+def _attribute_test(selector: Attrib) -> Test | _Never:
+    """converts an attribute selector to a test, mirroring cssselect's xpath_attrib_* methods"""
+    if selector.namespace:
+        raise _Unsupported
+
+    name = selector.attrib
+    operator = selector.operator
+
+    if operator == "exists":
+        return lambda el: el.get(name) is not None
+
+    value = cast("str", selector.value.value) if selector.value is not None else ""
+
+    def attr(el: _Element) -> str | None:
+        return el.get(name)
+
+    if operator == "=":
+        return lambda el: attr(el) == value
+    if operator == "!=":
+        if value:
+            return lambda el: attr(el) != value
+        # without a value, cssselect drops the not(@attr) part
+        return lambda el: attr(el) not in {None, value}
+    if operator == "~=":
+        if not _non_whitespace.match(value):
+            return _NEVER
+        return lambda el: (v := attr(el)) is not None and value in normalize_space(v).split(" ")
+    if operator == "|=":
+        return lambda el: (v := attr(el)) is not None and (v == value or v.startswith(f"{value}-"))
+    if not value:
+        # ^=, $= and *= with an empty value
+        return _NEVER
+    if operator == "^=":
+        return lambda el: (v := attr(el)) is not None and v.startswith(value)
+    if operator == "$=":
+        return lambda el: (v := attr(el)) is not None and v.endswith(value)
+    if operator == "*=":
+        return lambda el: (v := attr(el)) is not None and value in v
+    raise _Unsupported
+
+
+def _conditions(compound: Tree) -> tuple[Element, list[Tree]]:
+    """splits a compound selector in its type selector & the other simple selectors,
+    in the order cssselect turns them into xpath conditions"""
+    conditions: list[Tree] = []
+    while isinstance(compound, (Class, Hash, Attrib, Pseudo)):
+        conditions.append(compound)
+        compound = compound.selector
+
+    # Negation, Function, Matching, Relation, ...
+    if not isinstance(compound, Element):
+        raise _Unsupported
+
+    conditions.reverse()
+    return compound, conditions
+
+
+def _compile_compound(element: Element, conditions: list[Tree]) -> Compound | _Never:
+    """converts the parts of a compound selector to a Compound"""
+    if element.namespace or (element.element and not _safe_name.match(element.element)):
+        raise _Unsupported
+
+    compound_id = None
+    classes: set[str] = set()
+    tests: list[Test] = []
+    for condition in conditions:
+        if isinstance(condition, Hash):
+            if compound_id is None:
+                compound_id = condition.id
+            else:
+                tests.append(lambda el, v=condition.id: el.get("id") == v)
+        elif isinstance(condition, Class):
+            if not _non_whitespace.match(condition.class_name):
+                return _NEVER
+            classes.add(condition.class_name)
+        elif isinstance(condition, Attrib):
+            test = _attribute_test(condition)
+            if isinstance(test, _Never):
+                return _NEVER
+            tests.append(test)
+        elif isinstance(condition, Pseudo) and _is_never_pseudo(condition.ident):
+            return _NEVER
+        else:
+            raise _Unsupported
+
+    return Compound(element.element or None, compound_id, frozenset(classes), tuple(tests))
+
+
+@lru_cache(maxsize=PARSE_CACHE_SIZE)
+def parse_selector(selector_str: str) -> Selector | None:
+    """parses a single css selector (no commas) for right-to-left matching,
+    returns None if the selector has to be matched with xpath instead"""
+    try:
+        parsed = parse(selector_str)
+    except SelectorError:
+        return None
+
+    if len(parsed) != 1 or parsed[0].pseudo_element is not None:
+        return None
+
+    # CombinedSelectors nest to the left, so peeling them off goes from right to left
+    tree = parsed[0].parsed_tree
+    parts: list[Tree] = []
+    combinators: list[str] = []
+    while isinstance(tree, CombinedSelector):
+        parts.append(tree.subselector)
+        combinators.append(tree.combinator)
+        tree = tree.selector
+    parts.append(tree)
+
+    if any(c not in {" ", ">", "+", "~"} for c in combinators):
+        return None
+
+    compounds: list[Compound] = []
+    try:
+        for i, part in enumerate(parts):
+            element, conditions = _conditions(part)
+
+            # Rule strips a trailing [0] from the xpath of a selector with a pseudo-class, which is what
+            # the rightmost compound turns into when its only condition never matches. The + combinator
+            # adds a condition of its own, so there is nothing to strip there.
+            if (
+                i == 0
+                and ":" in selector_str
+                and len(conditions) == 1
+                and (not combinators or combinators[0] != "+")
+                and isinstance(_compile_compound(Element(), conditions), _Never)
+            ):
+                conditions = []
+
+            compound = _compile_compound(element, conditions)
+            if isinstance(compound, _Never):
+                return NEVER
+            compounds.append(compound)
+    except _Unsupported:
+        return None
+
+    # The compounds left of a descendant or child combinator match ancestors of the element. Those left of
+    # a sibling combinator don't, but the ancestors of a sibling are ancestors of the element as well.
+    ancestors: set[str] = set()
+    for compound, combinator in zip(compounds[1:], combinators, strict=True):
+        if combinator in {" ", ">"}:
+            ancestors |= keys(compound.tag, compound.id, compound.classes)
+
+    return Selector(tuple(compounds), tuple(combinators), frozenset(ancestors))
+
+
+class SelectorIndex[T]:
+    """selectors bucketed by the id, class or tag of their rightmost compound (in that order of preference),
+    each selector is stored together with an item of the caller's choice"""
+
+    def __init__(self):
+        self._by_id: dict[str, list[tuple[Selector, T]]] = {}
+        self._by_class: dict[str, list[tuple[Selector, T]]] = {}
+        self._by_tag: dict[str, list[tuple[Selector, T]]] = {}
+        self._universal: list[tuple[Selector, T]] = []
+
+    def add(self, selector: Selector, item: T):
+        """add a selector to the index"""
+        # Never matches, so it doesn't need a bucket either
+        if not selector.compounds:
+            return
+
+        rightmost = selector.compounds[0]
+        if rightmost.id is not None:
+            self._by_id.setdefault(rightmost.id, []).append((selector, item))
+        elif rightmost.classes:
+            self._by_class.setdefault(min(rightmost.classes), []).append((selector, item))
+        elif rightmost.tag is not None:
+            self._by_tag.setdefault(rightmost.tag, []).append((selector, item))
+        else:
+            self._universal.append((selector, item))
+
+    def match(self, root: _Element) -> Iterator[tuple[_Element, T]]:
+        """find the elements each selector matches, when evaluated from root (like xpath would)"""
+        return _DocumentMatcher(root).run(self)
+
+    def candidates(self, element: _Element, classes: frozenset[str]) -> Iterator[tuple[Selector, T]]:
+        """the selectors that could match an element, every selector is only in one bucket"""
+        element_id = element.get("id")
+        if element_id is not None:
+            yield from self._by_id.get(element_id, [])
+        for class_name in classes:
+            yield from self._by_class.get(class_name, [])
+        yield from self._by_tag.get(cast("str", element.tag), [])
+        yield from self._universal
+
+
+class _DocumentMatcher:
+    """matches selectors against the elements of one html-document"""
+
+    def __init__(self, root: _Element):
+        self.root = root
+        self.document = root.getroottree().getroot()
+        # Like the xpath, the leftmost compound has to match root or one of its descendants.
+        # None means every element is in scope.
+        self.scope: set[_Element] | None = None if root is self.document else set(root.iter())
+        self.classes: dict[_Element, frozenset[str]] = {}
+        # element -> the keys of all of its ancestors
+        self.ancestors: dict[_Element, frozenset[str]] = {}
+        # (id of the selector, element, compound index) -> result, so backtracking over ancestors stays linear
+        self.memo: dict[tuple[int, _Element, int], bool] = {}
+
+    def run[T](self, index: SelectorIndex[T]) -> Iterator[tuple[_Element, T]]:
+        for element in self.document.iter():
+            # Skip comments & processing instructions, xpath's * only matches elements
+            if not isinstance(element.tag, str):
+                continue
+            ancestors = self.ancestor_keys(element)
+            for selector, item in index.candidates(element, self.class_tokens(element)):
+                if selector.ancestors <= ancestors and self.matches(selector, element, 0):
+                    yield element, item
+
+    def ancestor_keys(self, element: _Element) -> frozenset[str]:
+        # iter() visits parents before their children, so the parent's keys are known
+        parent = element.getparent()
+        if parent is None:
+            result = frozenset()
+        else:
+            own = keys(cast("str", parent.tag), parent.get("id"), self.class_tokens(parent))
+            result = self.ancestors[parent] | own
+        self.ancestors[element] = result
+        return result
+
+    def class_tokens(self, element: _Element) -> frozenset[str]:
+        if element not in self.classes:
+            self.classes[element] = class_tokens(element)
+        return self.classes[element]
+
+    def matches_compound(self, compound: Compound, element: _Element) -> bool:
+        if compound.tag is not None and element.tag != compound.tag:
+            return False
+        if compound.id is not None and element.get("id") != compound.id:
+            return False
+        if compound.classes and not compound.classes <= self.class_tokens(element):
+            return False
+        return all(test(element) for test in compound.tests)
+
+    def matches(self, selector: Selector, element: _Element, i: int) -> bool:
+        """checks whether compounds[i:] of the selector match, with compounds[i] matching element"""
+        if i == 0:
+            return self._matches(selector, element, i)
+
+        key = (id(selector), element, i)
+        if key not in self.memo:
+            self.memo[key] = self._matches(selector, element, i)
+        return self.memo[key]
+
+    def _matches(self, selector: Selector, element: _Element, i: int) -> bool:
+        if not self.matches_compound(selector.compounds[i], element):
+            return False
+
+        # Leftmost compound reached
+        if i == len(selector.combinators):
+            return self.scope is None or element in self.scope
+
+        combinator = selector.combinators[i]
+        if combinator == ">":
+            parent = element.getparent()
+            return parent is not None and self.matches(selector, parent, i + 1)
+        if combinator == " ":
+            return any(self.matches(selector, ancestor, i + 1) for ancestor in element.iterancestors())
+
+        siblings = (s for s in element.itersiblings(preceding=True) if isinstance(s.tag, str))
+        if combinator == "+":
+            previous = next(siblings, None)
+            return previous is not None and self.matches(selector, previous, i + 1)
+        # ~
+        return any(self.matches(selector, sibling, i + 1) for sibling in siblings)
@@ -0,0 +1,106 @@
+"""
+Tables of a parsed document, read once for every check on them
+
+The table checks of an element each looked up the rows of their table and the cells of every row again, and
+joined and normalized the text of every cell for every check. An exercise that checks a large table row by row
+did that for every row it checks. The cells of a table and of its rows are looked up once per document and kept
+by its index, with their text the way compare_content() compares it.
+
+The cells are the ones the checks have always compared: the <td>s below a <tr> and the <th>s below a <table>,
+one per tag. A cell spanning more rows or columns is still a single cell, as an exercise writes it in the
+expected content, so rowspan and colspan don't change what a table is compared to.
+"""
+
+from dataclasses import dataclass, field
+from weakref import WeakKeyDictionary
+
+from bs4.element import Tag
+
+from utils.document import index_for
+from utils.dom_index import DomIndex, normalize_content
+from utils.html_navigation import find_tags
+
+
+@dataclass
+class Cells:
+    """the cells of a row or of the header of a table"""
+
+    tags: list[Tag]
+    index: DomIndex | None = field(default=None, repr=False)
+    # case insensitive -> the normalized text of every cell, filled in on use
+    _contents: dict[bool, list[str]] = field(default_factory=dict, repr=False)
+
+    def contents(self, case_insensitive: bool = False) -> list[str]:
+        """the text of every cell, normalized like compare_content() does"""
+        contents = self._contents.get(case_insensitive)
+        if contents is None:
+            index = self.index
+            contents = self._contents[case_insensitive] = [
+                normalize_content(tag.text, case_insensitive) if index is None else index.content(tag, case_insensitive)
+                for tag in self.tags
+            ]
+        return contents
+
+    def matches(self, expected: list[str], case_insensitive: bool = False) -> bool:
+        """the same number of cells, each with the expected content"""
+        return len(self.tags) == len(expected) and all(
+            actual == normalize_content(content, case_insensitive)
+            for actual, content in zip(self.contents(case_insensitive), expected, strict=True)
+        )
+
+
+@dataclass
+class Table:
+    """the header and the rows of a table, the rows in document order, the header row as well"""
+
+    header: Cells
+    rows: list[Cells]
+
+
+class _Tables:
+    """the tables and rows of one document that were asked for, by their number in its index"""
+
+    def __init__(self, index: DomIndex):
+        self.index = index
+        self.tables: dict[int, Table] = {}
+        self.rows: dict[int, Cells] = {}
+
+
+_documents: WeakKeyDictionary[DomIndex, _Tables] = WeakKeyDictionary()
+
+
+def _tables(tag: Tag) -> tuple[_Tables, int] | None:
+    index = index_for(tag)
+    number = None if index is None else index.number(tag)
+    if index is None or number is None:
+        return None
+    tables = _documents.get(index)
+    if tables is None:
+        tables = _documents[index] = _Tables(index)
+    return tables, number
+
+
+def row_cells(tr: Tag) -> Cells:
+    """the <td>s of a row, kept for a row of a parsed document"""
+    found = _tables(tr)
+    if found is None:
+        return Cells(find_tags(tr, "td"))
+    tables, number = found
+    cells = tables.rows.get(number)
+    if cells is None:
+        cells = tables.rows[number] = Cells(find_tags(tr, "td"), tables.index)
+    return cells
+
+
+def table_model(table: Tag) -> Table:
+    """the <th>s and the rows of a table, kept for a table of a parsed document"""
+    found = _tables(table)
+    if found is None:
+        return Table(Cells(find_tags(table, "th")), [row_cells(tr) for tr in find_tags(table, "tr")])
+    tables, number = found
+    model = tables.tables.get(number)
+    if model is None:
+        model = tables.tables[number] = Table(
+            Cells(find_tags(table, "th"), tables.index), [row_cells(tr) for tr in find_tags(table, "tr")]
+        )
+    return model
@@ -3,9 +3,10 @@
 import re
 from collections import deque
 from collections.abc import Callable, Iterable, Iterator
+from contextlib import nullcontext
 from copy import copy
 from dataclasses import dataclass, field
-from typing import TypeVar, cast, overload
+from typing import TYPE_CHECKING, TypeVar, cast, overload
 from urllib.parse import urlsplit
 
 from bs4 import BeautifulSoup
@@ -19,12 +20,26 @@ from exceptions.double_char_exceptions import LocatableDoubleCharError, Multiple
 from exceptions.html_exceptions import LocatableHtmlValidationError, Warnings
 from exceptions.structure_exceptions import NotTheSame
 from exceptions.utils import EvaluationAborted
+from utils.deadline import Deadline
+from utils.document import ParsedDocument, parse_document
 from utils.flatten import flatten_queue
-from utils.html_navigation import compare_content, contains_comment, find_child, find_emmet, match_emmet
+from utils.html_navigation import (
+    contains_comment,
+    content_matches,
+    element_text,
+    find_child,
+    find_emmet,
+    find_parent,
+    find_tags,
+    match_emmet,
+)
 from utils.regexes import doctype_re
-from validators.css_validator import AmbiguousXpath, CssParsingError, CssValidator, ElementNotFound, Rule
+from utils.tables import row_cells, table_model
+from validators.css_validator import CssParsingError, CssValidator, ElementNotFound, Rule
 from validators.html_validator import HtmlValidator
-from validators.structure_validator import compare, get_similarity
+
+if TYPE_CHECKING:
+    from validators.structure_validator import CompiledSolution
 
 # Custom type hints
 Emmet = TypeVar("Emmet", bound=str)
@@ -155,8 +170,7 @@ class Element:
             matches = emmet_matches
         elif tag is not None:
             # If a tag was specified, only search for those
-            # find_all() is typed as yielding PageElement, but a name filter only matches Tags
-            matches = cast("list[Tag]", self._element.find_all(tag, recursive=not direct, **kwargs))
+            matches = find_tags(self._element, tag, recursive=not direct, **kwargs)
         else:
             # Otherwise, use all children instead
             children = self._element.children if direct else self._element.descendants
@@ -197,7 +211,7 @@ class Element:
             if self._element is None:
                 return False
 
-            first_matching_parent = self._element.find_parent(name=tag, **kwargs)
+            first_matching_parent = find_parent(self._element, tag, **kwargs)
 
             # No parents matched
             if first_matching_parent is None:
@@ -243,14 +257,16 @@ class Element:
         element = cast("Tag", self._element)
 
         def _inner(_: BeautifulSoup) -> bool:
+            element_content = element_text(element)
+
             # No text in this element
-            if element.text is None or len(element.text) == 0:
+            if len(element_content) == 0:
                 return False
 
             if text is not None:
-                return compare_content(element.text, text, case_insensitive)
+                return content_matches(element, text, case_insensitive)
 
-            return len(element.text.strip()) > 0
+            return len(element_content.strip()) > 0
 
         return Check(_inner)
 
@@ -412,15 +428,8 @@ class Element:
             if not self._has_tag("table"):
                 return False
 
-            # List of all headers in this table
-            ths = cast("list[Tag]", element.find_all("th"))
-
-            # Not the same amount of headers
-            if len(ths) != len(header):
-                return False
-
-            # Check if all headers have the same content in the same order
-            return all(compare_content(header[i], ths[i].text) for i in range(len(header)))
+            # All headers in this table, the same amount with the same content in the same order
+            return table_model(element).header.matches(header)
 
         return Check(_inner)
 
@@ -443,7 +452,7 @@ class Element:
             if not self._has_tag("table"):
                 return False
 
-            trs = cast("list[Tag]", element.find_all("tr"))
+            trs = table_model(element).rows
 
             # No rows found
             if not trs:
@@ -461,21 +470,8 @@ class Element:
             if len(trs) != len(rows):
                 return False
 
-            # Compare tds (actual data)
-            for i in range(len(rows)):
-                data = trs[i].find_all("td")
-
-                # Row doesn't have the same amount of tds
-                if len(data) != len(rows[i]):
-                    return False
-
-                # Compare content
-                for j in range(len(rows[i])):
-                    # Content doesn't match
-                    if not compare_content(data[j].text, rows[i][j], case_insensitive):
-                        return False
-
-            return True
+            # Compare tds (actual data): the same amount in every row, with the same content
+            return all(data.matches(row, case_insensitive) for data, row in zip(trs, rows, strict=True))
 
         return Check(_inner)
 
@@ -491,13 +487,8 @@ class Element:
             if not self._has_tag("tr"):
                 return False
 
-            tds = cast("list[Tag]", element.find_all("td"))
-
-            # Amount of items doesn't match up
-            if len(tds) != len(row):
-                return False
-
-            return all(compare_content(row[i], tds[i].text, case_insensitive) for i in range(len(row)))
+            # The same amount of tds, with the same content
+            return row_cells(element).matches(row, case_insensitive)
 
         return Check(_inner)
 
@@ -588,24 +579,9 @@ class Element:
         if not inherit:
             return css_validator.find(element, prop, pseudo)
 
-        current_element = element
-        prop_value = None
-
-        # Keep going higher up the tree until a match is found
-        while prop_value is None and current_element is not None:
-            # Check if the current element has this rule & applies it onto the child
-            prop_value = css_validator.find(current_element, prop, pseudo)
-
-            if prop_value is None:
-                # find_parents() is typed as yielding PageElement, but a parent is a Tag
-                parents = cast("list[Tag]", current_element.find_parents())
-
-                # find_parents() always returns the entire document as well,
-                # even when the current element is the root
-                # So at least 2 parents are required
-                current_element = None if len(parents) <= 2 else parents[0]
-
-        return prop_value
+        # Keep going higher up the tree until a match is found,
+        # the validator remembers what every element on the way resolved to
+        return css_validator.find_inherited(element, prop, pseudo)
 
     @css_check
     def has_styling(
@@ -910,15 +886,20 @@ class TestSuite:
     check_recommended: bool = True
     checklist: list[ChecklistItem] = field(default_factory=list)
     translations: dict[str, list[str]] = field(default_factory=dict)
+    _document: ParsedDocument = field(init=False)
     _bs: BeautifulSoup = field(init=False)
     _html_validator: HtmlValidator = field(init=False)
     _css_validator: CssValidator | None = field(init=False)
     _html_validated: bool = field(init=False)
     _css_validated: bool = field(init=False)
+    _similarity: bool = field(init=False)
 
     def __post_init__(self):
-        self._bs = BeautifulSoup(self.content, "html.parser")
+        # Shared with every other suite (and the validators) for the same content
+        self._document = parse_document(self.content)
+        self._bs = self._document.soup
         self._html_validated = False
+        self._similarity = True
 
         try:
             self._css_validator = CssValidator(self.content)
@@ -935,6 +916,12 @@ class TestSuite:
         """
         self._html_validator = HtmlValidator(config.translator, recommended=self.check_recommended)
 
+    def skip_similarity(self):
+        """Don't add the similarity to the solution when compare_to_solution fails
+        Used by the judge when there isn't enough memory left for it
+        """
+        self._similarity = False
+
     def html_is_valid(self) -> bool:
         """Return whether or not the HTML has been validated
         Avoids private property access
@@ -1028,8 +1015,10 @@ class TestSuite:
             if "nl" in self.translations:
                 self.translations["nl"].append("De CSS is geldig.")
 
-    def compare_to_solution(self, solution: str, translator: Translator, **kwargs) -> Check:
-        """Compare the submission to the solution html."""
+    def compare_to_solution(self, solution: "str | CompiledSolution", translator: Translator, **kwargs) -> Check:
+        """Compare the submission to the solution html, or to the solution made by prepare_solution()."""
+        # Local import: only exercises without an evaluator.py compare to a solution
+        from validators.structure_validator import compare, get_similarity  # noqa: PLC0415
 
         def _inner(_: BeautifulSoup):
             try:
@@ -1038,7 +1027,7 @@ class TestSuite:
                 description = err.message_str()
 
                 # Only calculate similarity for valid HTML
-                if self._html_validated:
+                if self._html_validated and self._similarity:
                     html_sim, css_sim = get_similarity(solution, self.content)
                     html_sim_str = (
                         f"\n HTML{translator.translate(Translator.Text.SIMILARITY)}: {round(html_sim * 100)}%"
@@ -1136,8 +1125,7 @@ class TestSuite:
 
             elements = emmet_elements
         else:
-            # find_all() is typed as yielding PageElement, but a name filter only matches Tags
-            elements = cast("list[Tag]", self._bs.find_all(tag, recursive=not from_root, **kwargs))
+            elements = find_tags(self._bs, tag, recursive=not from_root, **kwargs)
 
         return ElementContainer.from_tags(elements, self._css_validator)
 
@@ -1147,8 +1135,9 @@ class TestSuite:
             if language not in self.translations:
                 self.translations[language] = []
 
-    def evaluate(self, translator: Translator) -> int:
+    def evaluate(self, translator: Translator, deadline: Deadline | None = None) -> int:
         """Run the test suite, and print the Dodona output
+        :param deadline:    items that are not expected to finish before the deadline are not evaluated
         :returns:   the amount of failed tests
         :rtype:     int
         """
@@ -1179,9 +1168,19 @@ class TestSuite:
                         failed_tests += 1
                         continue
 
+                # Not enough time left for this item, the ones after it aren't evaluated either
+                if deadline is not None and not deadline.allows_next():
+                    with Message(
+                        description=translator.translate(translator.Text.TIME_BUDGET_EXHAUSTED),
+                        format=MessageFormat.TEXT,
+                    ):
+                        failed_tests += 1
+                        continue
+
                 # Can't set items on tuples so overwrite it
                 try:
-                    test_case.accepted = item.evaluate(self._bs, lang_abr)
+                    with deadline.track() if deadline is not None else nullcontext():
+                        test_case.accepted = item.evaluate(self._bs, lang_abr)
                 except EvaluationAborted:
                     # Crucial test failed, stop evaluation and let the next tests
                     # all be marked as wrong
@@ -1191,14 +1190,14 @@ class TestSuite:
                         description=translator.translate(translator.Text.TESTCASE_ABORTED), format=MessageFormat.TEXT
                     ):
                         pass
-                except (
-                    AmbiguousXpath,
-                    ElementNotFound,
-                ):
+                except ElementNotFound:
                     with Message(
                         description=translator.translate(translator.Text.AMBIGUOUS_XPATH), format=MessageFormat.TEXT
                     ):
                         pass
+                except MemoryError:
+                    # Not a failure of this item, the judge ends the judgement for it
+                    raise
                 except Exception:
                     # If anything else fails while evaluating, tell the student instead of crashing completely
                     with Message(
@@ -1295,7 +1294,7 @@ class BoilerplateTestSuite(TestSuite):
         self._default_translations["en"].append("The solution contains the minimal required HTML code.")
         self._default_translations["nl"].append("De oplossing bevat de minimale vereiste HTML-code.")
 
-    def evaluate(self, translator: Translator) -> int:
+    def evaluate(self, translator: Translator, deadline: Deadline | None = None) -> int:
         # Add minimal HTML template check
         if self.check_minimal:
             self._has_minimal_template()
@@ -1303,7 +1302,7 @@ class BoilerplateTestSuite(TestSuite):
         self._add_default_translations()
         self._add_default_checks()
 
-        return super().evaluate(translator)
+        return super().evaluate(translator, deadline)
 
 
 class HtmlSuite(BoilerplateTestSuite):
@@ -1376,7 +1375,7 @@ class _CompareSuite(HtmlSuite):
     def __init__(
         self,
         content: str,
-        solution: str,
+        solution: "str | CompiledSolution",
         config: DodonaConfig,
         check_recommended: bool = True,
         allow_warnings: bool = True,
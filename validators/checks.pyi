@@ -7,8 +7,11 @@ from bs4.element import Tag
 
 from dodona.dodona_config import DodonaConfig
 from dodona.translator import Translator
+from utils.deadline import Deadline
+from utils.document import ParsedDocument
 from validators.css_validator import CssValidator, Rule
 from validators.html_validator import HtmlValidator
+from validators.structure_validator import CompiledSolution
 
 # Custom type hints
 Emmet = TypeVar("Emmet", bound=str)
@@ -190,15 +193,18 @@ class TestSuite:
     check_recommended: bool = True
     checklist: list[ChecklistItem] = ...
     translations: dict[str, list[str]] = ...
+    _document: ParsedDocument = ...
     _bs: BeautifulSoup = ...
     _html_validator: HtmlValidator = ...
     _css_validator: CssValidator | None = ...
     _html_validated: bool = ...
     _css_validated: bool = ...
+    _similarity: bool = ...
 
     def __init__(self, name: str, content: str, check_recommended: bool = ...): ...
     def __post_init__(self): ...
     def create_validator(self, config: DodonaConfig): ...
+    def skip_similarity(self): ...
     def css_is_valid(self) -> bool: ...
     def html_is_valid(self) -> bool: ...
     def add_item(self, check: ChecklistItem):
@@ -221,8 +227,8 @@ class TestSuite:
     def add_check_validate_css_if_present(self):
         """Adds a check for CSS-validation only if there is some CSS supplied"""
 
-    def compare_to_solution(self, solution: str, translator: Translator, **kwargs) -> Check:
-        """Compare the submission to the solution html."""
+    def compare_to_solution(self, solution: str | CompiledSolution, translator: Translator, **kwargs) -> Check:
+        """Compare the submission to the solution html, or to the solution made by prepare_solution()."""
 
     def document_matches(self, regex: str, flags: int | RegexFlag = ...) -> Check:
         """Check that the student's submitted code matches a regex string."""
@@ -250,7 +256,7 @@ class TestSuite:
         """Get references to ALL HTML elements that match a query. Supports Emmet syntax through the tag parameter."""
 
     def _create_language_lists(self): ...
-    def evaluate(self, translator: Translator) -> int: ...
+    def evaluate(self, translator: Translator, deadline: Deadline | None = None) -> int: ...
 
 class BoilerplateTestSuite(TestSuite):
     _default_translations: dict[str, list[str]]
@@ -286,7 +292,7 @@ class _CompareSuite(HtmlSuite):
     def __init__(
         self,
         content: str,
-        solution: str,
+        solution: str | CompiledSolution,
         config: DodonaConfig,
         check_recommended: bool = True,
         allow_warnings: bool = True,
@@ -1,11 +1,13 @@
-from typing import Any, cast
+from collections.abc import Iterable, Iterator
+from enum import StrEnum
+from functools import lru_cache
+from typing import TYPE_CHECKING, Any, NamedTuple, cast
 
 import tinycss2
 import tinycss2.nth
 from bs4.element import Tag
 from cssselect import GenericTranslator, SelectorError
-from lxml.etree import _Element
-from lxml.html import fromstring
+from lxml.etree import XPath, XPathSyntaxError, _Element
 from tinycss2.ast import (
     Declaration,
     LiteralToken,
@@ -15,7 +17,11 @@ from tinycss2.ast import (
     WhitespaceToken,
 )
 
-from utils.color_converter import Color
+from utils.document import parse_document
+from utils.selector_matching import SelectorIndex, parse_selector
+
+if TYPE_CHECKING:
+    from utils.color_converter import Color
 
 """
 tinycss2 docs
@@ -67,42 +73,144 @@ class CssParsingError(Exception):
     """Thrown when the css is not in a correct format"""
 
 
+# The translator keeps no state between calls, so one instance serves every selector
+_translator = GenericTranslator()
+
+# Upper bound on the number of selectors compile_selector() keeps around. The same stylesheets
+# come back for every submission to an exercise, so this only has to fit a few of them.
+SELECTOR_CACHE_SIZE = 4096
+
+
+class SelectorEngine(StrEnum):
+    """how the selectors of a stylesheet are matched against an html-document, both give the same results"""
+
+    # every selector is evaluated as an xpath query over the whole document
+    XPATH = "xpath"
+    # every element is only checked against the selectors that could match it, see utils/selector_matching.py
+    RIGHT_TO_LEFT = "right-to-left"
+
+
 def _get_xpath(selector: str) -> str:
     """converts a css selector string to an xpath string"""
     try:
         # TODO filter out pseudo-elements (like or ::after)
-        return GenericTranslator().css_to_xpath(selector)
+        return _translator.css_to_xpath(selector)
     except SelectorError as err:
         raise CssParsingError from err
 
 
-class Rule:
-    """represents a single css rule"""
-
-    def __init__(self, selector: list[Node], content: Declaration):
-        self.selector = strip(selector)
-        self.selector_str = tinycss2.serialize(self.selector)
-        self.xpath = _get_xpath(self.selector_str)
-        if ":" in self.selector_str:
-            self.pseudo = self.selector_str.split(":")[1]
-            if self.xpath.endswith("[0]"):
-                self.xpath = self.xpath[: len(self.xpath) - 3]
-        else:
-            self.pseudo = None
-        self.name = content.name
-        self.value: list[Node] = strip(content.value)
-        self.important = content.important
-        self.specificity = calc_specificity(self.selector_str)
-        self.value_str = tinycss2.serialize(self.value)
-        self.color = None
-        if self.is_color():
+class CompiledSelector(NamedTuple):
+    """everything a Rule needs to know about its selector, see compile_selector()"""
+
+    xpath: str
+    matcher: XPath
+    pseudo: str | None
+    specificity: tuple[int, int, int]
+
+
+@lru_cache(maxsize=SELECTOR_CACHE_SIZE)
+def compile_selector(selector_str: str) -> CompiledSelector:
+    """translates a css selector string to a precompiled xpath (and its pseudo-class & specificity)
+    the result is cached for the whole process, so rules that share a selector share one matcher,
+    use compile_selector.cache_info() to see the hits and misses
+    """
+    xpath = _get_xpath(selector_str)
+    pseudo = None
+    if ":" in selector_str:
+        pseudo = selector_str.split(":")[1]
+        if xpath.endswith("[0]"):
+            xpath = xpath[: len(xpath) - 3]
+
+    try:
+        matcher = XPath(xpath)
+    except XPathSyntaxError as err:
+        raise CssParsingError from err
+
+    return CompiledSelector(xpath, matcher, pseudo, calc_specificity(selector_str))
+
+
+class CssDeclaration:
+    """a single declaration (ex: color: red !important) of a css block,
+    shared by every selector the block was defined for"""
+
+    __slots__ = ("color", "important", "name", "value_str")
+
+    def __init__(self, content: Declaration):
+        self.name: str = content.name
+        self.important: bool = content.important
+        # the tinycss2 nodes are only needed to serialize the value, don't hold on to them
+        self.value_str: str = tinycss2.serialize(strip(content.value))
+        self.color: Color | None = None
+        if "color" in self.name.lower():
+            # Local import: colour is only loaded once a stylesheet has a color in it
+            from utils import color_converter  # noqa: PLC0415
+
             try:
-                self.color = Color(self.value_str)
+                self.color = color_converter.Color(self.value_str)
             except (IndexError, ValueError) as err:
                 raise CssParsingError from err
 
+
+class SelectorGroup:
+    """a single css selector and all rules defined for it, in the order they were defined"""
+
+    __slots__ = ("compiled", "rules", "selector_str")
+
+    def __init__(self, selector_str: str):
+        self.selector_str = selector_str
+        self.compiled = compile_selector(selector_str)
+        self.rules: list[Rule] = []
+
+
+class Rule:
+    """represents a single css rule
+    this is a view on the selector it was defined for and one of its declarations,
+    many rules share the same SelectorGroup and CssDeclaration"""
+
+    # selector_str is stored on the rule itself, because prep_render() rewrites it per rule
+    __slots__ = ("declaration", "group", "order", "selector_str")
+
+    def __init__(self, group: SelectorGroup, declaration: CssDeclaration, order: int):
+        self.group = group
+        self.declaration = declaration
+        self.selector_str = group.selector_str
+        # position in the stylesheet, between rules of equal specificity the one defined last wins
+        self.order = order
+
+    @property
+    def xpath(self) -> str:
+        return self.group.compiled.xpath
+
+    @property
+    def matcher(self) -> XPath:
+        return self.group.compiled.matcher
+
+    @property
+    def pseudo(self) -> str | None:
+        return self.group.compiled.pseudo
+
+    @property
+    def specificity(self) -> tuple[int, int, int]:
+        return self.group.compiled.specificity
+
+    @property
+    def name(self) -> str:
+        return self.declaration.name
+
+    @property
+    def important(self) -> bool:
+        return self.declaration.important
+
+    @property
+    def value_str(self) -> str:
+        return self.declaration.value_str
+
+    @property
+    def color(self) -> "Color | None":
+        return self.declaration.color
+
     def __repr__(self):
-        return f"(Rule: {self.selector_str} | {self.name} {self.value} {'important' if self.important else ''})"
+        return f"(Rule: {self.selector_str} | {self.name} {self.value_str} {'important' if self.important else ''})"
 
     def is_color(self) -> bool:
         return "color" in self.name.lower()
@@ -114,8 +222,11 @@ class Rule:
         if not self.is_color():
             return False
 
+        # Local import: colour is only loaded once a stylesheet has a color in it
+        from utils import color_converter  # noqa: PLC0415
+
         try:
-            other = Color(color)
+            other = color_converter.Color(color)
         except ValueError:
             return False  # if the other color is not-parsable than it is the programmers fault
         return self.color == other
@@ -163,15 +274,80 @@ def calc_specificity(selector_str: str) -> tuple[int, int, int]:  # see https://
     return a, b, c
 
 
+def _overrules(challenger: Rule, dom_rule: Rule | None) -> bool:
+    """checks whether challenger wins from dom_rule (the dominating rule so far)"""
+    if dom_rule is None:
+        return True
+    # rules containing !important win from the ones that don't
+    if challenger.important != dom_rule.important:
+        return challenger.important
+    if challenger.specificity != dom_rule.specificity:
+        return challenger.specificity > dom_rule.specificity
+    # if equal specificity: the rule that was defined last wins
+    return challenger.order > dom_rule.order
+
+
+class Cascade:
+    """the dominating css rule per element of an html-document, for every property
+
+    Every distinct selector is evaluated against the document only once, instead of once per
+    rule for every query. After that, finding the rule for an element is a dictionary lookup.
+        by_pseudo:  element -> (property, pseudo) -> Rule, used by Rules.find
+        by_name:    element -> property -> Rule, regardless of the pseudo-class, used by Rules.find_all
+    """
+
+    def __init__(self, groups: Iterable[SelectorGroup], root: _Element, engine: SelectorEngine):
+        self.by_pseudo: dict[_Element, dict[tuple[str, str | None], Rule]] = {}
+        self.by_name: dict[_Element, dict[str, Rule]] = {}
+
+        # the order the matches come in doesn't matter, _overrules() decides on the rules alone
+        for element, group in _match(groups, root, engine):
+            by_pseudo = self.by_pseudo.setdefault(element, {})
+            by_name = self.by_name.setdefault(element, {})
+            for r in group.rules:
+                if _overrules(r, by_pseudo.get((r.name, r.pseudo))):
+                    by_pseudo[(r.name, r.pseudo)] = r
+
+                if _overrules(r, by_name.get(r.name)):
+                    by_name[r.name] = r
+
+
+def _match(
+    groups: Iterable[SelectorGroup], root: _Element, engine: SelectorEngine
+) -> Iterator[tuple[_Element, SelectorGroup]]:
+    """every element of the document rooted at root, with each group whose selector matches it"""
+    xpath_groups = list(groups)
+
+    if engine == SelectorEngine.RIGHT_TO_LEFT:
+        index: SelectorIndex[SelectorGroup] = SelectorIndex()
+        # selectors the right-to-left matcher doesn't handle still go through xpath
+        candidates, xpath_groups = xpath_groups, []
+        for group in candidates:
+            selector = parse_selector(group.selector_str)
+            if selector is None:
+                xpath_groups.append(group)
+            else:
+                index.add(selector, group)
+        yield from index.match(root)
+
+    for group in xpath_groups:
+        for element in cast("list[_Element]", group.compiled.matcher(root)):
+            yield element, group
+
+
 class Rules:
     """represents a set of css rules"""
 
     root: _Element
 
-    def __init__(self, css_content: str):
+    def __init__(self, css_content: str, engine: SelectorEngine = SelectorEngine.XPATH):
         """parses css to individual Rules"""
+        self.engine = engine
         self.rules: list[Rule] = []
+        # selector string -> its SelectorGroup, so every selector is only stored (and compiled) once
+        self.groups: dict[str, SelectorGroup] = {}
         self.map: dict[str, Any] = {}
+        self._cascades: dict[_Element, Cascade] = {}
 
         def split_on_comma(prelude: list[Node], start: int = 0) -> list[list[Node]]:
             """splits a list on LiteralToken with a value of a comma"""
@@ -193,11 +369,23 @@ class Rules:
         """convert a 'rule' made by tinycss2 to the Rule class I made"""
         for x in tinycss2.parse_stylesheet(css_content, skip_whitespace=True):
             if x.type == QualifiedRule.type:
-                content = [x for x in tinycss2.parse_declaration_list(x.content) if x.type == Declaration.type]
+                selectors = split_on_comma(x.prelude)
+                # a block without selectors doesn't apply to anything
+                if not selectors:
+                    continue
+                content = [
+                    CssDeclaration(x) for x in tinycss2.parse_declaration_list(x.content) if x.type == Declaration.type
+                ]
                 # flatten rules -> grouped selectors are seperated and then grouped rules are seperated
-                for selector in split_on_comma(x.prelude):
+                for selector in selectors:
+                    selector_str = tinycss2.serialize(selector)
+                    if selector_str not in self.groups:
+                        self.groups[selector_str] = SelectorGroup(selector_str)
+                    group = self.groups[selector_str]
                     for declaration in content:
-                        self.rules.append(Rule(selector, declaration))
+                        rule = Rule(group, declaration, len(self.rules))
+                        group.rules.append(rule)
+                        self.rules.append(rule)
             elif x.type == ParseError.type:
                 raise CssParsingError
 
@@ -207,91 +395,35 @@ class Rules:
     def __len__(self):
         return len(self.rules)
 
+    def cascade(self, root: _Element) -> Cascade:
+        """get the cascade of these rules over the html-document rooted at root,
+        it is built the first time a document is queried and reused afterwards"""
+        if root not in self._cascades:
+            self._cascades[root] = Cascade(self.groups.values(), root, self.engine)
+        return self._cascades[root]
+
     # of doing serialize() at the end, to access the !important property
     def find(self, root: _Element, solution_element: _Element, key: str, pseudo: str | None = None) -> Rule | None:
         """find the css rule for key (ex: color) for the solution_element,
         root is the root of the html-document (etree)"""
-        rs: list[Rule] = []
-        imp: list[Rule] = []
-        r: Rule
-        # find all rules defined for the solution element for the specified key
-        for r in reversed(self.rules):
-            if r.name == key and r.pseudo == pseudo:
-                for element in cast("list[_Element]", root.xpath(r.xpath)):
-                    if element == solution_element:
-                        if r.important:
-                            imp.append(r)
-                        else:
-                            rs.append(r)
-
-        # check if there are rules containing !important
-        if imp:
-            rs = imp
-
-        # no rules found
-        if not rs:
-            return None
-        # get the most specific rule or the one that was defined the latest if multiple with the same specificity
-        dom_rule = rs[0]  # the dominating rule
-        for r in rs:
-            # if   less  than: r is overruled by dom_rule because dom_rule has a higher specificity
-            # if  equal  than: r is overruled by dom_rule because dom_rule was defined after r
-            # if greater than: r overrules dom_rules because of higher specificity
-            if r.specificity > dom_rule.specificity:
-                dom_rule = r
-
-        return dom_rule
+        return self.cascade(root).by_pseudo.get(solution_element, {}).get((key, pseudo))
 
     def find_all(self, root: _Element, solution_element: _Element) -> dict[str, Rule]:
         """find all the css rule for the solution_element,
         root is the root of the html-document (etree)"""
-        dom_css = {}
-        by_keyword: dict[str, tuple[list[Rule], list[Rule]]] = {}
-        r: Rule
-        # find all rules defined for the solution element for the specified key
-        for r in reversed(self.rules):
-            for element in cast("list[_Element]", root.xpath(r.xpath)):
-                if element == solution_element:
-                    if r.name not in by_keyword:
-                        by_keyword[r.name] = ([], [])
-                    if r.important:
-                        by_keyword[r.name][0].append(r)
-                    else:
-                        by_keyword[r.name][1].append(r)
-
-        for imp, non_imp in by_keyword.values():
-            # rules containing !important win from the ones that don't
-            rs = imp or non_imp
-            # get the most specific rule or the one that was defined the latest if multiple with the same specificity
-            dom_rule = rs[0]  # the dominating rule
-            for r in rs:
-                # if   less  than: r is overruled by dom_rule because dom_rule has a higher specificity
-                # if  equal  than: r is overruled by dom_rule because dom_rule was defined after r
-                # if greater than: r overrules dom_rules because of higher specificity
-                if r.specificity > dom_rule.specificity:
-                    dom_rule = r
-            dom_css[dom_rule.name] = dom_rule
-        return dom_css
+        # Copy, so callers can't change the cascade through the returned dict
+        return dict(self.cascade(root).by_name.get(solution_element, {}))
 
     def find_by_css_selector(self, css_selector: str, key: str) -> Rule | None:
-        dom_rule: Rule | None = None
-        rule: Rule
-        for rule in self.rules:
-            if (
-                rule.selector_str == css_selector
-                and rule.name == key
-                and (dom_rule is None or rule.specificity > dom_rule.specificity)
-            ):
-                dom_rule = rule
-        return dom_rule
-
-
-class AmbiguousXpath(Exception):
-    """Thrown when an xpath can select multiple elements when it should only select one element"""
+        group = self.groups.get(css_selector)
+        if group is None:
+            return None
+        # all rules of a group have the same specificity, so the first one defined for key dominates
+        return next((rule for rule in group.rules if rule.name == key), None)
 
 
 class ElementNotFound(Exception):
-    """Thrown when an xpath expects to find something, but it wasn't able to"""
+    """Thrown when an element of the BeautifulSoup tree has no counterpart in the lxml tree"""
 
 
 class CssValidator:
@@ -304,11 +436,13 @@ class CssValidator:
     "green"
     """
 
-    def __init__(self, html: str):
+    def __init__(self, html: str, engine: SelectorEngine = SelectorEngine.XPATH):
+        # the trees are shared with every other suite and comparison of the same html
+        self.document = parse_document(html)
         # Invalid HTML makes fromstring() crash, so it can be None
         self.root: _Element | None = None
         try:
-            self.root = fromstring(html)
+            self.root = self.document.root
 
             # A document without a <style> makes find() return None, and the AttributeError
             # that follows is what the except below is there to swallow
@@ -319,42 +453,18 @@ class CssValidator:
         except Exception:
             css = ""
 
-        self.rules = Rules(css)
+        self.rules = Rules(css, engine)
 
         if self.root is not None:
             self.rules.root = self.root
 
-        self.xpaths = {}
+        # (lxml element, key, pseudo) -> the rule it has or inherits, see find_inherited(). The lxml elements
+        # are kept alive by the keys, unlike the id of a bs4 element, which can be reused once it is freed
+        self.inherited: dict[tuple[_Element, str, str | None], Rule | None] = {}
 
     def __bool__(self):
         return bool(self.rules.rules)
 
-    def get_xpath_soup(self, element: Tag) -> str:
-        """converts an element from bs4 soup to an xpath expression
-        this is the memorization of the private function (makes it a lot faster)"""
-        # memorization of the xpath_soup method
-        if id(element) not in self.xpaths:
-            self.xpaths.update({id(element): self._get_xpath_soup(element)})
-        return self.xpaths[id(element)]
-
-    @staticmethod
-    def _get_xpath_soup(element: Tag) -> str:
-        """converts an element from bs4 soup to an xpath expression"""
-        components = []
-
-        child = element
-
-        for parent in child.parents:
-            siblings = parent.find_all(child.name, recursive=False)
-            components.append(
-                child.name
-                if len(siblings) == 1
-                else f"{child.name}[{next(i for i, s in enumerate(siblings, 1) if s is child)}]"
-            )
-            child = parent
-        components.reverse()
-        return "/{}".format("/".join(components))
-
     def find(self, element: Tag, key: str, pseudo: str | None = None) -> Rule | None:
         """find the css rule for key (ex: color) for the solution_element
         the element should be a BeautifulSoup Tag"""
@@ -362,22 +472,52 @@ class CssValidator:
         if self.root is None:
             return None
 
-        xpath_solution = self.get_xpath_soup(element)
-
-        # LXML adds a root HTML tag if there is none present, which results in
-        # root.xpath(path) failing because our parsed solution technically doesn't exist
-        # If nothing was found, try again with "/html" as a prefix
-        sols = cast("list[_Element]", self.root.xpath(xpath_solution) or self.root.xpath("/html" + xpath_solution))
+        solution_element = self.document.element_for(element)
 
-        # Found nothing
-        if not sols:
+        # lxml put the element somewhere else, this happens when there is more than one root element
+        if solution_element is None:
             raise ElementNotFound
 
-        # Found more than one match
-        if not len(sols) == 1:
-            raise AmbiguousXpath
+        return self.rules.find(self.root, solution_element, key, pseudo)
+
+    def find_inherited(self, element: Tag, key: str, pseudo: str | None = None) -> Rule | None:
+        """find the css rule for key (ex: color) for the element, or else the one it inherits from its closest
+        ancestor that has one, the element should be a BeautifulSoup Tag
+        the result is remembered for every element on the way up, so the siblings and descendants of an element
+        that was resolved before only have to look at their own rules"""
+        if self.root is None:
+            return None
 
-        return self.rules.find(self.root, sols[0], key, pseudo)
+        # the elements that were passed on the way up, they all end up with the rule that is found
+        passed = []
+        current = element
+        rule = None
+        while True:
+            solution_element = self.document.element_for(current)
+            # lxml put the element somewhere else, this happens when there is more than one root element
+            if solution_element is None:
+                raise ElementNotFound
+
+            cache_key = (solution_element, key, pseudo)
+            if cache_key in self.inherited:
+                rule = self.inherited[cache_key]
+                break
+
+            passed.append(cache_key)
+            rule = self.rules.find(self.root, solution_element, key, pseudo)
+            if rule is not None:
+                break
+
+            # Nothing is inherited from the top-level element of the document,
+            # so the parent needs at least 2 ancestors (the last one being the document itself)
+            parent = current.parent
+            if parent is None or parent.parent is None or parent.parent.parent is None:
+                break
+            current = parent
+
+        for cache_key in passed:
+            self.inherited[cache_key] = rule
+        return rule
 
     def find_by_css_selector(self, css_selector: str, key: str) -> Rule | None:
         if self.root is None:
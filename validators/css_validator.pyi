@@ -1,56 +1,110 @@
+from collections.abc import Iterable
+from enum import StrEnum
+from functools import _lru_cache_wrapper
+from typing import NamedTuple
+
 from bs4.element import Tag
-from lxml.etree import _Element
+from lxml.etree import XPath, _Element
 from tinycss2.ast import Declaration
 
 from utils.color_converter import Color
+from utils.document import ParsedDocument
 
 def strip(ls: list) -> list: ...
 
 class CssParsingError(Exception): ...
 
+SELECTOR_CACHE_SIZE: int
+
+class SelectorEngine(StrEnum):
+    XPATH = "xpath"
+    RIGHT_TO_LEFT = "right-to-left"
+
 def _get_xpath(selector: str) -> str: ...
 
-class Rule:
-    selector: list
-    selector_str: str
+class CompiledSelector(NamedTuple):
     xpath: str
+    matcher: XPath
     pseudo: str | None
+    specificity: tuple[int, int, int]
+
+compile_selector: _lru_cache_wrapper[CompiledSelector]
+
+class CssDeclaration:
     name: str
-    value: list
     important: bool
-    specificity: tuple[int, int, int]
     value_str: str
     color: Color | None
 
-    def __init__(self, selector: list, content: Declaration): ...
+    def __init__(self, content: Declaration): ...
+
+class SelectorGroup:
+    selector_str: str
+    compiled: CompiledSelector
+    rules: list[Rule]
+
+    def __init__(self, selector_str: str): ...
+
+class Rule:
+    group: SelectorGroup
+    declaration: CssDeclaration
+    selector_str: str
+    order: int
+
+    def __init__(self, group: SelectorGroup, declaration: CssDeclaration, order: int): ...
+    @property
+    def xpath(self) -> str: ...
+    @property
+    def matcher(self) -> XPath: ...
+    @property
+    def pseudo(self) -> str | None: ...
+    @property
+    def specificity(self) -> tuple[int, int, int]: ...
+    @property
+    def name(self) -> str: ...
+    @property
+    def important(self) -> bool: ...
+    @property
+    def value_str(self) -> str: ...
+    @property
+    def color(self) -> Color | None: ...
     def is_color(self) -> bool: ...
     def has_color(self, color: str) -> bool: ...
     def compare_to(self, value: str | None = None, important: bool | None = None, any_order: bool = False) -> bool: ...
 
 def calc_specificity(selector_str: str) -> tuple[int, int, int]: ...
 
+class Cascade:
+    by_pseudo: dict[_Element, dict[tuple[str, str | None], Rule]]
+    by_name: dict[_Element, dict[str, Rule]]
+
+    def __init__(self, groups: Iterable[SelectorGroup], root: _Element, engine: SelectorEngine): ...
+
 class Rules:
     root: _Element
+    engine: SelectorEngine
     rules: list
+    groups: dict[str, SelectorGroup]
     map: dict
+    _cascades: dict[_Element, Cascade]
 
-    def __init__(self, css_content: str): ...
+    def __init__(self, css_content: str, engine: SelectorEngine = ...): ...
     def __len__(self) -> int: ...
+    def cascade(self, root: _Element) -> Cascade: ...
     def find(self, root: _Element, solution_element: _Element, key: str, pseudo: str | None = None) -> Rule | None: ...
     def find_all(self, root: _Element, solution_element: _Element) -> dict[str, Rule]: ...
     def find_by_css_selector(self, css_selector: str, key: str) -> Rule | None: ...
 
-class AmbiguousXpath(Exception): ...
 class ElementNotFound(Exception): ...
 
 class CssValidator:
+    document: ParsedDocument
     root: _Element | None
     rules: Rules
-    xpaths: dict
+    inherited: dict[tuple[_Element, str, str | None], Rule | None]
 
-    def __init__(self, html: str): ...
+    def __init__(self, html: str, engine: SelectorEngine = ...): ...
     def __bool__(self): ...
-    def get_xpath_soup(self, element: Tag) -> str: ...
-    def _get_xpath_soup(self, element: Tag) -> str: ...
     def find(self, element: Tag, key: str, pseudo: str | None = None) -> Rule | None: ...
+    def find_inherited(self, element: Tag, key: str, pseudo: str | None = None) -> Rule | None: ...
     def find_by_css_selector(self, css_selector: str, key: str) -> Rule | None: ...
@@ -1,4 +1,5 @@
-import copy
+import re
+from bisect import bisect_left
 
 from dodona.translator import Translator
 from exceptions.double_char_exceptions import (
@@ -30,7 +31,9 @@ class DoubleChar:
         """
         return new instance of DoubleChar with is_open set to the desired value
         """
-        c = copy.copy(self)
+        # same as copy.copy(self), without going through __reduce_ex__ for every token
+        c = object.__new__(type(self))
+        c.__dict__.update(self.__dict__)
         if self.is_unambiguous:
             c._is_open = is_open  # noqa: SLF001
         c.line = line
@@ -127,6 +130,13 @@ class Generator:
             key=lambda x: max(x.len_close(), x.len_open()),
             reverse=True,
         )
+        # matched text -> the DoubleChar it is and whether it opens, the first one in ls wins
+        self.tokens: dict[str, tuple[DoubleChar, bool]] = {}
+        for x in self.ls:
+            self.tokens.setdefault(x.open, (x, True))
+            self.tokens.setdefault(x.close, (x, False))
+        # a regex alternation tries its options from left to right, so it prefers the same match create() does
+        self.pattern = re.compile("|".join(re.escape(token) for token in self.tokens))
 
     def create(self, s: str, line: int, pos: int) -> tuple[DoubleChar | None, str]:
         for x in self.ls:
@@ -151,39 +161,46 @@ class DoubleCharsValidator:
 
     def __init__(self, translator: Translator):
         self.translator = translator
+        self.generator = Generator()
 
     @staticmethod
     def parse_content(s: str) -> list[str | DoubleChar]:
         ls = []
         generator = Generator()
-        saved_text = ""
         line, pos = 0, 0
-        while s:
-            res: DoubleChar | None
-            res, s = generator.create(s, line, pos)
-            if res:
-                if saved_text:
-                    ls.append(saved_text)
-                    saved_text = ""
-                ls.append(res)
-                pos += res.len_open() if res.is_unambiguous and res.is_open() else res.len_close()
-            else:
-                c = s[0]
-                s = s[1:]
-                saved_text += c
-                pos += 1
-                if c == "\n":
-                    line += 1
-                    pos = 0
-        if saved_text:
-            ls.append(saved_text)
+        # end of the previous match, everything between it and the next match is plain text
+        start = 0
+        for match in generator.pattern.finditer(s):
+            if match.start() > start:
+                saved_text = s[start : match.start()]
+                ls.append(saved_text)
+                newlines = saved_text.count("\n")
+                if newlines:
+                    line += newlines
+                    pos = len(saved_text) - saved_text.rfind("\n") - 1
+                else:
+                    pos += len(saved_text)
+
+            dc, is_open = generator.tokens[match.group()]
+            ls.append(dc.create(is_open, line, pos))
+            pos += match.end() - match.start()
+            start = match.end()
+        if start < len(s):
+            ls.append(s[start:])
         return ls
 
     def validate_content(self, text: str):
-        """checks the text"""
-        # parse
-        text_ls: list[str | DoubleChar] = self.parse_content(text)
-        # validate
+        """checks the text
+        the text is tokenized and validated in the same pass, the line and position of a token are only
+        looked up for the tokens that are kept (on the stack or as wait_until_seen) or reported"""
+        # offsets of every newline, the line of an offset is the number of newlines before it
+        newlines = [match.start() for match in re.finditer("\n", text)]
+
+        def locate(dc: DoubleChar, is_open: bool, offset: int) -> DoubleChar:
+            line = bisect_left(newlines, offset)
+            pos = offset - newlines[line - 1] - 1 if line else offset
+            return dc.create(is_open, line, pos)
+
         stack = []
         wait_until_seen: DoubleChar | None = None
         # Error checking
@@ -211,30 +228,27 @@ class DoubleCharsValidator:
                 stack.pop()
             return wus
 
-        while text_ls:
-            dc = text_ls.pop(0)
-            if isinstance(dc, DoubleChar):
-                if not wait_until_seen:
-                    dc: DoubleChar
-                    if (
-                        (stack and stack[-1].type != dc.type)
-                        or (dc.is_unambiguous and dc.is_open())
-                        or not dc.is_unambiguous
-                    ):
-                        wait_until_seen = push_stack(dc)
-                    elif stack and stack[-1].type == dc.type:
-                        wait_until_seen = pop_stack(dc)
-                    else:
-                        errors.add(
-                            MissingOpeningCharError(trans=self.translator, char=dc.close, line=dc.line, pos=dc.pos)
-                        )
-
-                # We're inside something that we don't need to check, so the only question is
-                # whether we need to leave this state.
-                elif dc.type == wait_until_seen.type:
-                    if (not dc.check_in_between and dc.is_unambiguous and dc.is_open()) or dc.check_in_between:
-                        wait_until_seen = None
-                        push_stack(dc)
+        for match in self.generator.pattern.finditer(text):
+            dc, is_open = self.generator.tokens[match.group()]
+            if not wait_until_seen:
+                if (stack and stack[-1].type != dc.type) or (dc.is_unambiguous and is_open) or not dc.is_unambiguous:
+                    wait_until_seen = push_stack(locate(dc, is_open, match.start()))
+                elif stack and stack[-1].type == dc.type:
+                    # the closing char is only kept when the text after it isn't checked
+                    wait_until_seen = pop_stack(dc if dc.check_in_between else locate(dc, is_open, match.start()))
+                else:
+                    dc = locate(dc, is_open, match.start())
+                    errors.add(MissingOpeningCharError(trans=self.translator, char=dc.close, line=dc.line, pos=dc.pos))
+
+            # We're inside something that we don't need to check, so the only question is
+            # whether we need to leave this state.
+            elif dc.type == wait_until_seen.type and (
+                (not dc.check_in_between and dc.is_unambiguous and is_open) or dc.check_in_between
+            ):
+                wait_until_seen = None
+                # chars that aren't checked inside aren't kept on the stack either
+                if dc.check_inside:
+                    push_stack(locate(dc, is_open, match.start()))
 
         # Error checking
         # the stack should be empty, if not error remaining things
@@ -1,3 +1,5 @@
+import re
+
 from dodona.translator import Translator
 
 class DoubleChar:
@@ -32,11 +34,14 @@ class CssComment(DoubleChar): ...
 
 class Generator:
     ls: list[DoubleChar]
+    tokens: dict[str, tuple[DoubleChar, bool]]
+    pattern: re.Pattern[str]
     def __init__(self): ...
     def create(self, s: str, line: int, pos: int) -> tuple[DoubleChar | None, str]: ...
 
 class DoubleCharsValidator:
     translator: Translator
+    generator: Generator
 
     def __init__(self, translator: Translator): ...
     @staticmethod
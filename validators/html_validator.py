@@ -1,7 +1,9 @@
-from functools import lru_cache
+from collections.abc import Mapping
+from functools import cache
 from html.parser import HTMLParser
 from pathlib import Path, PureWindowsPath
-from typing import cast
+from types import MappingProxyType
+from typing import NamedTuple, cast
 
 from dodona.translator import Translator
 from exceptions.html_exceptions import (
@@ -32,6 +34,40 @@ PERMITTED_PARENTS_KEY = "permitted_parents"
 VOID_KEY = "void_tag"
 
 
+class TagInfo(NamedTuple):
+    """everything the validator knows about a tag, see html_tags_attributes.json"""
+
+    void: bool
+    required_attributes: frozenset[str]
+    recommended_attributes: frozenset[str]
+    # None when any parent (or child) is fine, an empty set when there may be none
+    permitted_parents: frozenset[str] | None
+    permitted_children: frozenset[str] | None
+
+
+@cache
+def load_tags() -> Mapping[str, TagInfo]:
+    """the tags from html_tags_attributes.json, the file is only read once per process
+    and every HtmlValidator shares the (read-only) result"""
+    valid_dict = json_loader(str((base_path / "html_tags_attributes.json").resolve()))
+
+    def optional(info: dict, key: str) -> frozenset[str] | None:
+        return frozenset(info[key]) if key in info else None
+
+    return MappingProxyType(
+        {
+            tag: TagInfo(
+                void=info.get(VOID_KEY, False),
+                required_attributes=frozenset(info.get(REQUIRED_ATR_KEY, ())),
+                recommended_attributes=frozenset(info.get(RECOMMENDED_ATR_KEY, ())),
+                permitted_parents=optional(info, PERMITTED_PARENTS_KEY),
+                permitted_children=optional(info, PERMITTED_CHILDREN_KEY),
+            )
+            for tag, info in valid_dict.items()
+        }
+    )
+
+
 def _is_absolute_path(link: str) -> bool:
     """Check whether a link is an absolute filepath, in POSIX or Windows spelling.
 
@@ -76,7 +112,7 @@ class HtmlValidator(HTMLParser):
         self.warnings = Warnings(self.translator)
         self.tag_stack = []
         self.double_chars_validator = DoubleCharsValidator(translator)
-        self.valid_dict = json_loader(str((base_path / "html_tags_attributes.json").resolve()))
+        self.tags = load_tags()
         self.check_required = kwargs.get("required", True)
         self.check_recommended = kwargs.get("recommended", True)
         self.check_nesting = kwargs.get("nesting", True)
@@ -115,7 +151,7 @@ class HtmlValidator(HTMLParser):
         self.warnings.clear()
         self.reset()
         self.lineno = 0  # self.reset() is also from a superclass and resets lineno to 1 instead of 0
-        # check brackets and stuff ( '(', '"', '{', '[', '<')
+        # check brackets and stuff ( '(', '"', '{', '[', '<'), this goes first so its errors win from the ones below
         self._valid_double_chars(text)
         # check html syntax
         self.feed(text)
@@ -183,18 +219,13 @@ class HtmlValidator(HTMLParser):
                     MissingOpeningTagError(trans=self.translator, tag=tag, line=self.getpos()[0], pos=self.getpos()[1])
                 )
 
-    # lru_cache on a method keeps the instance alive for as long as the cache does. A judge
-    # process handles one submission and exits, so the validator it holds on to is one that
-    # was going to live that long anyway.
-    @lru_cache  # noqa: B019
     def _is_void_tag(self, tag: str) -> bool:
         """indicates whether the tag its corresponding closing tag is omittable or not"""
-        return VOID_KEY in self.valid_dict[tag] and self.valid_dict[tag][VOID_KEY]
+        return self.tags[tag].void
 
-    @lru_cache  # noqa: B019
     def _valid_tag(self, tag: str):
         """validate that a tag is a valid HTML tag (if a tag isn't allowed, this wil also raise an exception"""
-        if tag not in self.valid_dict:
+        if tag not in self.tags:
             self.error(InvalidTagError(trans=self.translator, tag=tag, line=self.getpos()[0], pos=self.getpos()[1]))
 
     def _valid_attributes(self, tag: str, attributes: dict[str, str]):
@@ -263,50 +294,46 @@ class HtmlValidator(HTMLParser):
                     )
                 )
 
-        tag_info = self.valid_dict[tag]
+        tag_info = self.tags[tag]
 
-        if self.check_required:
-            required = set(tag_info[REQUIRED_ATR_KEY]) if REQUIRED_ATR_KEY in tag_info else set()
-            if missing_req := (required - attributes.keys()):
-                self.error(
-                    MissingRequiredAttributesError(
-                        trans=self.translator,
-                        tag=tag,
-                        attribute=", ".join(missing_req),
-                        line=self.getpos()[0],
-                        pos=self.getpos()[1],
-                    )
+        if self.check_required and (missing_req := tag_info.required_attributes - attributes.keys()):
+            self.error(
+                MissingRequiredAttributesError(
+                    trans=self.translator,
+                    tag=tag,
+                    attribute=", ".join(missing_req),
+                    line=self.getpos()[0],
+                    pos=self.getpos()[1],
                 )
+            )
 
-        if self.check_recommended:
-            recommended = set(tag_info[RECOMMENDED_ATR_KEY]) if RECOMMENDED_ATR_KEY in tag_info else set()
-            if missing_rec := (recommended - attributes.keys()):
-                self.warning(
-                    MissingRecommendedAttributesWarning(
-                        trans=self.translator,
-                        tag=tag,
-                        attribute=", ".join(missing_rec),
-                        line=self.getpos()[0],
-                        pos=self.getpos()[1],
-                    )
+        if self.check_recommended and (missing_rec := tag_info.recommended_attributes - attributes.keys()):
+            self.warning(
+                MissingRecommendedAttributesWarning(
+                    trans=self.translator,
+                    tag=tag,
+                    attribute=", ".join(missing_rec),
+                    line=self.getpos()[0],
+                    pos=self.getpos()[1],
                 )
+            )
 
     def _valid_nesting(self, tag):
         """check whether the nesting is html-approved,
         some tags can only have specific parent tags
         """
-        tag_info = self.valid_dict[tag]
-        if PERMITTED_PARENTS_KEY in tag_info:
+        tag_info = self.tags[tag]
+        if tag_info.permitted_parents is not None:
             # check if the prev tag is in the permitted parents field of the current tag
             prev_tag = self.tag_stack[-1] if self.tag_stack else None
             # prev tag can be None when tag is <html>, you don't expect it has a parent,
             #   if you want a tag without a parent you need to add "permitted_parent: []" in the json for that tag
-            if not tag_info[PERMITTED_PARENTS_KEY]:
+            if not tag_info.permitted_parents:
                 if prev_tag is not None:
                     self.error(
                         UnexpectedTagError(trans=self.translator, tag=tag, line=self.getpos()[0], pos=self.getpos()[1])
                     )
-            elif prev_tag is not None and prev_tag not in tag_info[PERMITTED_PARENTS_KEY]:
+            elif prev_tag is not None and prev_tag not in tag_info.permitted_parents:
                 self.error(
                     UnexpectedTagError(trans=self.translator, tag=tag, line=self.getpos()[0], pos=self.getpos()[1])
                 )
@@ -318,11 +345,11 @@ class HtmlValidator(HTMLParser):
         if parent is None:
             return
 
-        parent_info = self.valid_dict[parent]
+        permitted_children = self.tags[parent].permitted_children
 
         # Parent tag isn't special
-        if PERMITTED_CHILDREN_KEY not in parent_info:
+        if permitted_children is None:
             return
 
-        if tag not in parent_info[PERMITTED_CHILDREN_KEY]:
+        if tag not in permitted_children:
             self.error(UnexpectedTagError(trans=self.translator, tag=tag, line=self.getpos()[0], pos=self.getpos()[1]))
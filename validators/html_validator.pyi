@@ -1,15 +1,26 @@
+from collections.abc import Mapping
 from html.parser import HTMLParser
+from typing import NamedTuple
 
 from dodona.translator import Translator
 from exceptions.html_exceptions import HtmlValidationError, MissingRecommendedAttributesWarning, Warnings
 from validators.double_chars_validator import DoubleCharsValidator
 
+class TagInfo(NamedTuple):
+    void: bool
+    required_attributes: frozenset[str]
+    recommended_attributes: frozenset[str]
+    permitted_parents: frozenset[str] | None
+    permitted_children: frozenset[str] | None
+
+def load_tags() -> Mapping[str, TagInfo]: ...
+
 class HtmlValidator(HTMLParser):
     translator: Translator
     warnings: Warnings
     tag_stack: list
     double_chars_validator: DoubleCharsValidator
-    valid_dict: dict
+    tags: Mapping[str, TagInfo]
     check_required: bool
     check_recommended: bool
     check_nesting: bool
@@ -1,27 +1,325 @@
-from html_similarity import structural_similarity, style_similarity
-from lxml.html import HtmlComment, HtmlElement, fromstring
+from collections.abc import Iterable, Mapping, Sequence
+from difflib import SequenceMatcher
+from types import MappingProxyType
+from typing import NamedTuple
+
+from lxml.html import HtmlComment, HtmlElement
 
 from dodona.translator import Translator
 from exceptions.structure_exceptions import NotTheSame
+from utils.document import parse_document
 from utils.html_checks import is_empty_document
 from utils.html_navigation import compare_content
-from validators.css_validator import CssValidator
+from validators.css_validator import CssValidator, Rule, Rules
+
+# Up to this many tags in both documents together, the similarity is exactly what difflib.SequenceMatcher.ratio()
+# gives, the measure html_similarity used. Beyond it that takes quadratic time, so it is approximated instead.
+EXACT_SIMILARITY_TAGS = 400
+# Longer parts of the documents are matched in pieces of at most this many tags of each
+SIMILARITY_CHUNK_TAGS = 4096
+# How far the approximation of the similarity of long documents was from the exact
+# SequenceMatcher(autojunk=False).ratio(), measured on large documents with edits all over them
+SIMILARITY_TOLERANCE = 0.02
+
+
+class Fingerprint(NamedTuple):
+    """what get_similarity() compares of a document"""
+
+    # the tag of every element in document order, "comment" for comments
+    tags: tuple[str, ...]
+    # every class used in the document
+    classes: frozenset[str]
+    # whether the document has a <style> element
+    style: bool
+
+
+def fingerprint(content: str) -> Fingerprint:
+    """the fingerprint of an html-document, from the tree shared through parse_document()"""
+    try:
+        # the top of the document, fromstring() returns the body's only child for some fragments
+        root = parse_document(content).root.getroottree().getroot()
+    except Exception:
+        # html_similarity scores a document it can't parse as 0% similar
+        return Fingerprint(tags=(), classes=frozenset(), style="<style" in content)
+
+    tags = []
+    classes = set()
+    for node in root.iter():
+        if isinstance(node, HtmlComment):
+            tags.append("comment")
+        elif isinstance(node, HtmlElement):
+            tags.append(node.tag)
+            classes.update(node.get("class", "").split())
+    return Fingerprint(tags=tuple(tags), classes=frozenset(classes), style="<style" in content)
+
+
+def _common_subsequence(first: Sequence[str], second: Sequence[str]) -> int:
+    """the length of the longest common subsequence, computed for all of second at once with the bits of an int
+    (Hyyrö's bit-parallel algorithm), which takes len(first) * len(second) / 30 steps instead of their product"""
+    masks: dict[str, int] = {}
+    for position, tag in enumerate(second):
+        masks[tag] = masks.get(tag, 0) | (1 << position)
+    # a 0 bit for every position of second that is the end of a match so far,
+    # the carry of the addition only runs towards the bits past the end of second
+    row = (1 << len(second)) - 1
+    for tag in first:
+        matches = row & masks.get(tag, 0)
+        row = (row + matches) | (row - matches)
+    return len(second) - (row & ((1 << len(second)) - 1)).bit_count()
+
+
+def tag_similarity(first: tuple[str, ...], second: tuple[str, ...]) -> float:
+    """similarity of two tag sequences: twice the number of tags that match in order, over the number of tags in both
+    0 if neither has tags: a document that can't be parsed has none, and html_similarity scored those 0% similar
+
+    Short sequences are matched by difflib.SequenceMatcher, like html_similarity did. For long ones that takes
+    quadratic time (and its autojunk heuristic makes the result meaningless), so the common start and end of the
+    sequences are matched in order first. What is left in between is matched by SequenceMatcher when it is short,
+    which is the usual case for a submission that is almost right. Otherwise the longest common subsequence of
+    what is left is counted, in pieces of SIMILARITY_CHUNK_TAGS at the same relative place in both, so the time stays
+    linear. That is never lower than what SequenceMatcher matches for a single piece. Tags only match the pieces at
+    the same place, so a match across the boundary of two pieces is lost: the result can be lower, but stays within
+    SIMILARITY_TOLERANCE of the exact ratio for documents that differ in many places. Reordering the tags lowers it.
+    """
+    total = len(first) + len(second)
+    if total == 0:
+        return 0.0
+    if total <= EXACT_SIMILARITY_TAGS:
+        return SequenceMatcher(None, first, second).ratio()
+
+    start = 0
+    while start < min(len(first), len(second)) and first[start] == second[start]:
+        start += 1
+    end = 0
+    while end < min(len(first), len(second)) - start and first[-end - 1] == second[-end - 1]:
+        end += 1
+
+    first_rest = first[start : len(first) - end]
+    second_rest = second[start : len(second) - end]
+    if len(first_rest) + len(second_rest) <= EXACT_SIMILARITY_TAGS:
+        matcher = SequenceMatcher(None, first_rest, second_rest, autojunk=False)
+        matches = sum(block.size for block in matcher.get_matching_blocks())
+    else:
+        pieces = -(-max(len(first_rest), len(second_rest)) // SIMILARITY_CHUNK_TAGS)
+        matches = sum(
+            _common_subsequence(
+                first_rest[len(first_rest) * piece // pieces : len(first_rest) * (piece + 1) // pieces],
+                second_rest[len(second_rest) * piece // pieces : len(second_rest) * (piece + 1) // pieces],
+            )
+            for piece in range(pieces)
+        )
+    return 2 * (start + end + matches) / total
+
+
+def class_similarity(first: frozenset[str], second: frozenset[str]) -> float:
+    """Jaccard similarity of the classes of two documents, 1 if neither has any"""
+    if not first and not second:
+        return 1.0
+    return len(first & second) / len(first | second)
+
+
+class SolutionNode(NamedTuple):
+    """a node of the solution with everything compare() needs of it, normalized once"""
+
+    comment: bool
+    # lowercase tag name, empty for comments
+    tag: str
+    # stripped text, lowercase as well for comments
+    text: str
+    # the names of the attributes with a DUMMY value, and the stripped values of the others
+    dummies: frozenset[str]
+    exact: Mapping[str, str]
+    # the css rules that apply to the node, by property name
+    styles: Mapping[str, Rule]
+    # the child elements, and the child elements and comments
+    children: tuple["SolutionNode", ...]
+    children_with_comments: tuple["SolutionNode", ...]
+    # the hash of the subtree for every combination of comparison options, indexed by _options()
+    # None when a DUMMY in the subtree means it has to be compared node by node
+    digests: tuple[int | None, ...]
+
+
+class CompiledSolution(NamedTuple):
+    """solution.html prepared for compare(), made once per exercise by prepare_solution()
+    compare() only reads it, so it can be shared by every submission to the exercise"""
+
+    content: str
+    root: SolutionNode
+    # whether the solution has css rules to compare to
+    css: bool
+    fingerprint: Fingerprint
+
+
+# The comparison options that change what a subtree has to match, as the bits of an index into digests
+_ATTRIBUTES = 1
+_CONTENTS = 2
+_CSS = 4
+_COMMENTS = 8
+_ALL_OPTIONS = range(16)
 
 
-def get_similarity(sol: str, sub: str) -> tuple[float, float]:
+def _options(attributes: bool, contents: bool, css: bool, comments: bool) -> int:
+    return attributes * _ATTRIBUTES | contents * _CONTENTS | css * _CSS | comments * _COMMENTS
+
+
+def _digest(key: tuple, children: Iterable[int | None]) -> int | None:
+    """the hash of a subtree from the key of its root and the hashes of its children,
+    None if any of them is None
+
+    A submission subtree with the same hash as the solution subtree passes every check compare() does on it,
+    so compare() skips it. The other way around doesn't hold: a different hash means the subtree is checked.
+    """
+    child_digests = tuple(children)
+    if None in child_digests:
+        return None
+    return hash((key, child_digests))
+
+
+def _element_key(options: int, tag: str, attributes: frozenset | None, text: str | None, styles: frozenset) -> tuple:
+    """what an element has to match under options, a None (a DUMMY) is only kept when its option is on"""
+    return (
+        "element",
+        tag,
+        attributes if options & _ATTRIBUTES else (),
+        text if options & _CONTENTS else "",
+        styles if options & _CSS else (),
+    )
+
+
+def _solution_digests(node: SolutionNode) -> tuple[int | None, ...]:
+    digests = []
+    for options in _ALL_OPTIONS:
+        if node.comment:
+            # Comments are only compared with the comments option, "dummy" matches any comment
+            key = ("comment", node.text) if node.text != "dummy" else None
+        elif node.tag:
+            key = _element_key(
+                options,
+                node.tag,
+                # Exactly equal attributes pass both the attributes and the minimal_attributes check
+                frozenset(node.exact.items()) if not node.dummies else None,
+                node.text if node.text != "DUMMY" else None,
+                frozenset((name, rule.value_str) for name, rule in node.styles.items()),
+            )
+        else:
+            key = None
+
+        if key is None or None in key:
+            digests.append(None)
+        else:
+            children = node.children_with_comments if options & _COMMENTS else node.children
+            digests.append(_digest(key, (child.digests[options] for child in children)))
+    return tuple(digests)
+
+
+def _submission_digests(
+    submission: HtmlElement, options: int, css: CssValidator | None
+) -> dict[HtmlElement, int | None]:
+    """the hash of every subtree of the submission, the counterpart of SolutionNode.digests"""
+    by_name = css.rules.cascade(submission).by_name if css is not None else {}
+    digests: dict[HtmlElement, int | None] = {}
+    # Children come after their parent in document order, so backwards they are done before it
+    for node in reversed(list(submission.iter())):
+        if isinstance(node, HtmlComment):
+            text = node.text.strip().lower() if node.text is not None else ""
+            digests[node] = _digest(("comment", text), ())
+        elif isinstance(node, HtmlElement):
+            key = _element_key(
+                options,
+                node.tag.lower(),
+                frozenset(node.attrib.items()),
+                node.text.strip() if node.text is not None else "",
+                frozenset((name, rule.value_str) for name, rule in by_name.get(node, {}).items()),
+            )
+            children = node if options & _COMMENTS else (child for child in node if isinstance(child, HtmlElement))
+            digests[node] = _digest(key, (digests.get(child) for child in children))
+        else:
+            # processing instructions and the like are compared node by node
+            digests[node] = None
+    return digests
+
+
+def _solution_node(node: HtmlElement, root: HtmlElement, rules: Rules | None) -> SolutionNode:
+    if isinstance(node, HtmlComment):
+        return _with_digests(
+            SolutionNode(
+                comment=True,
+                tag="",
+                text=node.text.strip().lower() if node.text is not None else "",
+                dummies=frozenset(),
+                exact=MappingProxyType({}),
+                styles=MappingProxyType({}),
+                children=(),
+                children_with_comments=(),
+                digests=(),
+            )
+        )
+
+    attributes = {name: value.strip() for name, value in node.attrib.items()}
+    children_with_comments = tuple(_solution_node(child, root, rules) for child in node.getchildren())
+    return _with_digests(
+        SolutionNode(
+            comment=False,
+            # Processing instructions and entities have a function as tag, and never match a submission anyway
+            tag=node.tag.lower() if isinstance(node.tag, str) else "",
+            text=node.text.strip() if node.text is not None else "",
+            dummies=frozenset(name for name, value in attributes.items() if value == "DUMMY"),
+            exact=MappingProxyType({name: value for name, value in attributes.items() if value != "DUMMY"}),
+            styles=MappingProxyType(rules.find_all(root, node) if rules is not None else {}),
+            children=tuple(
+                solution_node
+                for child, solution_node in zip(node.getchildren(), children_with_comments, strict=True)
+                if isinstance(child, HtmlElement)
+            ),
+            children_with_comments=children_with_comments,
+            digests=(),
+        )
+    )
+
+
+def _with_digests(node: SolutionNode) -> SolutionNode:
+    # the digests are made from the rest of the node, its children already have theirs
+    return node._replace(digests=_solution_digests(node))
+
+
+def prepare_solution(solution_str: str) -> CompiledSolution:
+    """parse and normalize the solution for compare(), so that is done once for all submissions"""
+    rules: Rules | None = None
+    try:
+        rules = CssValidator(solution_str).rules
+        if not rules:  # no rules in solution file
+            rules = None
+    except Exception:
+        rules = None
+
+    # The tree is shared with the suites and validators of the same html, so it is only read here
+    solution: HtmlElement = parse_document(solution_str).root
+    return CompiledSolution(
+        content=solution_str,
+        root=_solution_node(solution, solution, rules),
+        css=rules is not None,
+        fingerprint=fingerprint(solution_str),
+    )
+
+
+def get_similarity(sol: str | CompiledSolution, sub: str) -> tuple[float, float]:
+    """the html and css similarity of the submission to the solution, both between 0 and 1
+    the css similarity is 1 if neither has a <style>"""
     # Empty submission is 0% similar
     if is_empty_document(sub):
         return 0, 0
 
-    a = sol.find("<style")
-    b = sub.find("<style")
-    if a != -1 or b != -1:
-        return structural_similarity(sol, sub), style_similarity(sol, sub)
-    return structural_similarity(sol, sub), 1
+    sol_fingerprint = sol.fingerprint if isinstance(sol, CompiledSolution) else fingerprint(sol)
+    sub_fingerprint = fingerprint(sub)
+    html_similarity = tag_similarity(sol_fingerprint.tags, sub_fingerprint.tags)
+    if sol_fingerprint.style or sub_fingerprint.style:
+        return html_similarity, class_similarity(sol_fingerprint.classes, sub_fingerprint.classes)
+    return html_similarity, 1
 
 
-def compare(solution_str: str, submission_str: str, trans: Translator, **kwargs):
+def compare(solution: str | CompiledSolution, submission_str: str, trans: Translator, **kwargs):
     """compare submission structure to the solution structure (html)
+    the solution is either the html or what prepare_solution() made of it, which saves parsing it again
     possible kwargs:
     * attributes: (default: False) check whether attributes are exactly the same in solution and submission
     * minimal_attributes: (default: False) check whether at least the attributes in solution are supplied in the
@@ -39,37 +337,36 @@ def compare(solution_str: str, submission_str: str, trans: Translator, **kwargs)
     if is_empty_document(submission_str):
         raise NotTheSame(trans=trans, msg=trans.translate(Translator.Text.EMPTY_SUBMISSION), line=-1, pos=-1)
 
+    if isinstance(solution, str):
+        solution = prepare_solution(solution)
+
     # structure is always checked
     check_attributes = kwargs.get("attributes", False)
     check_minimal_attributes = kwargs.get("minimal_attributes", False)
     check_contents = kwargs.get("contents", False)
-    check_css = kwargs.get("css", True)
+    check_css = kwargs.get("css", True) and solution.css
     check_comments = kwargs.get("comments", False)
 
-    sol_css = None
     sub_css = None
     if check_css:
         try:
-            sol_css = CssValidator(solution_str)
             sub_css = CssValidator(submission_str)
-            if not sol_css.rules:  # no rules in solution file
-                check_css = False
         except Exception:
             check_css = False
 
-    solution: HtmlElement = fromstring(solution_str)
-    submission: HtmlElement = fromstring(submission_str)
+    # The tree is shared with the suites and validators of the same html, so it is only read here
+    submission: HtmlElement = parse_document(submission_str).root
+
+    # Subtrees with the same hash in both trees pass all the checks below, so only the subtrees that differ
+    # are walked. The order stays the same, so the first difference found is the same as without the hashes.
+    options = _options(check_attributes or check_minimal_attributes, check_contents, check_css, check_comments)
+    sub_digests = _submission_digests(submission, options, sub_css)
     # start checking structure
 
-    def attrs_a_contains_attrs_b(attrs_a, attrs_b, exact_match):
-        # split dummy values from attrs_a
-        dummies = set()
-        exact = {}
-        for a in attrs_a:
-            if node_sol.attrib.get(a).strip() == "DUMMY":
-                dummies.add(a)
-            else:
-                exact.update({a: node_sol.attrib.get(a).strip()})
+    def attrs_a_contains_attrs_b(attrs_b, exact_match):
+        # the dummy values of the solution only have to be present, the other values have to be the same
+        dummies = set(node_sol.dummies)
+        exact = dict(node_sol.exact)
         # check if all attrs in a are in b (if exact, all attrs from b must also be in a)
         for b in attrs_b:
             if b in exact and exact[b] == node_sub.attrib[b]:
@@ -80,17 +377,19 @@ def compare(solution_str: str, submission_str: str, trans: Translator, **kwargs)
                 return False
         return not (dummies or exact)
 
-    queue = [(solution, submission)]
+    queue: list[tuple[SolutionNode, HtmlElement]] = [(solution.root, submission)]
     while queue:
         node_sol, node_sub = queue.pop()
-        if check_comments and isinstance(node_sol, HtmlComment):
+        digest = node_sol.digests[options]
+        if digest is not None and digest == sub_digests.get(node_sub):
+            continue
+        if check_comments and node_sol.comment:
             if not isinstance(node_sub, HtmlComment):
                 raise NotTheSame(
                     trans=trans, msg=trans.translate(Translator.Text.EXPECTED_COMMENT), line=node_sub.sourceline, pos=-1
                 )
-            node_sol.text = node_sol.text.strip().lower() if node_sol.text is not None else ""
-            node_sub.text = node_sub.text.strip().lower() if node_sub.text is not None else ""
-            if node_sol.text != "dummy" and not compare_content(node_sol.text, node_sub.text):
+            sub_text = node_sub.text.strip().lower() if node_sub.text is not None else ""
+            if node_sol.text != "dummy" and not compare_content(node_sol.text, sub_text):
                 raise NotTheSame(
                     trans=trans,
                     msg=trans.translate(Translator.Text.COMMENT_CORRECT_TEXT),
@@ -98,24 +397,22 @@ def compare(solution_str: str, submission_str: str, trans: Translator, **kwargs)
                     pos=-1,
                 )
             continue
-        node_sol.tag = node_sol.tag.lower()
-        node_sub.tag = node_sub.tag.lower()
-        node_sol.text = node_sol.text.strip() if node_sol.text is not None else ""
-        node_sub.text = node_sub.text.strip() if node_sub.text is not None else ""
+        sub_tag = node_sub.tag.lower()
+        sub_text = node_sub.text.strip() if node_sub.text is not None else ""
         # check name of the node
-        if node_sol.tag != node_sub.tag:
+        if node_sol.tag != sub_tag:
             raise NotTheSame(
                 trans=trans, msg=trans.translate(Translator.Text.TAGS_DIFFER), line=node_sub.sourceline, pos=-1
             )
         # check attributes if wanted
-        if check_attributes and not attrs_a_contains_attrs_b(node_sol.attrib, node_sub.attrib, True):
+        if check_attributes and not attrs_a_contains_attrs_b(node_sub.attrib, True):
             raise NotTheSame(
                 trans=trans,
                 msg=trans.translate(Translator.Text.ATTRIBUTES_DIFFER),
                 line=node_sub.sourceline,
                 pos=-1,
             )
-        if check_minimal_attributes and not attrs_a_contains_attrs_b(node_sol.attrib, node_sub.attrib, False):
+        if check_minimal_attributes and not attrs_a_contains_attrs_b(node_sub.attrib, False):
             raise NotTheSame(
                 trans=trans,
                 msg=trans.translate(Translator.Text.NOT_ALL_ATTRIBUTES_PRESENT),
@@ -123,39 +420,37 @@ def compare(solution_str: str, submission_str: str, trans: Translator, **kwargs)
                 pos=-1,
             )
         # check content if wanted
-        if check_contents and node_sol.text != "DUMMY" and not compare_content(node_sol.text, node_sub.text):
+        if check_contents and node_sol.text != "DUMMY" and not compare_content(node_sol.text, sub_text):
             raise NotTheSame(
                 trans=trans, msg=trans.translate(Translator.Text.CONTENTS_DIFFER), line=node_sub.sourceline, pos=-1
             )
         # check css
-        # Both validators are set together, and check_css only stays True when both made
-        # it through the block above, but that is a chain of assignments away from here
-        if check_css and sol_css is not None and sub_css is not None:
-            rs_sol = sol_css.rules.find_all(solution, node_sol)
+        # sub_css is set whenever check_css stayed True, but that is a chain of assignments away from here
+        if check_css and sub_css is not None and node_sol.styles:
             rs_sub = sub_css.rules.find_all(submission, node_sub)
-            if rs_sol:
-                for r_key in rs_sol:
-                    if r_key not in rs_sub:
-                        raise NotTheSame(
-                            trans=trans,
-                            msg=trans.translate(Translator.Text.STYLES_DIFFER, tag=node_sub.tag),
-                            line=node_sub.sourceline,
-                            pos=-1,
-                        )
-                    if rs_sol[r_key].value_str != rs_sub[r_key].value_str and not (
-                        rs_sol[r_key].is_color() and rs_sol[r_key].has_color(rs_sub[r_key].value_str)
-                    ):
-                        raise NotTheSame(
-                            trans=trans,
-                            msg=trans.translate(Translator.Text.STYLES_DIFFER, tag=node_sub.tag),
-                            line=node_sub.sourceline,
-                            pos=-1,
-                        )
+            for r_key, rule in node_sol.styles.items():
+                if r_key not in rs_sub:
+                    raise NotTheSame(
+                        trans=trans,
+                        msg=trans.translate(Translator.Text.STYLES_DIFFER, tag=sub_tag),
+                        line=node_sub.sourceline,
+                        pos=-1,
+                    )
+                if rule.value_str != rs_sub[r_key].value_str and not (
+                    rule.is_color() and rule.has_color(rs_sub[r_key].value_str)
+                ):
+                    raise NotTheSame(
+                        trans=trans,
+                        msg=trans.translate(Translator.Text.STYLES_DIFFER, tag=sub_tag),
+                        line=node_sub.sourceline,
+                        pos=-1,
+                    )
         # check whether the children of the nodes have the same amount of children
-        node_sol_children = node_sol.getchildren()
         node_sub_children = node_sub.getchildren()
-        if not check_comments:
-            node_sol_children = [x for x in node_sol_children if isinstance(x, HtmlElement)]
+        if check_comments:
+            node_sol_children = node_sol.children_with_comments
+        else:
+            node_sol_children = node_sol.children
             node_sub_children = [x for x in node_sub_children if isinstance(x, HtmlElement)]
         if len(node_sol_children) != len(node_sub_children):
             raise NotTheSame(
@@ -1,4 +1,39 @@
+from collections.abc import Mapping
+from typing import NamedTuple
+
 from dodona.translator import Translator
+from validators.css_validator import Rule
+
+EXACT_SIMILARITY_TAGS: int
+SIMILARITY_CHUNK_TAGS: int
+SIMILARITY_TOLERANCE: float
+
+class Fingerprint(NamedTuple):
+    tags: tuple[str, ...]
+    classes: frozenset[str]
+    style: bool
+
+def fingerprint(content: str) -> Fingerprint: ...
+def tag_similarity(first: tuple[str, ...], second: tuple[str, ...]) -> float: ...
+def class_similarity(first: frozenset[str], second: frozenset[str]) -> float: ...
+
+class SolutionNode(NamedTuple):
+    comment: bool
+    tag: str
+    text: str
+    dummies: frozenset[str]
+    exact: Mapping[str, str]
+    styles: Mapping[str, Rule]
+    children: tuple[SolutionNode, ...]
+    children_with_comments: tuple[SolutionNode, ...]
+    digests: tuple[int | None, ...]
+
+class CompiledSolution(NamedTuple):
+    content: str
+    root: SolutionNode
+    css: bool
+    fingerprint: Fingerprint
 
-def get_similarity(sol: str, sub: str) -> tuple[float, float]: ...
-def compare(solution: str, submission: str, trans: Translator, **kwargs): ...
+def prepare_solution(solution_str: str) -> CompiledSolution: ...
+def get_similarity(sol: str | CompiledSolution, sub: str) -> tuple[float, float]: ...
+def compare(solution: str | CompiledSolution, submission_str: str, trans: Translator, **kwargs): ...